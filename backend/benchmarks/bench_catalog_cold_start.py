@@ -0,0 +1,125 @@
+"""Cold-start benchmark for the catalog
+
+Compares the time a fresh worker process needs to get a usable catalog when it
+is built from documents (what happens after a Firestore download, without the
+network time) and when it is loaded from the local snapshot file.
+
+Usage (from the backend directory):
+    python benchmarks/bench_catalog_cold_start.py [--recipes 5000] [--beverages 500]
+    python benchmarks/bench_catalog_cold_start.py --snapshot catalog_snapshot.bin
+"""
+
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from core.modules.catalog import Catalog  # noqa: E402
+from core.modules.catalog_snapshot import read_snapshot, write_snapshot  # noqa: E402
+
+ROLES = ["Main Course", "Side", "Dessert"]
+INGREDIENTS = ["egg", "milk", "flour", "sugar", "apple", "chicken", "rice", "spinach"]
+
+# timed in a fresh interpreter, so nothing is already imported or cached
+COLD_LOAD = """
+import sys, time
+sys.path.insert(0, {backend!r})
+start = time.perf_counter()
+from core.modules.catalog_snapshot import read_snapshot
+catalog = read_snapshot({path!r})
+item_id = next(iter(catalog.recipes))
+catalog.recipe_document(item_id)
+print(time.perf_counter() - start)
+"""
+
+
+def synthetic_documents(num_recipes, num_beverages, seed=0):
+    rng = random.Random(seed)
+    recipes = [
+        {
+            "recipe-id": str(i),
+            "recipe_name": f"Recipe {i}",
+            "food_role": rng.sample(ROLES, rng.randint(1, 2)),
+            "isVegan": rng.random() < 0.3,
+            "isGlutenFree": rng.random() < 0.5,
+            "isLowSugar": rng.random() < 0.5,
+            "hasDairy": rng.random() < 0.4,
+            "hasMeat": rng.random() < 0.4,
+            "hasNuts": rng.random() < 0.2,
+            "macronutrients": {
+                "Calories": {"measure": str(rng.randint(50, 800)), "unit": "kcal"},
+                "Carbohydrates": {"measure": str(rng.randint(0, 90)), "unit": "g"},
+                "Protein": {"measure": str(rng.randint(0, 60)), "unit": "g"},
+                "Fiber": {"measure": str(rng.randint(0, 15)), "unit": "g"},
+            },
+            "ingredients": [
+                {"name": name, "quantity": {"measure": "1", "unit": "cup"}}
+                for name in rng.sample(INGREDIENTS, 5)
+            ],
+            "instructions": [
+                {"original_text": f"Step {step} of recipe {i}."} for step in range(8)
+            ],
+        }
+        for i in range(num_recipes)
+    ]
+    beverages = [
+        {"bev-id": str(i), "name": f"Beverage {i}", "hasDairy": rng.random() < 0.3}
+        for i in range(num_beverages)
+    ]
+    return recipes, beverages
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=5000)
+    parser.add_argument("--beverages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--snapshot", help="benchmark an existing snapshot instead of synthetic data"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.snapshot
+        if path is None:
+            recipes, beverages = synthetic_documents(args.recipes, args.beverages)
+            build = timed(
+                lambda: Catalog.from_documents(recipes, beverages), args.repeat
+            )
+            print(
+                f"build from documents : {build * 1000:8.1f} ms "
+                f"({args.recipes} recipes, {args.beverages} beverages, network excluded)"
+            )
+            path = os.path.join(tmp_dir, "catalog_snapshot.bin")
+            size = write_snapshot(Catalog.from_documents(recipes, beverages), path)
+            print(f"snapshot size        : {size / 1024:8.1f} KiB")
+
+        warm = timed(lambda: read_snapshot(path), args.repeat)
+        print(f"load snapshot (warm) : {warm * 1000:8.1f} ms")
+
+        script = COLD_LOAD.format(backend=BACKEND_DIR, path=os.path.abspath(path))
+        cold = statistics.median(
+            float(subprocess.check_output([sys.executable, "-c", script]))
+            for _ in range(args.repeat)
+        )
+        print(f"load snapshot (cold) : {cold * 1000:8.1f} ms (fresh interpreter)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Catalog search benchmark
+
+Builds the search index over a synthetic catalog, then measures query latency
+(prefix queries of different lengths, with and without filters), cold (with an
+empty prefix cache) and warm, and the time to derive the index of a new catalog
+version with a few changed items, from a full reload and from a batch of live
+changes. The memory held by the postings and the peak memory of the process
+are reported last.
+
+Usage (from the backend directory):
+    python benchmarks/bench_catalog_search.py [--recipes 100000] [--changed 100]
+"""
+
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_catalog_cold_start import synthetic_documents  # noqa: E402
+from core.modules.catalog import Catalog, CatalogChanges  # noqa: E402
+from core.modules.search_index import SearchIndex  # noqa: E402
+
+WORDS = [
+    "chicken", "beef", "tofu", "salad", "soup", "roasted", "grilled", "spicy",
+    "garlic", "lemon", "honey", "berry", "chocolate", "pasta", "rice", "bean",
+    "curry", "taco", "smoothie", "pancake", "omelette", "stew", "baked", "fried",
+]  # fmt: skip
+
+QUERIES = [
+    ("c", {}),
+    ("1", {}),
+    ("chi", {}),
+    ("chicken", {}),
+    ("spicy chick", {}),
+    ("chicken 4", {}),
+    ("rice", {"roles": ["main_course"]}),
+    ("", {"dietary_filters": ["vegan", "gluten_free"]}),
+    ("bean", {"roles": ["side"], "dietary_filters": ["vegan"]}),
+]
+
+
+def named_documents(num_recipes, num_beverages, seed=0):
+    rng = random.Random(seed)
+    recipes, beverages = synthetic_documents(num_recipes, num_beverages, seed)
+    for recipe in recipes:
+        recipe["recipe_name"] = (
+            " ".join(rng.sample(WORDS, 3)) + f" {recipe['recipe-id']}"
+        )
+    return recipes, beverages
+
+
+def percentiles(times):
+    times = sorted(times)
+    return (
+        f"p50 {statistics.median(times) * 1e6:8.1f} us  "
+        f"p99 {times[int(len(times) * 0.99) - 1] * 1e6:8.1f} us"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=100000)
+    parser.add_argument("--beverages", type=int, default=1000)
+    parser.add_argument("--changed", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    recipes, beverages = named_documents(args.recipes, args.beverages)
+    catalog = Catalog.from_documents(recipes, beverages)
+
+    start = time.perf_counter()
+    index = SearchIndex.from_catalog(catalog)
+    print(
+        f"build index       : {(time.perf_counter() - start) * 1000:8.1f} ms "
+        f"({len(catalog)} items, {len(index.tokens)} tokens)"
+    )
+
+    for query, filters in QUERIES:
+        cold, warm = [], []
+        for _ in range(args.repeat):
+            index._prefix_cache.clear()
+            start = time.perf_counter()
+            _, total = index.search(query, **filters)
+            cold.append(time.perf_counter() - start)
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            index.search(query, **filters)
+            warm.append(time.perf_counter() - start)
+        print(
+            f"query {query!r:13} {str(filters):56} cold {percentiles(cold)}  "
+            f"warm {percentiles(warm)}  ({total} matches)"
+        )
+
+    # change a few recipes, then derive the index of the new version
+    rng = random.Random(1)
+    changed = rng.sample(recipes, args.changed)
+    for recipe in changed:
+        recipe["recipe_name"] = f"renamed {recipe['recipe_name']}"
+    changes = CatalogChanges({recipe["recipe-id"]: recipe for recipe in changed})
+    start = time.perf_counter()
+    synced = catalog.apply_changes(changes)
+    print(
+        f"apply live changes: {(time.perf_counter() - start) * 1000:8.1f} ms "
+        f"({args.changed} changed items)"
+    )
+    start = time.perf_counter()
+    index.updated(synced, changes)
+    print(
+        f"update from changes: {(time.perf_counter() - start) * 1000:7.1f} ms "
+        f"({args.changed} changed items)"
+    )
+
+    new_catalog = Catalog.from_documents(recipes, beverages)
+    start = time.perf_counter()
+    index.updated(new_catalog)
+    print(
+        f"incremental update: {(time.perf_counter() - start) * 1000:8.1f} ms "
+        f"({args.changed} changed items)"
+    )
+
+    print(f"postings          : {index.nbytes() / 2**20:8.1f} MB")
+    # kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"peak memory       : {peak / 1024:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Nutritional constraint scoring benchmark
+
+Scores the meals of a plan with the per-meal User_Constraints calculator,
+which annotates the whole catalog for every meal, then with the feature
+table of scoring.py (built once per catalog version, timed separately) and
+its bitwise constraint_score.
+
+Usage (from the backend directory):
+    python benchmarks/bench_constraint_scoring.py [--recipes 20000] [--days 7]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_catalog_cold_start import synthetic_documents  # noqa: E402
+from core.modules.catalog import Catalog, set_catalog  # noqa: E402
+from core.modules.nutritional_constraint_metric import User_Constraints  # noqa: E402
+from core.modules.scoring import constraint_score, feature_table  # noqa: E402
+
+PREFERENCES = {"dairyPreference": -1, "meatPreference": 0, "nutsPreference": -1}
+
+FEATURES = {
+    "dairyPreference": "hasDairy",
+    "meatPreference": "hasMeat",
+    "nutsPreference": "hasNuts",
+}
+
+
+def legacy_score(meal_types):
+    """Score of a meal as computed before the feature table"""
+    calculator = User_Constraints()
+    for constraint in calculator.get_constraints().copy():
+        calculator.remove_constraint(constraint)
+    for preference, value in PREFERENCES.items():
+        calculator.add_new_constraint(FEATURES[preference], value)
+    return calculator.calc_config(meal_types)[0]
+
+
+def timed(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=20000)
+    parser.add_argument("--beverages", type=int, default=500)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--meals", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    catalog = Catalog.from_documents(*synthetic_documents(args.recipes, args.beverages))
+    set_catalog(catalog)
+    rng = random.Random(0)
+    recipe_ids = catalog.recipe_ids()
+    beverage_ids = catalog.beverage_ids()
+    meals = [
+        {
+            "main_course": rng.choice(recipe_ids),
+            "side": rng.choice(recipe_ids),
+            "dessert": rng.choice(recipe_ids),
+            "beverage": rng.choice(beverage_ids),
+        }
+        for _ in range(args.days * args.meals)
+    ]
+    print(f"{len(catalog)} catalog items, {len(meals)} meals")
+
+    elapsed = timed(
+        lambda: [legacy_score(meal) for meal in meals], max(1, args.repeat // 5)
+    )
+    print(f"User_Constraints per meal : {elapsed:10.3f} ms")
+
+    start = time.perf_counter()
+    table = feature_table(catalog)
+    print(
+        f"feature table (once)      : {(time.perf_counter() - start) * 1000:10.3f} ms"
+    )
+    elapsed = timed(
+        lambda: [constraint_score(meal, PREFERENCES, table) for meal in meals],
+        args.repeat * 100,
+    )
+    print(f"constraint_score          : {elapsed:10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Import-time benchmark for the backend
+
+Imports the views in a fresh interpreter under `python -X importtime` and
+reports the total import time and the slowest modules. Importing must not
+connect to Firestore or load the catalog, so the run fails if any of the
+Firestore client modules show up in the import log.
+
+Usage (from the backend directory):
+    python benchmarks/bench_import_time.py [--top 15] [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_VIEWS = "import django; django.setup(); import core.urls"
+
+# modules which are only allowed to be imported on first use
+DEFERRED_MODULES = ("firebase_admin", "google.cloud.firestore")
+
+
+def import_times(statement):
+    """Run statement under -X importtime, returns {module: (self us, cumulative us)}"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="config.settings")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            # column titles
+            continue
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [import_times(IMPORT_VIEWS) for _ in range(args.repeat)]
+    totals = [sum(self_us for self_us, _ in run.values()) for run in runs]
+    print(
+        f"total import time (django.setup + core.urls): {statistics.median(totals) / 1000:8.1f} ms"
+    )
+
+    last = runs[-1]
+    print(f"\nslowest {args.top} modules (cumulative):")
+    slowest = sorted(last.items(), key=lambda item: item[1][1], reverse=True)
+    for module, (_, cumulative_us) in slowest[: args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    eager = sorted(
+        module
+        for module in last
+        if any(
+            module == deferred or module.startswith(f"{deferred}.")
+            for deferred in DEFERRED_MODULES
+        )
+    )
+    if eager:
+        print(f"\nFAIL: imported eagerly: {', '.join(eager)}")
+        sys.exit(1)
+    print("\nOK: no Firestore client modules imported")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Meal plan generation benchmark
+
+Times the batched generator on plans of different lengths, with and without
+no-repeat windows, and on plans for many users, with candidate pools the size
+of typical favorite item lists.
+Then times the score-optimizing search and the nutrition-goal search until
+they converge, against their time budget.
+
+Usage (from the backend directory):
+    python benchmarks/bench_meal_plan_generation.py [--users 100] [--repeat 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+from bench_catalog_cold_start import synthetic_documents  # noqa: E402
+from core.modules.catalog import Catalog  # noqa: E402
+from core.modules.meal_plan_generator import generate_days  # noqa: E402
+from core.modules.meal_plan_optimizer import optimize_days  # noqa: E402
+from core.modules.nutrition import nutrient_matrix  # noqa: E402
+from core.modules.nutrition_optimizer import optimize_nutrition  # noqa: E402
+
+MEAL_CONFIGS = [
+    {
+        "meal_name": meal_name,
+        "meal_types": {
+            "main_course": True,
+            "side": True,
+            "dessert": meal_name == "dinner",
+            "beverage": True,
+        },
+    }
+    for meal_name in ("breakfast", "lunch", "dinner")
+]
+
+NO_REPEAT_DAYS = {"main_course": 3, "side": 2, "dessert": 2, "beverage": 1}
+
+PREFERENCES = {"dairyPreference": -1, "meatPreference": 0, "nutsPreference": -1}
+
+GOALS = {"calories": 2000, "carbs": 250, "protein": 100, "fiber": 30}
+
+
+def pools(catalog, size):
+    """The first size items of every role"""
+    candidates = {"beverage": catalog.beverage_ids()[:size]}
+    for role, name in (
+        ("main_course", "Main Course"),
+        ("side", "Side"),
+        ("dessert", "Dessert"),
+    ):
+        candidates[role] = [
+            item_id
+            for item_id, record in catalog.recipes.items()
+            if name in record.roles
+        ][:size]
+    return candidates
+
+
+def timed(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pool-size", type=int, default=50)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    catalog = Catalog.from_documents(*synthetic_documents(args.pool_size * 8, 200))
+    candidates = pools(catalog, args.pool_size)
+    start_date = datetime(2025, 1, 1)
+
+    for num_days in (7, 30, 365):
+        elapsed = timed(
+            lambda: generate_days(
+                candidates, MEAL_CONFIGS, num_days, start_date, "Plan", rng
+            ),
+            args.repeat,
+        )
+        print(f"{num_days:4} days             : {elapsed:8.2f} ms")
+        elapsed = timed(
+            lambda: generate_days(
+                candidates,
+                MEAL_CONFIGS,
+                num_days,
+                start_date,
+                "Plan",
+                rng,
+                NO_REPEAT_DAYS,
+            ),
+            args.repeat,
+        )
+        print(f"{num_days:4} days no-repeat   : {elapsed:8.2f} ms")
+
+    elapsed = timed(
+        lambda: [
+            generate_days(candidates, MEAL_CONFIGS, 7, start_date, "Plan", rng)
+            for _ in range(args.users)
+        ],
+        max(1, args.repeat // 4),
+    )
+    print(f"{args.users:4} users x 7 days   : {elapsed:8.2f} ms")
+
+    for num_days in (7, 30, 365):
+        _, stats = optimize_days(
+            candidates,
+            MEAL_CONFIGS,
+            num_days,
+            start_date,
+            "Plan",
+            PREFERENCES,
+            time_budget=5,
+            rng=rng,
+            catalog=catalog,
+        )
+        print(
+            f"{num_days:4} days optimized   : {stats['elapsed_ms']:8.2f} ms "
+            f"({stats['sweeps']} sweeps, {stats['improved_meals']} meals improved, "
+            f"converged: {stats['completed']})"
+        )
+
+    matrix = nutrient_matrix(catalog)
+    for num_days in (7, 30, 365):
+        _, stats = optimize_nutrition(
+            candidates,
+            MEAL_CONFIGS,
+            num_days,
+            start_date,
+            "Plan",
+            GOALS,
+            time_budget=5,
+            rng=rng,
+            no_repeat_days=NO_REPEAT_DAYS,
+            matrix=matrix,
+        )
+        print(
+            f"{num_days:4} days nutrition   : {stats['elapsed_ms']:8.2f} ms "
+            f"({stats['sweeps']} sweeps, deviation {stats['deviation_before']} -> "
+            f"{stats['deviation_after']}, converged: {stats['completed']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Plan scoring benchmark
+
+Scores generated plans meal by meal with score_meal, as calculate_goodness
+used to, then with calculate_goodness, which scores all the meals of a plan
+at once, and reports plans scored per second.
+
+Usage (from the backend directory):
+    python benchmarks/bench_plan_scoring.py [--plans 2000] [--days 7]
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+from bench_catalog_cold_start import synthetic_documents  # noqa: E402
+from bench_meal_plan_generation import MEAL_CONFIGS, PREFERENCES, pools  # noqa: E402
+from core.modules.catalog import Catalog, set_catalog  # noqa: E402
+from core.modules.meal_plan_generator import generate_days  # noqa: E402
+from core.modules.recommendation_helpers import (  # noqa: E402
+    calculate_goodness,
+    score_meal,
+)
+from core.modules.scoring import feature_table  # noqa: E402
+
+
+def score_by_meal(days):
+    for day_plan in days.values():
+        for meal, meal_config in zip(day_plan["meals"], MEAL_CONFIGS):
+            score_meal(meal, meal_config, PREFERENCES)
+
+
+def plans_per_second(function, plans):
+    plans = copy.deepcopy(plans)
+    start = time.perf_counter()
+    for days in plans:
+        function(days)
+    return len(plans) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plans", type=int, default=2000)
+    parser.add_argument("--pool-size", type=int, default=50)
+    args = parser.parse_args()
+
+    catalog = Catalog.from_documents(*synthetic_documents(args.pool_size * 8, 200))
+    set_catalog(catalog)
+    feature_table(catalog)
+    candidates = pools(catalog, args.pool_size)
+    rng = np.random.default_rng(0)
+
+    for num_days in (7, 30, 365):
+        num_plans = max(10, args.plans * 7 // num_days)
+        plans = [
+            generate_days(
+                candidates, MEAL_CONFIGS, num_days, datetime(2025, 1, 1), "Plan", rng
+            )
+            for _ in range(num_plans)
+        ]
+        by_meal = plans_per_second(score_by_meal, plans)
+        at_once = plans_per_second(
+            lambda days: calculate_goodness(days, MEAL_CONFIGS, PREFERENCES), plans
+        )
+        print(
+            f"{num_days:4} days: meal by meal {by_meal:9.0f} plans/s, "
+            f"calculate_goodness {at_once:9.0f} plans/s ({at_once / by_meal:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -120,6 +120,57 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Local snapshot of the recipe and beverage catalog, written by `manage.py export_catalog`
+# and loaded by every worker at boot instead of downloading the catalog from Firestore
+
+CATALOG_SNAPSHOT_PATH = BASE_DIR / "catalog_snapshot.bin"
+
+# Apply recipe and beverage changes made in Firestore to the running catalog as they happen
+# (through Firestore snapshot listeners started at boot) instead of only at the next restart
+
+CATALOG_LIVE_SYNC = True
+
+# Meal plan search (requests with "optimize": true): default and largest time budget in
+# milliseconds, and the weight of each goodness metric in the score it maximizes
+
+MEAL_PLAN_TIME_BUDGET_MS = 200
+MAX_MEAL_PLAN_TIME_BUDGET_MS = 2000
+MEAL_PLAN_SCORE_WEIGHTS = {"variety": 1.0, "coverage": 1.0, "constraint": 1.0}
+
+# Sampled meal plans: number of consecutive days in which an item is not repeated for
+# each meal role (1 only keeps the meals of a day from sharing items, 0 allows repeats),
+# shortened when the user has too few candidate items. Requests can override them with
+# "no_repeat_days"
+
+MEAL_PLAN_NO_REPEAT_DAYS = {"main_course": 3, "side": 2, "dessert": 2, "beverage": 1}
+
+# Generated meal plans kept per worker, so that repeated requests are served without
+# generating and scoring the plan again: most entries kept (0 disables the cache) and
+# seconds an entry is served
+
+PLAN_CACHE_MAX_ENTRIES = 256
+PLAN_CACHE_TTL = 600
+
+# Candidate pools kept per worker (with the same TTL), reused when a plan is generated again
+# or one of its slots is regenerated
+
+POOL_CACHE_MAX_ENTRIES = 1024
+
+# Threads saving streamed meal plans (requests with "stream": true) to Firestore in the
+# background of the response
+
+PLAN_PERSIST_WORKERS = 4
+
+# Batch meal plan generation (recommendation/bandit-batch): most users per request and
+# threads generating their plans
+
+MAX_BATCH_USERS = 500
+BATCH_GENERATION_WORKERS = 4
+
+# Plan scoring (recommendation/score): most meal plans scored per request
+
+MAX_SCORED_PLANS = 100
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -146,4 +197,8 @@ CORS_ALLOW_HEADERS = [
     "content-type",
     "authorization",
     "x-csrf-token",
+    "if-none-match",
 ]
+
+# let the frontend read the entity tags of the item info endpoints
+CORS_EXPOSE_HEADERS = ["etag"]
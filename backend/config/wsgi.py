@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_wsgi_application()
+
+# load the catalog and connect to Firestore before the first request comes in
+from core.modules.catalog import warmup  # noqa: E402
+
+warmup()
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.modules.catalog import fetch_catalog
+from core.modules.firebase import FirebaseManager
+from core.modules.ingredient_index import (
+    annotate_recipes,
+    changed_annotations,
+    ingredient_index,
+)
+
+
+class Command(BaseCommand):
+    help = "Recompute the isVegan, isGlutenFree and isLowSugar flags of the recipes from their ingredients and write back the ones that changed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ingredients",
+            nargs="+",
+            default=None,
+            help="Only re-annotate the recipes using one of these ingredients (e.g. after changing their rules)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the changes without writing them to Firestore",
+        )
+
+    def handle(self, *args, **options):
+        start = time.time()
+        try:
+            catalog = fetch_catalog()
+        except Exception as e:
+            raise CommandError(f"Could not download the catalog: {e}")
+
+        index = ingredient_index(catalog)
+        recipe_ids = None
+        if options["ingredients"]:
+            recipe_ids = index.recipes_with(options["ingredients"])
+        annotations = annotate_recipes(index, recipe_ids)
+        changes = changed_annotations(catalog, annotations)
+        self.stdout.write(
+            f"Annotated {len(annotations)} of {len(index)} recipes "
+            f"({len(index.postings)} distinct ingredients) in {time.time() - start:.2f} seconds, "
+            f"{len(changes)} changed"
+        )
+        for recipe_id, flags in sorted(changes.items()):
+            self.stdout.write(f"  {recipe_id}: {flags}")
+
+        if options["dry_run"] or not changes:
+            return
+
+        updated, status = FirebaseManager().update_recipe_annotations(changes)
+        if status != 200:
+            raise CommandError(updated)
+        self.stdout.write(
+            self.style.SUCCESS(f"Updated {updated} recipes with batched writes")
+        )
@@ -0,0 +1,214 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.modules.catalog import load_catalog, set_catalog
+from core.modules.catalog_snapshot import read_snapshot
+from core.modules.evaluation import evaluate_generator
+from core.modules.meal_plan_generator import generate_days
+from core.modules.meal_plan_optimizer import optimize_days
+from core.modules.nutrition import has_goals
+from core.modules.nutrition_optimizer import optimize_nutrition
+from core.modules.recommendation_helpers import get_bandit_favorite_items
+from core.modules.seeding import FAVORITES_STAGE, derive_seed, stage_rng
+
+MEAL_CONFIGS = [
+    {
+        "meal_name": meal_name,
+        "meal_types": {
+            "main_course": True,
+            "side": True,
+            "dessert": meal_name == "dinner",
+            "beverage": True,
+        },
+    }
+    for meal_name in ("breakfast", "lunch", "dinner")
+]
+
+NUTRITIONAL_GOALS = {"calories": 2000, "carbs": 250, "protein": 75, "fiber": 30}
+
+
+class Command(BaseCommand):
+    help = "Generate plans for every preference profile and combination of dietary conditions, and report their goodness scores, throughput and latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--mode",
+            choices=("sample", "optimize", "target-nutrition"),
+            default="sample",
+            help="Generation path to evaluate, with the settings of the recommendation endpoint: "
+            "random draws (default), the score-optimizing search or the nutritional goal search",
+        )
+        parser.add_argument("--days", type=int, default=7, help="Days per plan")
+        parser.add_argument(
+            "--plans-per-profile",
+            type=int,
+            default=1,
+            help="Plans per preference profile and combination of dietary conditions",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--time-budget",
+            type=float,
+            default=settings.MEAL_PLAN_TIME_BUDGET_MS / 1000,
+            help="Search time per plan in seconds, with --mode optimize or target-nutrition",
+        )
+        parser.add_argument(
+            "--nutritional-goals",
+            default=None,
+            help="JSON file with the daily nutritional goals of the plans, with --mode target-nutrition",
+        )
+        parser.add_argument(
+            "--trial",
+            type=int,
+            default=None,
+            help="Draw favorite items from the results of this bandit trial, instead of the whole catalog",
+        )
+        parser.add_argument(
+            "--meal-configs",
+            default=None,
+            help="JSON file with the meal configs of the plans (breakfast, lunch and dinner by default)",
+        )
+        parser.add_argument(
+            "--snapshot",
+            default=None,
+            help="Catalog snapshot to evaluate with (the catalog of the app by default)",
+        )
+        parser.add_argument(
+            "--json", default=None, help="Also write the full report to this file"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            catalog = (
+                read_snapshot(options["snapshot"])
+                if options["snapshot"]
+                else load_catalog(reconcile=False)
+            )
+        except Exception as e:
+            raise CommandError(f"Could not load the catalog: {e}")
+        set_catalog(catalog)
+
+        meal_configs = MEAL_CONFIGS
+        if options["meal_configs"]:
+            with open(options["meal_configs"]) as file:
+                meal_configs = json.load(file)
+
+        nutritional_goals = NUTRITIONAL_GOALS
+        if options["nutritional_goals"]:
+            with open(options["nutritional_goals"]) as file:
+                nutritional_goals = json.load(file)
+            if not has_goals(nutritional_goals):
+                raise CommandError("The nutritional goals have no positive goal")
+
+        # every mode generates like the recommendation endpoint does
+        if options["mode"] == "optimize":
+
+            def generate(pools, configs, num_days, date, user_preferences, rng):
+                days, _ = optimize_days(
+                    pools,
+                    configs,
+                    num_days,
+                    date,
+                    "Evaluation",
+                    user_preferences,
+                    weights=settings.MEAL_PLAN_SCORE_WEIGHTS,
+                    time_budget=options["time_budget"],
+                    rng=rng,
+                )
+                return days
+
+        elif options["mode"] == "target-nutrition":
+
+            def generate(pools, configs, num_days, date, user_preferences, rng):
+                days, _ = optimize_nutrition(
+                    pools,
+                    configs,
+                    num_days,
+                    date,
+                    "Evaluation",
+                    nutritional_goals,
+                    time_budget=options["time_budget"],
+                    rng=rng,
+                    no_repeat_days=settings.MEAL_PLAN_NO_REPEAT_DAYS,
+                )
+                return days
+
+        else:
+
+            def generate(pools, configs, num_days, date, user_preferences, rng):
+                return generate_days(
+                    pools,
+                    configs,
+                    num_days,
+                    date,
+                    "Evaluation",
+                    rng,
+                    settings.MEAL_PLAN_NO_REPEAT_DAYS,
+                )
+
+        favorites = None
+        if options["trial"] is not None:
+
+            def favorites(user_preferences, dietary_conditions):
+                rng = stage_rng(
+                    derive_seed(options["seed"], user_preferences, dietary_conditions),
+                    FAVORITES_STAGE,
+                )
+                return get_bandit_favorite_items(
+                    options["trial"], user_preferences, dietary_conditions, rng
+                )
+
+        report = evaluate_generator(
+            generate,
+            meal_configs,
+            num_days=options["days"],
+            plans_per_profile=options["plans_per_profile"],
+            seed=options["seed"],
+            favorites=favorites,
+        )
+
+        self.stdout.write(
+            f"{report['plans']} plans of {options['days']} days ({options['mode']}) "
+            f"in {report['elapsed_s']:.2f} seconds, {report['plans_per_second']} plans/s, "
+            f"{report['failures']} failures, catalog {catalog.version}"
+        )
+        for stage, latency in report["latency_ms"].items():
+            self.stdout.write(
+                f"  {stage:8} latency (ms): "
+                + ", ".join(f"{name} {value:.2f}" for name, value in latency.items())
+            )
+        for metric, values in report["scores"].items():
+            self.stdout.write(
+                f"  {metric:10} score: "
+                + ", ".join(f"{name} {value:.3f}" for name, value in values.items())
+            )
+        for row in report["conditions"]:
+            conditions = (
+                "+".join(
+                    condition
+                    for condition, flag in row["dietary_conditions"].items()
+                    if flag
+                )
+                or "none"
+            )
+            means = ", ".join(
+                f"{metric} {'-' if value is None else f'{value:.3f}'}"
+                for metric, value in row["scores"].items()
+            )
+            failures = (
+                f", {row['failures']} failed ({row['error']})"
+                if row["failures"]
+                else ""
+            )
+            self.stdout.write(
+                f"  {conditions:38} {row['plans']:4} plans: {means}{failures}"
+            )
+
+        if options["json"]:
+            with open(options["json"], "w") as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(
+                self.style.SUCCESS(f"Wrote the report to {options['json']}")
+            )
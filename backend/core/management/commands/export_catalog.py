@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.modules.catalog import fetch_catalog
+from core.modules.catalog_snapshot import read_snapshot, write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Export the recipe and beverage catalog from Firestore to the local snapshot file loaded by workers at boot"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=str(settings.CATALOG_SNAPSHOT_PATH),
+            help="Path of the snapshot file (defaults to settings.CATALOG_SNAPSHOT_PATH)",
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"]
+
+        start = time.time()
+        try:
+            catalog = fetch_catalog()
+        except Exception as e:
+            raise CommandError(f"Could not download the catalog: {e}")
+        self.stdout.write(
+            f"Downloaded {len(catalog.recipes)} recipes and {len(catalog.beverages)} beverages in {time.time() - start:.2f} seconds"
+        )
+
+        size = write_snapshot(catalog, output)
+
+        # make sure the snapshot loads back to the same catalog
+        if read_snapshot(output).version != catalog.version:
+            raise CommandError(f"The snapshot written to {output} does not round trip")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote catalog version {catalog.version} to {output} ({size / 1024:.1f} KiB)"
+            )
+        )
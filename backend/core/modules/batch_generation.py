@@ -0,0 +1,184 @@
+"""Meal plan generation for many users at once
+
+Cohorts (e.g. the patients of a clinic) are onboarded with one request for
+all of their users instead of one bandit recommendation request each. The
+users are grouped by their dietary conditions and preference profile: the
+bandit's favorite items only depend on those, so they are drawn once per
+group, and the candidate pools filtered from the catalog are shared by every
+user with the same favorites and meal roles. The plans themselves are
+generated, then scored, in parallel.
+"""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .meal_plan_generator import generate_days, meal_roles
+from .meal_plan_optimizer import optimize_days
+from .nutrition import day_meals, nutrition_summary
+from .recommendation_helpers import calculate_goodness, candidate_pools
+from .variety import variety_stats
+from .seeding import PLAN_STAGE, stage_rng
+
+
+def _canonical(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def group_key(
+    user_preferences: Dict[str, int], dietary_conditions: Dict[str, bool]
+) -> str:
+    """Key of the group of users sharing dietary conditions and preference profile.
+
+    Preferences are compared in their given order, which is the order the bandit
+    reads them in (see get_bandit_favorite_items).
+    """
+    return json.dumps(
+        [list(user_preferences.items()), sorted(dietary_conditions.items())],
+        separators=(",", ":"),
+    )
+
+
+def group_users(entries: List[Dict]) -> Dict[str, List[int]]:
+    """Indices of the entries of every group, in order of first appearance"""
+    groups: Dict[str, List[int]] = {}
+    for index, entry in enumerate(entries):
+        key = group_key(entry["user_preferences"], entry["dietary_conditions"])
+        groups.setdefault(key, []).append(index)
+    return groups
+
+
+class PoolCache:
+    """Candidate pools shared by the users with the same favorite items, meal
+    roles and dietary conditions"""
+
+    def __init__(self):
+        self._pools: Dict[str, Dict[str, List[str]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def get(
+        self,
+        favorite_items: Dict[str, List[str]],
+        meal_configs: List[Dict],
+        dietary_conditions: Dict[str, bool],
+    ) -> Dict[str, List[str]]:
+        roles = sorted({role for meal in meal_roles(meal_configs) for role in meal})
+        favorites = {role: sorted(set(ids)) for role, ids in favorite_items.items()}
+        key = _canonical([favorites, roles, dietary_conditions])
+        with self._lock:
+            pools = self._pools.get(key)
+            if pools is not None:
+                self.hits += 1
+                return pools
+        # filtering twice in a race is harmless, the pools are equal
+        pools = candidate_pools(favorite_items, meal_configs, dietary_conditions)
+        with self._lock:
+            return self._pools.setdefault(key, pools)
+
+    def __len__(self):
+        return len(self._pools)
+
+
+def generate_plan_days(
+    pools: Dict[str, List[str]],
+    entry: Dict,
+    optimize: bool = False,
+    time_budget: float = 0.2,
+    weights: Optional[Dict[str, float]] = None,
+    no_repeat_days: Optional[Dict[str, int]] = None,
+) -> Tuple[Dict, Optional[Dict]]:
+    """Days of the plan of one batch entry (meal_configs, num_days, starting_date,
+    meal_plan_name, user_preferences and seed), and the search statistics when optimizing.
+    no_repeat_days only applies to sampled plans (see variety.py)"""
+    rng = stage_rng(entry["seed"], PLAN_STAGE)
+    if optimize:
+        return optimize_days(
+            pools,
+            entry["meal_configs"],
+            entry["num_days"],
+            entry["starting_date"],
+            entry["meal_plan_name"],
+            entry["user_preferences"],
+            weights=weights,
+            time_budget=time_budget,
+            rng=rng,
+        )
+    days = generate_days(
+        pools,
+        entry["meal_configs"],
+        entry["num_days"],
+        entry["starting_date"],
+        entry["meal_plan_name"],
+        rng,
+        no_repeat_days,
+    )
+    return days, None
+
+
+def evaluate_plan(
+    days: Dict[str, Dict],
+    meal_configs: List[Dict],
+    user_preferences: Dict[str, int],
+    nutritional_goals: Optional[Dict],
+) -> Dict:
+    """Scores, nutrition summary and variety of the days of a plan. The scores are
+    also set on the meals"""
+    return {
+        "scores": calculate_goodness(days, meal_configs, user_preferences),
+        "nutrition": nutrition_summary(days, nutritional_goals),
+        "variety": variety_stats(days),
+    }
+
+
+def evaluate_plans(
+    plans: List[Dict[str, Dict]],
+    meal_configs: List[Dict],
+    user_preferences: Dict[str, int],
+    nutritional_goals: Optional[Dict],
+) -> List[Dict]:
+    """evaluate_plan() of many plans of one user, the meals of every plan being
+    scored in a single calculate_goodness call. Meals may be stored as a list or
+    keyed by meal id (see day_meals)"""
+    days = {
+        (index, date): {"meals": day_meals(day_plan)}
+        for index, plan in enumerate(plans)
+        for date, day_plan in plan.items()
+    }
+    scores = calculate_goodness(days, meal_configs, user_preferences)
+    evaluations = []
+    start = 0
+    for plan in plans:
+        end = start + sum(
+            min(len(day_meals(day_plan)), len(meal_configs))
+            for day_plan in plan.values()
+        )
+        evaluations.append(
+            {
+                "scores": {key: values[start:end] for key, values in scores.items()},
+                "nutrition": nutrition_summary(plan, nutritional_goals),
+                "variety": variety_stats(plan),
+            }
+        )
+        start = end
+    return evaluations
+
+
+def run_parallel(
+    function: Callable, items: List, workers: int
+) -> List[Tuple[Optional[object], Optional[Exception]]]:
+    """(result, None) or (None, exception) of function(item) for every item, in order"""
+
+    def call(item):
+        try:
+            return function(item), None
+        except Exception as e:
+            return None, e
+
+    if workers <= 1 or len(items) <= 1:
+        return [call(item) for item in items]
+    with ThreadPoolExecutor(
+        max_workers=min(workers, len(items)), thread_name_prefix="batch-plans"
+    ) as executor:
+        return list(executor.map(call, items))
@@ -0,0 +1,707 @@
+"""Compact in-memory catalog of recipes and beverages
+
+The hot fields used by the recommendation and scoring code (ids, meal roles,
+dietary flags and macronutrients) are kept in slotted records. The full
+Firestore documents (ingredients, instructions, free text, ...) are only kept
+as compact JSON bytes and decoded on demand for the item info endpoints.
+
+The process-wide catalog is reached through get_catalog(). Nothing is loaded at
+import time: the catalog is loaded on first use, or ahead of the first request
+by warmup() which the WSGI and ASGI entry points call. It comes from the local
+snapshot file (see catalog_snapshot.py) when one exists, and is then reconciled
+with Firestore: by the first batch of the listeners of watch_catalog(), which
+then apply the changes made in Firestore as they happen, or by downloading the
+catalog in a background thread when the catalog is not kept in sync. Once warmed up, the search
+index of every new catalog version is derived before the version is swapped in.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from termcolor import colored
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+logger = logging.getLogger(__name__)
+
+# Macronutrients tracked for every item, in this order
+NUTRIENTS = ("calories", "carbs", "protein", "fiber")
+
+# Keys of the macronutrients inside an R3 document
+R3_NUTRIENT_KEYS = {
+    "calories": "Calories",
+    "carbs": "Carbohydrates",
+    "protein": "Protein",
+    "fiber": "Fiber",
+}
+
+NO_NUTRIENTS = (0.0,) * len(NUTRIENTS)
+
+_NUMBER_PATTERN = re.compile(r"-?\d+\.?\d*")
+
+
+def parse_measure(nutrient) -> float:
+    """Parse an R3 nutrient ({"measure": "12 g", "unit": "g"}, "12 g" or 12) into a float"""
+    if isinstance(nutrient, dict):
+        nutrient = nutrient.get("measure")
+    if isinstance(nutrient, (int, float)) and not isinstance(nutrient, bool):
+        return float(nutrient)
+    if isinstance(nutrient, str):
+        match = _NUMBER_PATTERN.search(nutrient.replace(",", ""))
+        if match:
+            return float(match.group())
+    return 0.0
+
+
+def parse_nutrients(document: Dict) -> Tuple[float, ...]:
+    """Extract the (calories, carbs, protein, fiber) tuple of an R3 document"""
+    macros = document.get("nutrition") or document.get("macronutrients") or {}
+    return tuple(parse_measure(macros.get(R3_NUTRIENT_KEYS[n])) for n in NUTRIENTS)
+
+
+def encode_document(document: Dict) -> bytes:
+    """Serialize a Firestore document into compact JSON bytes"""
+    return json.dumps(
+        document, separators=(",", ":"), sort_keys=True, default=str
+    ).encode()
+
+
+def _document_hash(prefix: bytes, item_id: str, raw: bytes) -> int:
+    """64-bit hash of a document and its id, the version sums them"""
+    digest = hashlib.blake2b(prefix + item_id.encode() + b"\0" + raw, digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
+
+
+def _version(total: int) -> str:
+    return f"{total % (1 << 64):016x}"
+
+
+class BeverageRecord:
+    """Hot fields of a beverage document"""
+
+    __slots__ = ("id", "name", "has_dairy", "has_meat", "has_nuts", "nutrients")
+
+    def __init__(
+        self,
+        id: str,
+        name: str = "",
+        has_dairy: bool = False,
+        has_meat: bool = False,
+        has_nuts: bool = False,
+        nutrients: Tuple[float, ...] = NO_NUTRIENTS,
+    ):
+        self.id = sys.intern(id)
+        self.name = name
+        self.has_dairy = has_dairy
+        self.has_meat = has_meat
+        self.has_nuts = has_nuts
+        self.nutrients = nutrients
+
+    @classmethod
+    def from_document(cls, document: Dict) -> "BeverageRecord":
+        return cls(
+            id=str(document["bev-id"]),
+            name=document.get("name", ""),
+            has_dairy=bool(document.get("hasDairy", False)),
+            has_meat=bool(document.get("hasMeat", False)),
+            has_nuts=bool(document.get("hasNuts", False)),
+            nutrients=parse_nutrients(document),
+        )
+
+    def __repr__(self):
+        return f"BeverageRecord({self.id!r}, {self.name!r})"
+
+
+class RecipeRecord:
+    """Hot fields of an R3 recipe document"""
+
+    __slots__ = (
+        "id",
+        "name",
+        "roles",
+        "is_vegan",
+        "is_gluten_free",
+        "is_low_sugar",
+        "has_dairy",
+        "has_meat",
+        "has_nuts",
+        "nutrients",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        name: str = "",
+        roles: Tuple[str, ...] = (),
+        is_vegan: bool = False,
+        is_gluten_free: bool = False,
+        is_low_sugar: bool = False,
+        has_dairy: bool = False,
+        has_meat: bool = False,
+        has_nuts: bool = False,
+        nutrients: Tuple[float, ...] = NO_NUTRIENTS,
+    ):
+        self.id = sys.intern(id)
+        self.name = name
+        # roles are repeated across thousands of recipes, intern them
+        self.roles = tuple(sys.intern(role) for role in roles)
+        self.is_vegan = is_vegan
+        self.is_gluten_free = is_gluten_free
+        self.is_low_sugar = is_low_sugar
+        self.has_dairy = has_dairy
+        self.has_meat = has_meat
+        self.has_nuts = has_nuts
+        self.nutrients = nutrients
+
+    @classmethod
+    def from_document(cls, document: Dict) -> "RecipeRecord":
+        return cls(
+            id=str(document["recipe-id"]),
+            name=document.get("recipe_name") or document.get("name", ""),
+            roles=tuple(document.get("food_role", [])),
+            is_vegan=bool(document.get("isVegan", False)),
+            is_gluten_free=bool(document.get("isGlutenFree", False)),
+            is_low_sugar=bool(document.get("isLowSugar", False)),
+            has_dairy=bool(document.get("hasDairy", False)),
+            has_meat=bool(document.get("hasMeat", False)),
+            has_nuts=bool(document.get("hasNuts", False)),
+            nutrients=parse_nutrients(document),
+        )
+
+    def __repr__(self):
+        return f"RecipeRecord({self.id!r}, {self.name!r})"
+
+
+class DocumentStore:
+    """Read-only mapping of item id -> encoded document.
+
+    All documents live back to back in a single buffer (a bytes object, or the
+    mmap of a snapshot file), so each document only costs one (offset, length)
+    entry until it is actually requested. Documents changed since the buffer
+    was written are kept in a small overlay (id -> bytes, None once removed).
+    """
+
+    __slots__ = ("_buffer", "_base", "_spans", "_overlay", "_length")
+
+    def __init__(
+        self,
+        buffer,
+        spans: Dict[str, Tuple[int, int]],
+        base: int = 0,
+        overlay: Optional[Dict[str, Optional[bytes]]] = None,
+    ):
+        self._buffer = buffer
+        self._base = base
+        self._spans = spans
+        self._overlay = overlay or {}
+        self._length = len(spans)
+        for item_id, raw in self._overlay.items():
+            if item_id in spans and raw is None:
+                self._length -= 1
+            elif item_id not in spans and raw is not None:
+                self._length += 1
+
+    @classmethod
+    def from_encoded(cls, encoded: Iterable[Tuple[str, bytes]]) -> "DocumentStore":
+        buffer = bytearray()
+        spans = {}
+        for item_id, raw in encoded:
+            spans[item_id] = (len(buffer), len(raw))
+            buffer += raw
+        return cls(bytes(buffer), spans)
+
+    def with_changes(self, changes: Dict[str, Optional[bytes]]) -> "DocumentStore":
+        """New store with some documents replaced, added or removed (None), sharing this one's buffer"""
+        return DocumentStore(
+            self._buffer, self._spans, self._base, {**self._overlay, **changes}
+        )
+
+    def get(self, item_id: str) -> Optional[bytes]:
+        if item_id in self._overlay:
+            return self._overlay[item_id]
+        span = self._spans.get(item_id)
+        if span is None:
+            return None
+        start = self._base + span[0]
+        return self._buffer[start : start + span[1]]
+
+    def items(self) -> Iterator[Tuple[str, bytes]]:
+        for item_id in self:
+            yield item_id, self.get(item_id)
+
+    def __contains__(self, item_id):
+        if item_id in self._overlay:
+            return self._overlay[item_id] is not None
+        return item_id in self._spans
+
+    def __iter__(self):
+        overlay = self._overlay
+        for item_id in self._spans:
+            if item_id not in overlay or overlay[item_id] is not None:
+                yield item_id
+        for item_id, raw in overlay.items():
+            if raw is not None and item_id not in self._spans:
+                yield item_id
+
+    def __len__(self):
+        return self._length
+
+
+class CatalogChanges:
+    """Recipes and beverages added or modified (id -> document) or removed (id -> None)"""
+
+    __slots__ = ("recipes", "beverages")
+
+    def __init__(
+        self,
+        recipes: Optional[Dict[str, Optional[Dict]]] = None,
+        beverages: Optional[Dict[str, Optional[Dict]]] = None,
+    ):
+        self.recipes = recipes or {}
+        self.beverages = beverages or {}
+
+    def merged(self, later: "CatalogChanges") -> "CatalogChanges":
+        """Changes of this batch followed by the later one"""
+        return CatalogChanges(
+            {**self.recipes, **later.recipes}, {**self.beverages, **later.beverages}
+        )
+
+    def __bool__(self):
+        return bool(self.recipes or self.beverages)
+
+    def __repr__(self):
+        return (
+            f"CatalogChanges(recipes={len(self.recipes)}, "
+            f"beverages={len(self.beverages)})"
+        )
+
+
+class Catalog:
+    """Recipes and beverages keyed by id, with lazy access to the full documents"""
+
+    def __init__(
+        self,
+        recipes: Dict[str, RecipeRecord],
+        beverages: Dict[str, BeverageRecord],
+        recipe_documents: DocumentStore,
+        beverage_documents: DocumentStore,
+        version: str,
+    ):
+        self.recipes = recipes
+        self.beverages = beverages
+        self.recipe_documents = recipe_documents
+        self.beverage_documents = beverage_documents
+        self.version = version
+        # indexes derived from this version of the catalog, see derived()
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+        # indexes of the previous versions, which derived() may update
+        # incrementally: name -> (index, changes since, None if unknown)
+        self._previous_derived = {}
+        self._inherited = False
+
+    @classmethod
+    def from_documents(
+        cls, recipe_docs: Iterable[Dict], beverage_docs: Iterable[Dict]
+    ) -> "Catalog":
+        """Build a catalog from (possibly streamed) Firestore documents.
+
+        Documents are consumed one at a time, so the full dictionaries never
+        have to be held in memory all at once.
+        """
+        recipes, encoded_recipes = {}, []
+        for doc in recipe_docs:
+            record = RecipeRecord.from_document(doc)
+            recipes[record.id] = record
+            encoded_recipes.append((record.id, encode_document(doc)))
+
+        beverages, encoded_bevs = {}, []
+        for doc in beverage_docs:
+            record = BeverageRecord.from_document(doc)
+            beverages[record.id] = record
+            encoded_bevs.append((record.id, encode_document(doc)))
+
+        recipe_documents = DocumentStore.from_encoded(encoded_recipes)
+        beverage_documents = DocumentStore.from_encoded(encoded_bevs)
+        version = cls.compute_version(recipe_documents, beverage_documents)
+        return cls(recipes, beverages, recipe_documents, beverage_documents, version)
+
+    @staticmethod
+    def compute_version(
+        recipe_documents: DocumentStore, beverage_documents: DocumentStore
+    ) -> str:
+        """Content hash of the catalog, changes whenever any document changes.
+
+        It is the sum of the hashes of the documents, which does not depend on
+        their order and is updated document by document (see apply_changes).
+        """
+        total = 0
+        for prefix, documents in (
+            (b"r", recipe_documents),
+            (b"b", beverage_documents),
+        ):
+            for item_id, raw in documents.items():
+                total += _document_hash(prefix, item_id, raw)
+        return _version(total)
+
+    def __len__(self):
+        return len(self.recipes) + len(self.beverages)
+
+    def __repr__(self):
+        return (
+            f"Catalog(version={self.version!r}, recipes={len(self.recipes)}, "
+            f"beverages={len(self.beverages)})"
+        )
+
+    def get_recipe(self, recipe_id: str) -> Optional[RecipeRecord]:
+        return self.recipes.get(recipe_id)
+
+    def get_beverage(self, beverage_id: str) -> Optional[BeverageRecord]:
+        return self.beverages.get(beverage_id)
+
+    def recipe_ids(self) -> List[str]:
+        return list(self.recipes)
+
+    def beverage_ids(self) -> List[str]:
+        return list(self.beverages)
+
+    def recipe_document(self, recipe_id: str) -> Optional[Dict]:
+        """Decode the full R3 document of a recipe, returns a fresh dictionary"""
+        raw = self.recipe_documents.get(recipe_id)
+        return json.loads(raw) if raw is not None else None
+
+    def beverage_document(self, beverage_id: str) -> Optional[Dict]:
+        """Decode the full document of a beverage, returns a fresh dictionary"""
+        raw = self.beverage_documents.get(beverage_id)
+        return json.loads(raw) if raw is not None else None
+
+    def derived(
+        self,
+        name: str,
+        build: Callable[["Catalog"], Any],
+        update: Optional[
+            Callable[[Any, "Catalog", Optional[CatalogChanges]], Any]
+        ] = None,
+    ) -> Any:
+        """Index derived from this version of the catalog (ingredient index, ...).
+
+        It is built with build(catalog) on first use and then shared. When the
+        catalog replaced a previous version which had already built the index
+        and update is given, update(previous index, catalog, changes) derives
+        it incrementally instead, changes is None when they are not known (the
+        whole catalog was replaced). update must not modify the previous
+        index, requests may still be using it.
+        """
+        index = self._derived.get(name)
+        if index is None:
+            with self._derived_lock:
+                index = self._derived.get(name)
+                if index is None:
+                    previous, changes = self._previous_derived.pop(name, (None, None))
+                    if previous is not None and update is not None:
+                        index = update(previous, self, changes)
+                    else:
+                        index = build(self)
+                    self._derived[name] = index
+        return index
+
+    def inherit_derived(
+        self, previous: "Catalog", changes: Optional[CatalogChanges] = None
+    ):
+        """Keep the indexes of the catalog this one replaces, for derived() to update.
+
+        changes are the ones applied to previous to get this catalog, if known.
+        """
+        inherited = {}
+        for name, (index, earlier) in previous._previous_derived.items():
+            known = earlier is not None and changes is not None
+            inherited[name] = (index, earlier.merged(changes) if known else None)
+        for name, index in previous._derived.items():
+            inherited[name] = (index, changes)
+        self._previous_derived = inherited
+        self._inherited = True
+
+    def apply_changes(self, changes: CatalogChanges) -> "Catalog":
+        """New catalog version with the changes applied, this one is left untouched.
+
+        Changes which leave a document as it is are ignored, and this catalog is
+        returned as is when nothing actually changed. The new catalog derives
+        its indexes from this one's, updating only the changed items.
+        """
+        recipes, recipe_updates, recipe_changes = self._changed_items(
+            self.recipes, self.recipe_documents, RecipeRecord, changes.recipes
+        )
+        beverages, beverage_updates, beverage_changes = self._changed_items(
+            self.beverages, self.beverage_documents, BeverageRecord, changes.beverages
+        )
+        effective = CatalogChanges(recipe_changes, beverage_changes)
+        if not effective:
+            return self
+
+        # only the hashes of the changed documents are swapped in the version
+        total = int(self.version, 16)
+        for prefix, documents, updates in (
+            (b"r", self.recipe_documents, recipe_updates),
+            (b"b", self.beverage_documents, beverage_updates),
+        ):
+            for item_id, raw in updates.items():
+                previous = documents.get(item_id)
+                if previous is not None:
+                    total -= _document_hash(prefix, item_id, previous)
+                if raw is not None:
+                    total += _document_hash(prefix, item_id, raw)
+
+        catalog = Catalog(
+            recipes,
+            beverages,
+            self.recipe_documents.with_changes(recipe_updates),
+            self.beverage_documents.with_changes(beverage_updates),
+            _version(total),
+        )
+        catalog.inherit_derived(self, effective)
+        return catalog
+
+    @staticmethod
+    def _changed_items(records, documents, record_type, changes):
+        """Apply changes to a copy of records, skipping documents which did not change.
+        Returns the new records (the same ones when nothing changed), the encoded
+        document updates and the effective changes
+        """
+        updates, effective = {}, {}
+        for item_id, document in changes.items():
+            if document is None:
+                if item_id in documents:
+                    updates[item_id] = effective[item_id] = None
+                continue
+            raw = encode_document(document)
+            if documents.get(item_id) == raw:
+                continue
+            updates[item_id] = raw
+            effective[item_id] = document
+        if not effective:
+            return records, updates, effective
+
+        records = dict(records)
+        for item_id, document in effective.items():
+            if document is None:
+                records.pop(item_id, None)
+            else:
+                records[item_id] = record_type.from_document(document)
+        return records, updates, effective
+
+    def document_etag(self, raw: bytes) -> str:
+        """Strong entity tag of an encoded document within this catalog version"""
+        item_hash = hashlib.blake2b(raw, digest_size=8).hexdigest()
+        return f"{self.version}-{item_hash}"
+
+
+# Process-wide catalog
+
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+# set by warmup(): the indexes requests need are derived before a catalog version is swapped in
+_prepare_indexes = False
+# cleared by warmup() when the catalog is kept in sync, the listeners reconcile it instead
+_reconcile_on_load = True
+# kinds of items ("recipes", "beverages") the listeners have listed in full
+_listed = set()
+
+
+def get_catalog() -> Catalog:
+    """Return the process-wide catalog, loading it on first use"""
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                set_catalog(load_catalog(reconcile=_reconcile_on_load))
+    return _catalog
+
+
+def set_catalog(catalog: Catalog):
+    """Swap the process-wide catalog, e.g. after reconciling with Firestore"""
+    global _catalog
+    if catalog is not None and _catalog is not None and not catalog._inherited:
+        catalog.inherit_derived(_catalog)
+    if catalog is not None and _prepare_indexes:
+        prepare_indexes(catalog)
+    _catalog = catalog
+
+
+def prepare_indexes(catalog: Catalog):
+    """Build the indexes of a catalog version which requests use right away, or derive
+    them from the previous version's, so that its first requests do not wait for them.
+    """
+    from .search_index import search_index
+
+    search_index(catalog)
+
+
+def load_catalog(reconcile: bool = True) -> Catalog:
+    """Load the catalog from the local snapshot, falling back to Firestore.
+
+    When the snapshot is used and reconcile is set, a daemon thread fetches the
+    live catalog from Firestore and swaps it in if it differs from the snapshot.
+    """
+    from .catalog_snapshot import read_snapshot
+
+    snapshot_path = settings.CATALOG_SNAPSHOT_PATH
+    try:
+        catalog = read_snapshot(snapshot_path)
+        logger.info(
+            colored(f"Loaded catalog {catalog.version} from {snapshot_path}", "green")
+        )
+    except FileNotFoundError:
+        logger.info(colored(f"No catalog snapshot at {snapshot_path}", "yellow"))
+        return fetch_catalog()
+    except Exception as e:
+        logger.warning(colored(f"Ignoring catalog snapshot: {e}", "red"))
+        return fetch_catalog()
+
+    if reconcile:
+        start_reconcile(catalog)
+    return catalog
+
+
+def start_reconcile(base: Optional[Catalog] = None):
+    """Reconcile the catalog with Firestore in a daemon thread (see reconcile_catalog)"""
+    threading.Thread(
+        target=reconcile_catalog,
+        args=(base,),
+        name="catalog-reconcile",
+        daemon=True,
+    ).start()
+
+
+def fetch_catalog() -> Catalog:
+    """Download the live catalog from Firestore"""
+    from .firebase import FirebaseManager
+
+    catalog, status = FirebaseManager().fetch_catalog()
+    if status != 200:
+        raise RuntimeError(catalog)
+    logger.info(colored(f"Fetched catalog {catalog.version} from Firestore", "green"))
+    return catalog
+
+
+def reconcile_catalog(base: Optional[Catalog] = None):
+    """Replace the base catalog (the current one by default) with the live
+    Firestore catalog if they differ"""
+    if _listed >= {"recipes", "beverages"}:
+        logger.info(colored("Catalog already reconciled by the listeners", "green"))
+        return
+    try:
+        live = fetch_catalog()
+    except Exception as e:
+        logger.warning(
+            colored(f"Could not reconcile catalog with Firestore: {e}", "red")
+        )
+        return
+
+    # waits for get_catalog() to finish installing the catalog it is loading
+    with _catalog_lock:
+        base = base or _catalog
+        if base is not None and base.version == live.version:
+            logger.info(colored("Catalog snapshot is up to date", "green"))
+            return
+        if _catalog is not base:
+            # somebody already swapped in a newer catalog
+            return
+
+        logger.info(
+            colored(
+                f"Catalog snapshot is stale, switching to Firestore version {live.version}",
+                "yellow",
+            )
+        )
+        set_catalog(live)
+
+
+def apply_catalog_changes(changes: CatalogChanges, listing: Optional[str] = None):
+    """Apply a batch of live changes to the process-wide catalog.
+
+    The new version derives its indexes from the current one's, updating only
+    the changed items; requests still holding the current catalog are not
+    affected. listing is set to the kind of items ("recipes" or "beverages")
+    when the changes list every item of that kind, like the first batch of a
+    listener: the items missing from them were removed.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            # the catalog is loaded from scratch on first use
+            return
+        if listing is not None:
+            listed = getattr(changes, listing)
+            removed = {
+                item_id: None
+                for item_id in getattr(_catalog, listing)
+                if item_id not in listed
+            }
+            changes = CatalogChanges(**{listing: {**listed, **removed}})
+            _listed.add(listing)
+        catalog = _catalog.apply_changes(changes)
+        if catalog is _catalog:
+            return
+        set_catalog(catalog)
+    logger.info(
+        colored(
+            f"Applied {len(changes.recipes)} recipe and {len(changes.beverages)} "
+            f"beverage changes, catalog is now {catalog.version}",
+            "green",
+        )
+    )
+
+
+_watches = None
+_watches_lock = threading.Lock()
+
+
+def watch_catalog():
+    """Keep the process-wide catalog in sync with Firestore through snapshot listeners.
+
+    Listeners are started once per process. Their first batch lists every
+    document, which reconciles the catalog with Firestore (and leaves one that
+    is already up to date unchanged). When they cannot be started, the catalog
+    is reconciled by downloading it instead.
+    """
+    global _watches
+    from .firebase import FirebaseManager
+
+    with _watches_lock:
+        if _watches is not None:
+            return
+        watches, status = FirebaseManager().watch_catalog(apply_catalog_changes)
+        if status != 200:
+            logger.warning(colored(watches, "red"))
+            if not _reconcile_on_load:
+                start_reconcile()
+            return
+        _watches = watches
+    logger.info(colored("Watching Firestore for catalog changes", "green"))
+
+
+def warmup():
+    """Load the catalog, build its search index and connect to Firestore before serving
+    the first request. The indexes of the catalog versions swapped in afterwards
+    (reconciled or live changes) are then derived before they replace the current one.
+
+    Called by the WSGI and ASGI entry points, management commands and tests
+    leave everything to be initialized on first use.
+    """
+    global _prepare_indexes, _reconcile_on_load
+    from .firebase import FirebaseManager
+
+    start = time.time()
+    _prepare_indexes = True
+    # the first batch of the listeners reconciles the catalog, no need to download it twice
+    _reconcile_on_load = not settings.CATALOG_LIVE_SYNC
+    prepare_indexes(get_catalog())
+    FirebaseManager().db
+    if settings.CATALOG_LIVE_SYNC:
+        watch_catalog()
+    logger.info(colored(f"Warmed up in {time.time() - start:.2f} seconds", "green"))
@@ -0,0 +1,183 @@
+"""Versioned binary snapshot of the catalog for fast, offline startup
+
+Layout of a snapshot file:
+
+    magic (8 bytes)  |  header length (uint32)  |  JSON header
+    record table     |  documents
+
+The JSON header holds the format and catalog versions, a string table (ids,
+names and meal role combinations) and the offsets of the other two sections.
+The record table is a packed array of fixed size records (see RECORD_FORMAT)
+referencing the string table, and the documents section holds every encoded
+document back to back. The file is mmapped when read, so the documents are
+served straight from the page cache (and shared between worker processes)
+until a request decodes one.
+"""
+
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+from typing import Dict, List
+
+from .catalog import (
+    BeverageRecord,
+    Catalog,
+    DocumentStore,
+    RecipeRecord,
+    NUTRIENTS,
+)
+
+MAGIC = b"BOHCATLG"
+# 2: the catalog version is the sum of the document hashes (see Catalog.compute_version)
+FORMAT_VERSION = 2
+
+_HEADER_LENGTH = struct.Struct("<I")
+
+# id string, name string, role set, flags, nutrients, document offset, document length
+RECORD_FORMAT = struct.Struct(f"<IIHB{len(NUTRIENTS)}dQI")
+
+# bit of each boolean field inside the packed flags byte
+FLAG_BITS = {
+    "is_vegan": 1 << 0,
+    "is_gluten_free": 1 << 1,
+    "is_low_sugar": 1 << 2,
+    "has_dairy": 1 << 3,
+    "has_meat": 1 << 4,
+    "has_nuts": 1 << 5,
+}
+
+_RECIPE_FLAGS = tuple(FLAG_BITS)
+_BEVERAGE_FLAGS = ("has_dairy", "has_meat", "has_nuts")
+
+
+def write_snapshot(catalog: Catalog, path) -> int:
+    """Write the catalog to path atomically. Returns the size of the file in bytes"""
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+    role_sets: List[List[str]] = []
+    role_set_ids: Dict[tuple, int] = {}
+
+    def intern_string(value: str) -> int:
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    def intern_roles(roles: tuple) -> int:
+        if roles not in role_set_ids:
+            role_set_ids[roles] = len(role_sets)
+            role_sets.append(list(roles))
+        return role_set_ids[roles]
+
+    records = bytearray()
+    documents = bytearray()
+    for items, store, flag_names in (
+        (catalog.recipes, catalog.recipe_documents, _RECIPE_FLAGS),
+        (catalog.beverages, catalog.beverage_documents, _BEVERAGE_FLAGS),
+    ):
+        for record in items.values():
+            raw = store.get(record.id) or b"{}"
+            flags = 0
+            for flag in flag_names:
+                if getattr(record, flag):
+                    flags |= FLAG_BITS[flag]
+            records += RECORD_FORMAT.pack(
+                intern_string(record.id),
+                intern_string(record.name),
+                intern_roles(getattr(record, "roles", ())),
+                flags,
+                *record.nutrients,
+                len(documents),
+                len(raw),
+            )
+            documents += raw
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "catalog_version": catalog.version,
+        "created_at": datetime.now().isoformat(),
+        "recipes": len(catalog.recipes),
+        "beverages": len(catalog.beverages),
+        "nutrients": list(NUTRIENTS),
+        "strings": strings,
+        "role_sets": role_sets,
+        "records_length": len(records),
+        "documents_length": len(documents),
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(MAGIC)
+        file.write(_HEADER_LENGTH.pack(len(header_bytes)))
+        file.write(header_bytes)
+        file.write(records)
+        file.write(documents)
+    # readers either see the previous snapshot or the complete new one
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def read_snapshot_header(buffer) -> Dict:
+    """Validate the magic and format version of a snapshot and return its header"""
+    if buffer[: len(MAGIC)] != MAGIC:
+        raise ValueError("Not a catalog snapshot file")
+    (header_length,) = _HEADER_LENGTH.unpack_from(buffer, len(MAGIC))
+    header_start = len(MAGIC) + _HEADER_LENGTH.size
+    header = json.loads(buffer[header_start : header_start + header_length])
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported catalog snapshot format {header.get('format_version')}, expected {FORMAT_VERSION}"
+        )
+    header["records_offset"] = header_start + header_length
+    header["documents_offset"] = header["records_offset"] + header["records_length"]
+    return header
+
+
+def read_snapshot(path) -> Catalog:
+    """Load a catalog from a snapshot file. Documents stay in the mmapped file"""
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    header = read_snapshot_header(buffer)
+    strings = header["strings"]
+    role_sets = [tuple(roles) for roles in header["role_sets"]]
+    num_recipes = header["recipes"]
+
+    recipes, recipe_spans = {}, {}
+    beverages, beverage_spans = {}, {}
+    records_offset = header["records_offset"]
+    records = buffer[records_offset : records_offset + header["records_length"]]
+    for index, (id_index, name_index, roles_index, flags, *rest) in enumerate(
+        RECORD_FORMAT.iter_unpack(records)
+    ):
+        *nutrients, doc_offset, doc_length = rest
+        item_id = strings[id_index]
+        if index < num_recipes:
+            recipes[item_id] = RecipeRecord(
+                item_id,
+                strings[name_index],
+                role_sets[roles_index],
+                *(bool(flags & FLAG_BITS[flag]) for flag in _RECIPE_FLAGS),
+                nutrients=tuple(nutrients),
+            )
+            recipe_spans[item_id] = (doc_offset, doc_length)
+        else:
+            beverages[item_id] = BeverageRecord(
+                item_id,
+                strings[name_index],
+                *(bool(flags & FLAG_BITS[flag]) for flag in _BEVERAGE_FLAGS),
+                nutrients=tuple(nutrients),
+            )
+            beverage_spans[item_id] = (doc_offset, doc_length)
+
+    documents_offset = header["documents_offset"]
+    return Catalog(
+        recipes,
+        beverages,
+        DocumentStore(buffer, recipe_spans, base=documents_offset),
+        DocumentStore(buffer, beverage_spans, base=documents_offset),
+        header["catalog_version"],
+    )
@@ -0,0 +1,184 @@
+"""Offline evaluation of recommendation quality against cost
+
+Generates plans for every user profile the recommender distinguishes: the 27
+preference profiles of the bandit (dislike / neutral / like dairy, meat and
+nuts) crossed with the 16 combinations of dietary conditions. Every plan is
+scored with calculate_goodness, and the distributions of the meal scores are
+reported together with the throughput and the latency percentiles of
+generating and scoring, so generators can be compared on both.
+
+Plans are seeded from the evaluation seed and their profile, so two runs with
+the same seed and catalog draw the same plans.
+"""
+
+import itertools
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .recommendation_helpers import calculate_goodness, cached_candidate_pools
+from .seeding import PLAN_STAGE, derive_seed, stage_rng
+
+PREFERENCES = ("dairyPreference", "meatPreference", "nutsPreference")
+
+# In the order of the users of the bandit (see get_bandit_favorite_items)
+PREFERENCE_PROFILES = [
+    dict(zip(PREFERENCES, opinions))
+    for opinions in itertools.product((0, 1, -1), repeat=3)
+]
+
+DIETARY_CONDITIONS = ("diabetes", "gluten_free", "vegan", "vegetarian")
+
+DIETARY_COMBINATIONS = [
+    dict(zip(DIETARY_CONDITIONS, flags))
+    for flags in itertools.product((False, True), repeat=len(DIETARY_CONDITIONS))
+]
+
+SCORES = {
+    "variety": "variety_scores",
+    "coverage": "coverage_scores",
+    "constraint": "constraint_scores",
+}
+
+# Draws the days of a plan from candidate pools:
+# (pools, meal_configs, num_days, starting_date, user_preferences, rng) -> days
+PlanGenerator = Callable[
+    [
+        Dict[str, List[str]],
+        List[Dict],
+        int,
+        datetime,
+        Dict[str, int],
+        np.random.Generator,
+    ],
+    Dict,
+]
+
+# Favorite items of a profile: (user_preferences, dietary_conditions) -> favorites
+Favorites = Callable[[Dict[str, int], Dict[str, bool]], Dict[str, List[str]]]
+
+
+def percentiles(
+    values: Sequence[float], points: Sequence[int] = (50, 90, 99)
+) -> Dict[str, float]:
+    """{"p50": ..., "p90": ..., "p99": ...} of the values, empty without values"""
+    if not len(values):
+        return {}
+    return {
+        f"p{point}": round(float(value), 3)
+        for point, value in zip(points, np.percentile(values, points))
+    }
+
+
+def distribution(values: Sequence[float]) -> Dict[str, float]:
+    """Mean, extremes and deciles of the values, empty without values"""
+    if not len(values):
+        return {}
+    values = np.asarray(values, dtype=float)
+    return {
+        "mean": round(float(values.mean()), 4),
+        "min": round(float(values.min()), 4),
+        **{
+            name: round(value, 4)
+            for name, value in percentiles(values, (10, 50, 90)).items()
+        },
+        "max": round(float(values.max()), 4),
+    }
+
+
+def evaluate_generator(
+    generate: PlanGenerator,
+    meal_configs: List[Dict],
+    num_days: int = 7,
+    plans_per_profile: int = 1,
+    seed: int = 0,
+    favorites: Optional[Favorites] = None,
+    starting_date: Optional[datetime] = None,
+) -> Dict:
+    """Generate and score plans_per_profile plans for every preference profile
+    and combination of dietary conditions, and report the score distributions
+    and costs.
+
+    Keyword arguments:
+    favorites     -- Favorite items of a profile, none by default: every role then
+                     draws from the catalog items compatible with the dietary
+                     conditions (see candidate_pools)
+    starting_date -- First day of the plans, 2025-01-01 by default
+
+    Plans that cannot be generated (e.g. no item left after the dietary
+    filters) are counted as failures of their dietary conditions.
+    """
+    starting_date = starting_date or datetime(2025, 1, 1)
+    scores = {metric: [] for metric in SCORES}
+    generate_ms, score_ms, total_ms = [], [], []
+    conditions = []
+
+    start = time.perf_counter()
+    for dietary_conditions in DIETARY_COMBINATIONS:
+        row = {
+            "dietary_conditions": dietary_conditions,
+            "plans": 0,
+            "failures": 0,
+            "error": None,
+            "scores": {metric: [] for metric in SCORES},
+        }
+        for user_preferences in PREFERENCE_PROFILES:
+            favorite_items = (
+                favorites(user_preferences, dietary_conditions) if favorites else {}
+            )
+            for index in range(plans_per_profile):
+                rng = stage_rng(
+                    derive_seed(seed, user_preferences, dietary_conditions, index),
+                    PLAN_STAGE,
+                )
+                plan_start = time.perf_counter()
+                try:
+                    pools = cached_candidate_pools(
+                        favorite_items, meal_configs, dietary_conditions
+                    )
+                    days = generate(
+                        pools,
+                        meal_configs,
+                        num_days,
+                        starting_date,
+                        user_preferences,
+                        rng,
+                    )
+                except Exception as e:
+                    row["failures"] += 1
+                    row["error"] = row["error"] or str(e)
+                    continue
+                generated = time.perf_counter()
+                goodness = calculate_goodness(days, meal_configs, user_preferences)
+                scored = time.perf_counter()
+
+                generate_ms.append((generated - plan_start) * 1000)
+                score_ms.append((scored - generated) * 1000)
+                total_ms.append((scored - plan_start) * 1000)
+                row["plans"] += 1
+                for metric, key in SCORES.items():
+                    scores[metric].extend(goodness[key])
+                    row["scores"][metric].extend(goodness[key])
+        row["scores"] = {
+            metric: round(float(np.mean(values)), 4) if values else None
+            for metric, values in row["scores"].items()
+        }
+        conditions.append(row)
+    elapsed = time.perf_counter() - start
+
+    num_plans = len(total_ms)
+    return {
+        "plans": num_plans,
+        "failures": sum(row["failures"] for row in conditions),
+        "elapsed_s": round(elapsed, 3),
+        "plans_per_second": round(num_plans / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "generate": percentiles(generate_ms),
+            "score": percentiles(score_ms),
+            "total": percentiles(total_ms),
+        },
+        "scores": {metric: distribution(values) for metric, values in scores.items()},
+        "conditions": conditions,
+    }
@@ -1,10 +1,10 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 from functools import cache
 from typing import List, Dict
 from .user import User
+from .catalog import Catalog, CatalogChanges
 import logging
 from termcolor import colored
+import threading
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
 logger = logging.getLogger(__name__)
@@ -12,17 +12,36 @@ logger = logging.getLogger(__name__)
 # Path to  service account key JSON file (CHANGE FOR AWS)
 SERVICE_ACCOUNT_FILE = "firebase_key.json"
 
+# Firestore accepts at most 500 writes per batch
+FIRESTORE_BATCH_SIZE = 500
+
 
 class FirebaseManager:
     _instance = None
+    _db = None
+    _db_lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(FirebaseManager, cls).__new__(cls)
-            cls._instance._initialize_firebase()
         return cls._instance
 
+    @property
+    def db(self):
+        """
+        Firestore client, created on first use so importing and constructing the manager stays cheap.
+        """
+        if self._db is None:
+            with self._db_lock:
+                if self._db is None:
+                    self._initialize_firebase()
+        return self._db
+
     def _initialize_firebase(self):
+        # firebase_admin pulls in the whole Google Cloud client stack, only import it when connecting
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
         try:
             # Try to get the default app, which will raise an error if not initialized
             firebase_admin.get_app()
@@ -32,7 +51,7 @@ class FirebaseManager:
             firebase_admin.initialize_app(cred)
 
         # Initialize Firestore database
-        self.db = firestore.client()
+        self._db = firestore.client()
 
     """General functions for adding, retrieving, and deleting a function based on collection name and doc id"""
 
@@ -113,11 +132,35 @@ class FirebaseManager:
         except Exception as e:
             return (f"Error updating document: {e}", 500)
 
+    def _update_documents_batched(self, collection_name, updates: Dict[str, Dict]):
+        """
+        Updates fields of many documents of a collection with batched writes
+        ({document id: {field: value}}, at most 500 writes per batch).
+        Returns a tuple: (number of documents updated or error message, status code)
+        """
+        try:
+            collection = self.db.collection(collection_name)
+            updated = 0
+            batch = self.db.batch()
+            for document_id, fields in updates.items():
+                batch.update(collection.document(document_id), fields)
+                updated += 1
+                if updated % FIRESTORE_BATCH_SIZE == 0:
+                    batch.commit()
+                    batch = self.db.batch()
+            if updated % FIRESTORE_BATCH_SIZE:
+                batch.commit()
+            return (updated, 200)
+        except Exception as e:
+            return (f"Error updating documents: {e}", 500)
+
     def _update_document_list_attr(self, collection_name, document_id, key, list_val):
         """
         Appends an element to a list in a Firestore document.
         Returns a tuple: (result message, status code)
         """
+        from firebase_admin import firestore
+
         try:
             doc_ref = self.db.collection(collection_name).document(document_id)
             doc_ref.update({key: firestore.ArrayUnion([list_val])})
@@ -214,6 +257,25 @@ class FirebaseManager:
         except Exception as e:
             return (f"Error retrieving user {user_id}: {e}", 500)
 
+    def get_users_by_id(self, user_ids: List[str]):
+        """
+        Retrieves many users from Firestore in one batched read.
+        Returns a tuple: ({user id: User} of the users that exist or error message, status code)
+        """
+        try:
+            collection = self.db.collection("users")
+            snapshots = self.db.get_all(
+                [collection.document(user_id) for user_id in user_ids]
+            )
+            users = {
+                snapshot.id: User(snapshot.to_dict())
+                for snapshot in snapshots
+                if snapshot.exists
+            }
+            return (users, 200)
+        except Exception as e:
+            return (f"Error retrieving users: {e}", 500)
+
     def update_user_attr(self, user_id: str, attr: str, val):
         """
         Updates a user's single attribute
@@ -282,6 +344,75 @@ class FirebaseManager:
         except Exception as e:
             return (f"Error retrieving collection: {e}", 500)
 
+    def fetch_catalog(self):
+        """
+        Retrieves all recipes and beverages from Firestore as a compact Catalog.
+        Documents are streamed into the catalog one at a time instead of being
+        materialized as full dictionaries. Not cached, use catalog.get_catalog()
+        for the process-wide catalog.
+        Returns a tuple: (catalog, status code)
+        """
+        try:
+            recipes_stream = self.db.collection("food-recipes").stream()
+            bevs_stream = self.db.collection("beverages").stream()
+            catalog = Catalog.from_documents(
+                (recipe.to_dict() for recipe in recipes_stream),
+                (bev.to_dict() for bev in bevs_stream),
+            )
+            return (catalog, 200)
+        except Exception as e:
+            return (f"Error retrieving catalog: {e}", 500)
+
+    def watch_catalog(self, on_changes):
+        """
+        Listens to the recipe and beverage collections and calls on_changes(CatalogChanges, listing)
+        with every batch of added, modified and removed documents, from Firestore's
+        listener thread. The first batch of each listener holds every document of its
+        collection, listing is then the kind of items ("recipes" or "beverages"), None otherwise.
+        Returns a tuple: (list of watches, which have an unsubscribe() method, or error message, status code)
+        """
+
+        def listener(id_field, kind):
+            listed = False
+
+            def on_snapshot(snapshots, changes, read_time):
+                nonlocal listed
+                documents = {}
+                for change in changes:
+                    document = change.document.to_dict() or {}
+                    item_id = str(document.get(id_field, change.document.id))
+                    if change.type.name == "REMOVED":
+                        documents[item_id] = None
+                    else:
+                        documents[item_id] = document
+                if documents or not listed:
+                    on_changes(
+                        CatalogChanges(**{kind: documents}), None if listed else kind
+                    )
+                listed = True
+
+            return on_snapshot
+
+        try:
+            watches = [
+                self.db.collection("food-recipes").on_snapshot(
+                    listener("recipe-id", "recipes")
+                ),
+                self.db.collection("beverages").on_snapshot(
+                    listener("bev-id", "beverages")
+                ),
+            ]
+            return (watches, 200)
+        except Exception as e:
+            return (f"Error watching catalog: {e}", 500)
+
+    def update_recipe_annotations(self, annotations: Dict[str, Dict[str, bool]]):
+        """
+        Writes recomputed dietary flags ({recipe id: {"isVegan": ..., ...}}) with batched writes.
+        Returns a tuple: (number of recipes updated or error message, status code)
+        """
+        return self._update_documents_batched("food-recipes", annotations)
+
     def get_single_r3(self, recipe_id: str):
         """
         Retrieves a single recipe (R3 representation) from Firestore.
@@ -440,6 +571,19 @@ class FirebaseManager:
         except Exception as e:
             return (f"There was an issue saving the meal plan: {e}", 500)
 
+    def update_meal_plan(self, user_id, meal_plan, fields: Dict):
+        """
+        Updates fields of a saved meal plan in a single write, e.g. {"days.2025-03-08.meals": [...]}.
+        A plan that was never saved (the update fails) is saved whole with add_meal_plan.
+        Returns a tuple: (result message, status code)
+        """
+        update_res, update_status = self._update_document(
+            "meal_plans", meal_plan["_id"], fields
+        )
+        if update_status == 200:
+            return (update_res, update_status)
+        return self.add_meal_plan(user_id, meal_plan)
+
     def add_dayplan_temp(self, user_id, date, day_plan):
         # in the user object in firebase, we want to store a sub-object of the following form
         # day_plans: {"2025-03-01": day_plan_id}
@@ -465,6 +609,42 @@ class FirebaseManager:
         except Exception as e:
             return (f"There was an issue saving the day plan: {e}", 500)
 
+    def save_generated_plans(
+        self, day_plans: Dict[str, Dict[str, Dict]], user_updates: Dict[str, Dict]
+    ):
+        """
+        Saves the day plans of many users ({user id: {date: day plan}}), like add_dayplan_temp,
+        and updates fields of their user objects ({user id: {field: value}}) with batched writes
+        (at most 500 writes per batch).
+        Returns a tuple: (number of writes or error message, status code)
+        """
+        try:
+            users = self.db.collection("users")
+            temp_day_plans = self.db.collection("temp_day_plans")
+            writes = 0
+            batch = self.db.batch()
+
+            def write(operation: str, reference, data: Dict):
+                nonlocal batch, writes
+                getattr(batch, operation)(reference, data)
+                writes += 1
+                if writes % FIRESTORE_BATCH_SIZE == 0:
+                    batch.commit()
+                    batch = self.db.batch()
+
+            for user_id in dict.fromkeys([*day_plans, *user_updates]):
+                fields = dict(user_updates.get(user_id, {}))
+                for date, day_plan in day_plans.get(user_id, {}).items():
+                    write("set", temp_day_plans.document(day_plan["_id"]), day_plan)
+                    fields[f"temp_day_plans.{date}"] = day_plan["_id"]
+                if fields:
+                    write("update", users.document(user_id), fields)
+            if writes % FIRESTORE_BATCH_SIZE:
+                batch.commit()
+            return (writes, 200)
+        except Exception as e:
+            return (f"Error saving the meal plans: {e}", 500)
+
     def create_dayplan_object(self, user_id: str, date: str, day_plan_id: str):
         # Need to create a dayplan object as well as a reference to it in the user's object
         # if dayplan already exists
@@ -518,6 +698,13 @@ class FirebaseManager:
     def get_dayplan_by_id(self, day_plan_id):
         return self._get_document("day_plans", day_plan_id)
 
+    def update_temp_dayplan(self, day_plan_id: str, fields: Dict):
+        """
+        Updates fields of a saved temporary day plan in a single write, e.g. {"meals": [...]}
+        Returns a tuple: (result message, status code)
+        """
+        return self._update_document("temp_day_plans", day_plan_id, fields)
+
     def store_meal_in_dayplan(self, day_plan_id: str, meal: Dict):
         return self._update_document_dict_attr(
             "day_plans", day_plan_id, "meals", meal["_id"], meal
@@ -0,0 +1,294 @@
+"""Ingredient inverted index and dietary flag annotation of recipes
+
+Recipes are annotated as vegan, gluten free and low sugar when none of their
+ingredients appear in the corresponding rule set below. Ingredient names are
+normalized (case, punctuation and plural folding) on both sides, so "Eggs",
+"egg" and "large eggs" are matched by the same rules as written, and the
+inverted index (normalized ingredient -> recipe ids) turns every flag into a
+union of posting lists instead of a scan over every recipe.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+
+from .catalog import Catalog, CatalogChanges
+
+# Ingredients which make a recipe not vegan
+NOT_VEGAN = {
+    "mayo",
+    "shrimp",
+    "Cheddar & Monterey Jack Cheese",
+    "egg",
+    "pork sausage",
+    "egg whites",
+    "whipped cream",
+    "ground beef",
+    "Canadian Bacon",
+    "chicken broth",
+    "shredded Mexican cheese",
+    "heavy whipping cream",
+    "American cheese",
+    "Shredded Mexican Cheese Blend",
+    "bacon",
+    "ranch seasoning",
+    "sausage",
+    "mayyonnaise",
+    "cheddar cheese",
+    "nacho cheese sauce",
+    "beef bouillon powder",
+    "ground beef chuck",
+    "buttermilk",
+    "softened butter",
+    "Nacho Cheese",
+    "salmon",
+    "applewood smoked bacon",
+    "Sour Cream",
+    "Chicken Breast",
+    "beef round roast",
+    "Unsalted butter",
+    "shredded cheddar cheese",
+    "plain non-fat Greek yogurt",
+    "melted butter",
+    "Hidden Valley Original Ranch Seasoning and Salad Dressing Mix",
+    "egg yolks",
+    "butter",
+    "large eggs",
+    "half and half",
+    "ham",
+    "finely shredded cheese",
+    "cheese",
+    "chicken",
+    "ground chuck",
+    "sausage patties",
+    "egg mixture",
+    "milk",
+    "mayonnaise",
+    "boneless skinless chicken breasts",
+}
+
+# Ingredients which contain gluten
+GLUTENOUS = {
+    "quick-cooking oatmeal",
+    "graham crackers",
+    "all-purpose flour",
+    "breadcrumbs",
+    "bread",
+    "phyllo dough",
+    "English Muffins",
+    "hamburger buns",
+    "puff pastry",
+    "puff pastry sheet",
+    "sesame seed hamburger buns",
+    "flour",
+    "crescent rolls",
+    "potato hamburger buns",
+    "Gordita Flour Tortillas",
+    "pancake mix",
+    "Kawan parathas",
+    "burrito sized flour tortillas",
+}
+
+# Ingredients high in sugar
+HIGH_SUGAR = {
+    "Jell-O",
+    "chocolate",
+    "white sugar",
+    "granulated sugar",
+    "applewood smoked bacon",
+    "White Chocolate Chips",
+    "sugar",
+    "whipped cream",
+    "sprinkle for eyes",
+    "Yellow and Green M&M",
+    "sprinkle for nose",
+    "brown sugar",
+    "graham crackers",
+    "sprinkle for mouth",
+    "chocolate chips",
+    "Melted chocolate chips & chopped walnuts",
+    "Craisins",
+    "vanilla",
+    "caramel ice cream topping",
+    "pancake syrup",
+    "honey",
+    "peanut butter candy",
+    "powdered sugar",
+    "maple syrup",
+}
+
+# R3 flag -> ingredients which make it false
+DIETARY_RULES = {
+    "isVegan": NOT_VEGAN,
+    "isGlutenFree": GLUTENOUS,
+    "isLowSugar": HIGH_SUGAR,
+}
+
+# R3 flag -> attribute of the catalog's RecipeRecord
+FLAG_ATTRIBUTES = {
+    "isVegan": "is_vegan",
+    "isGlutenFree": "is_gluten_free",
+    "isLowSugar": "is_low_sugar",
+}
+
+_WORD_PATTERN = re.compile(r"[\w&']+")
+
+
+def fold_plural(word: str) -> str:
+    """Crude English singular of a word, only has to agree with itself"""
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "sses", "xes", "zes", "oes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+# the same few thousand ingredient names come back over and over
+@lru_cache(maxsize=65536)
+def normalize_ingredient(name: str) -> str:
+    """Fold case, punctuation and plurals, e.g. "Large  Eggs" and "large-egg" -> "large egg" """
+    return " ".join(fold_plural(word) for word in _WORD_PATTERN.findall(name.lower()))
+
+
+def document_ingredients(document: Dict) -> FrozenSet[str]:
+    """Normalized ingredient names of an R3 document"""
+    names = set()
+    for ingredient in document.get("ingredients") or []:
+        if isinstance(ingredient, dict):
+            name = ingredient.get("name") or ingredient.get("ingredient_name")
+        else:
+            name = ingredient
+        if isinstance(name, str) and name.strip():
+            names.add(normalize_ingredient(name))
+    return frozenset(names)
+
+
+class IngredientIndex:
+    """Inverted index of normalized ingredient -> ids of the recipes using it"""
+
+    def __init__(self, recipe_ingredients: Dict[str, FrozenSet[str]]):
+        self.recipe_ingredients: Dict[str, FrozenSet[str]] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        for recipe_id, ingredients in recipe_ingredients.items():
+            self.add_recipe(recipe_id, ingredients)
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Dict]) -> "IngredientIndex":
+        return cls(
+            {
+                str(document["recipe-id"]): document_ingredients(document)
+                for document in documents
+            }
+        )
+
+    @classmethod
+    def from_catalog(cls, catalog: Catalog) -> "IngredientIndex":
+        return cls.from_documents(
+            catalog.recipe_document(recipe_id) for recipe_id in catalog.recipes
+        )
+
+    def updated(
+        self, catalog: Catalog, changes: Optional[CatalogChanges] = None
+    ) -> "IngredientIndex":
+        """Index of a new catalog version, re-indexing only the changed recipes.
+
+        Returns a new index sharing the untouched posting lists with this one,
+        which is left as it is.
+        """
+        if changes is None:
+            return IngredientIndex.from_catalog(catalog)
+        index = IngredientIndex({})
+        index.recipe_ingredients = dict(self.recipe_ingredients)
+        index.postings = dict(self.postings)
+        changed = {
+            recipe_id: None if document is None else document_ingredients(document)
+            for recipe_id, document in changes.recipes.items()
+        }
+        # posting lists are shared with this index, copy the touched ones once
+        touched = set()
+        for recipe_id, ingredients in changed.items():
+            touched |= self.recipe_ingredients.get(recipe_id, frozenset())
+            touched |= ingredients or frozenset()
+        for ingredient in touched & index.postings.keys():
+            index.postings[ingredient] = set(index.postings[ingredient])
+
+        for recipe_id, ingredients in changed.items():
+            if ingredients is None:
+                index.remove_recipe(recipe_id)
+            else:
+                index.add_recipe(recipe_id, ingredients)
+        return index
+
+    def add_recipe(self, recipe_id: str, ingredients: FrozenSet[str]):
+        """Index a recipe, replacing its previous ingredients if it was already indexed"""
+        self.remove_recipe(recipe_id)
+        self.recipe_ingredients[recipe_id] = ingredients
+        for ingredient in ingredients:
+            self.postings.setdefault(ingredient, set()).add(recipe_id)
+
+    def remove_recipe(self, recipe_id: str):
+        for ingredient in self.recipe_ingredients.pop(recipe_id, ()):
+            recipes = self.postings[ingredient]
+            recipes.discard(recipe_id)
+            if not recipes:
+                del self.postings[ingredient]
+
+    def recipes_with(self, ingredients: Iterable[str]) -> Set[str]:
+        """Ids of the recipes using any of the ingredients (raw or normalized names)"""
+        recipes = set()
+        for ingredient in {normalize_ingredient(name) for name in ingredients}:
+            recipes |= self.postings.get(ingredient, set())
+        return recipes
+
+    def __contains__(self, recipe_id):
+        return recipe_id in self.recipe_ingredients
+
+    def __len__(self):
+        return len(self.recipe_ingredients)
+
+
+def ingredient_index(catalog: Catalog) -> IngredientIndex:
+    """Ingredient index of a catalog version, built on first use or derived
+    from the previous version's when the changes between them are known"""
+    return catalog.derived(
+        "ingredients", IngredientIndex.from_catalog, IngredientIndex.updated
+    )
+
+
+def annotate_recipes(
+    index: IngredientIndex,
+    recipe_ids: Optional[Iterable[str]] = None,
+    rules: Dict[str, Set[str]] = DIETARY_RULES,
+) -> Dict[str, Dict[str, bool]]:
+    """Compute the dietary flags of the given recipes (all indexed recipes by default).
+
+    Returns {recipe id: {flag: value}}. Each flag is false for the recipes in the
+    union of the posting lists of its rule's ingredients.
+    """
+    recipe_ids = list(index.recipe_ingredients if recipe_ids is None else recipe_ids)
+    violations = {flag: index.recipes_with(names) for flag, names in rules.items()}
+    return {
+        recipe_id: {flag: recipe_id not in violations[flag] for flag in rules}
+        for recipe_id in recipe_ids
+    }
+
+
+def changed_annotations(
+    catalog: Catalog, annotations: Dict[str, Dict[str, bool]]
+) -> Dict[str, Dict[str, bool]]:
+    """Keep only the flags which differ from the ones currently in the catalog"""
+    changes = {}
+    for recipe_id, flags in annotations.items():
+        record = catalog.get_recipe(recipe_id)
+        changed = {
+            flag: value
+            for flag, value in flags.items()
+            if record is None or getattr(record, FLAG_ATTRIBUTES[flag]) != value
+        }
+        if changed:
+            changes[recipe_id] = changed
+    return changes
@@ -1,18 +1,22 @@
 class Coverage:
-    # Define the meal configuration
-    meal_config = []
+    """Item coverage calculator of a single meal configuration.
 
-    # Define the ideal weight for each role in a meal
-    weights = [1, 1, 1, 1]  # Default ideal weights for each role
+    Every instance keeps its own state, metrics.py scores meals with the
+    stateless scoring.coverage_score instead.
+    """
 
-    # Data augmentation: Define roles each food can take
-    food_items = {}
+    def __init__(self):
+        # Define the meal configuration
+        self.meal_config = []
 
-    # Coverage score
-    coverage = 0
+        # Define the ideal weight for each role in a meal
+        self.weights = [1, 1, 1, 1]  # Default ideal weights for each role
 
-    def __init__(self):
-        print("Constraint Coverage Calculator Locked and Loaded")
+        # Data augmentation: Define roles each food can take
+        self.food_items = {}
+
+        # Coverage score
+        self.coverage = 0
 
     def set_meal_config(self, meal_config: list):
         """Define the meal configuration.
@@ -0,0 +1,138 @@
+"""Batched meal plan generation
+
+Instead of drawing every item of every meal of every day one at a time, all
+the slots of a role (e.g. the main course of breakfast and dinner, for every
+day) are drawn at once from that role's candidate array with a single
+Generator.choice call. The day and meal dictionaries are only assembled at the
+end (see plan_model.py), so long plans cost little more than the dictionaries
+themselves.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .plan_model import PlanGrid
+from .variety import draw_varied_slots
+
+# Meal role of a meal config -> key of the role in the favorite items
+ROLE_ITEMS = {
+    "main_course": "Main Course",
+    "side": "Side",
+    "dessert": "Dessert",
+    "beverage": "Beverage",
+}
+
+
+def meal_roles(meal_configs: List[Dict]) -> List[List[str]]:
+    """Roles requested by each meal config, in the config's order"""
+    return [
+        [role for role, is_present in meal_config["meal_types"].items() if is_present]
+        for meal_config in meal_configs
+    ]
+
+
+def plan_dates(starting_date: datetime, num_days: int) -> List[str]:
+    return [
+        (starting_date + timedelta(days=day_index)).strftime("%Y-%m-%d")
+        for day_index in range(num_days)
+    ]
+
+
+def draw_slots(
+    pools: Dict[str, np.ndarray],
+    roles: List[List[str]],
+    num_days: int,
+    rng: np.random.Generator,
+) -> Dict[str, List[List[str]]]:
+    """Draw the item of every slot of every day, one choice() call per role.
+
+    Returns {role: rows}, where rows[day] lists the items of that role for the
+    meals requesting it, in meal order.
+    """
+    slots_per_role: Dict[str, int] = {}
+    for meal in roles:
+        for role in meal:
+            slots_per_role[role] = slots_per_role.get(role, 0) + 1
+
+    drawn = {}
+    for role, num_slots in slots_per_role.items():
+        pool = pools.get(role)
+        if pool is None or not len(pool):
+            raise ValueError(f"No candidate items for {role}")
+        drawn[role] = rng.choice(pool, size=(num_days, num_slots)).tolist()
+    return drawn
+
+
+def build_days(
+    drawn: Dict[str, List[List[str]]],
+    meal_configs: List[Dict],
+    roles: List[List[str]],
+    dates: Sequence[str],
+    meal_plan_name: str,
+) -> Dict[str, Dict]:
+    """Assemble the {date: {"_id", "meals"}} structure from the drawn items"""
+    return PlanGrid.from_drawn(
+        drawn, meal_configs, roles, dates, meal_plan_name
+    ).to_days()
+
+
+def generate_grid(
+    pools: Dict[str, Sequence[str]],
+    meal_configs: List[Dict],
+    num_days: int,
+    starting_date: datetime,
+    meal_plan_name: str,
+    rng: Optional[np.random.Generator] = None,
+    no_repeat_days: Optional[Dict[str, int]] = None,
+) -> PlanGrid:
+    """Like generate_days, but return the plan as a PlanGrid (see plan_model.py)"""
+    rng = rng or np.random.default_rng()
+    roles = meal_roles(meal_configs)
+    pools = {role: np.asarray(items, dtype=object) for role, items in pools.items()}
+    if no_repeat_days:
+        drawn = draw_varied_slots(pools, roles, num_days, rng, no_repeat_days)
+    else:
+        drawn = draw_slots(pools, roles, num_days, rng)
+    return PlanGrid.from_drawn(
+        drawn,
+        meal_configs,
+        roles,
+        plan_dates(starting_date, num_days),
+        meal_plan_name,
+    )
+
+
+def generate_days(
+    pools: Dict[str, Sequence[str]],
+    meal_configs: List[Dict],
+    num_days: int,
+    starting_date: datetime,
+    meal_plan_name: str,
+    rng: Optional[np.random.Generator] = None,
+    no_repeat_days: Optional[Dict[str, int]] = None,
+) -> Dict[str, Dict]:
+    """Generate a meal plan by drawing each slot uniformly from its role's pool.
+
+    Positional arguments:
+    pools          -- Candidate item ids for each meal role ("main_course", "side", ...)
+    meal_configs   -- List of configuration objects that contain the structure of each user requested meal
+    num_days       -- Length of the meal plan in days
+    starting_date  -- Starting date of the meal plan
+    meal_plan_name -- Name stored on every meal
+    no_repeat_days -- Optional no-repeat window in days of each role (see variety.py),
+                      items are drawn independently without it
+
+    Returns:
+    days           -- A dictionary of day plans, consisting of a sequence of meals for each day
+    """
+    return generate_grid(
+        pools,
+        meal_configs,
+        num_days,
+        starting_date,
+        meal_plan_name,
+        rng,
+        no_repeat_days,
+    ).to_days()
@@ -0,0 +1,268 @@
+"""Score-optimizing meal plan search
+
+Plans are scored meal by meal with the three goodness metrics of metrics.py
+(variety, item coverage and nutritional constraints), combined as a weighted
+sum. The search starts from a batched random draw (see meal_plan_generator.py)
+so that a complete plan exists from the start, then sweeps over the meals
+of every day: the first sweep is a greedy construction (each role
+gets the best candidate given the roles filled before it), later sweeps are
+local search (each role gets the best candidate given the rest of the meal).
+The search stops when a sweep changes nothing or the time budget runs out.
+Only strict improvements are kept, so stopping at any point leaves the best
+plan found so far. Ties between equally good candidates are broken at random,
+which keeps the days from all getting the same meal.
+
+The per-candidate terms are precomputed as arrays for each role, so a slot
+is scored against its whole candidate pool with a few NumPy operations.
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .catalog import Catalog, get_catalog
+from .meal_plan_generator import (
+    build_days,
+    draw_slots,
+    meal_roles,
+    plan_dates,
+)
+from .plan_model import slot_columns
+from .scoring import POPCOUNT, disliked_mask, feature_table, num_constraints
+
+# Weight of each metric in the score of a meal
+DEFAULT_WEIGHTS = {"variety": 1.0, "coverage": 1.0, "constraint": 1.0}
+
+# Number of disliked features among the bits of a feature mask
+_POPCOUNT = np.array(POPCOUNT, dtype=np.int8)
+
+# Scores closer than this are equal
+_EPSILON = 1e-9
+
+
+class RolePool:
+    """Candidates of a meal role, with their per-item score terms"""
+
+    def __init__(self, catalog: Catalog, role: str, items: Sequence[str]):
+        self.items = np.asarray(items, dtype=object)
+        self.index = {item_id: position for position, item_id in enumerate(items)}
+        features = feature_table(catalog)
+        self.covers = np.array(
+            [features.covers(role, item_id) for item_id in items], dtype=bool
+        )
+        self.masks = np.array(
+            [features.mask(role, item_id) for item_id in items], dtype=np.int8
+        )
+
+
+class MealScorer:
+    """Weighted goodness of the meals of a plan, for one user's preferences"""
+
+    def __init__(
+        self,
+        user_preferences: Dict[str, int],
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.variety_weight = weights["variety"]
+        self.coverage_weight = weights["coverage"]
+        self.constraint_weight = weights["constraint"]
+        self.disliked = disliked_mask(user_preferences)
+        self.num_constraints = num_constraints(user_preferences)
+
+    def score(self, num_items: int, num_distinct, coverage, num_configured: int, mask):
+        """Score of meals (scalars or arrays of candidates).
+
+        num_items      -- Number of filled roles
+        num_distinct   -- Number of distinct items among them
+        coverage       -- Sum of +1 for items fitting their role, -1 for the others
+        num_configured -- Number of roles in the meal config, requested or not
+        mask           -- Union of the feature bits of the items
+        """
+        variety = 1 - (num_items - num_distinct) / max(1, num_items)
+        coverage = np.maximum(coverage / max(1, num_configured), 0)
+        violated = _POPCOUNT[np.bitwise_and(mask, self.disliked)]
+        constraint = 1 - violated / self.num_constraints
+        return (
+            self.variety_weight * variety
+            + self.coverage_weight * coverage
+            + self.constraint_weight * constraint
+        )
+
+
+def optimize_slots(
+    drawn: Dict[str, List[List[str]]],
+    pools: Dict[str, RolePool],
+    meal_configs: List[Dict],
+    scorer: MealScorer,
+    rng: np.random.Generator,
+    deadline: float,
+) -> Dict:
+    """Improve the drawn items in place until no slot improves or the deadline passes.
+
+    Returns statistics of the search.
+    """
+    roles = meal_roles(meal_configs)
+    columns = slot_columns(roles)
+    num_configured = [len(meal_config["meal_types"]) for meal_config in meal_configs]
+    num_days = len(next(iter(drawn.values()), []))
+
+    sweeps, improved, completed = 0, 0, False
+    while not completed:
+        if time.perf_counter() >= deadline:
+            break
+        sweeps += 1
+        changed = 0
+        for day in range(num_days):
+            if time.perf_counter() >= deadline:
+                break
+            for meal, configured in zip(columns, num_configured):
+                items = [drawn[role][day][column] for role, column in meal]
+                search = _construct_meal if sweeps == 1 else _improve_meal
+                better = search(items, meal, pools, scorer, rng, configured)
+                if better is not None:
+                    changed += 1
+                    for (role, column), item_id in zip(meal, better):
+                        drawn[role][day][column] = item_id
+        else:
+            completed = not changed
+        improved += changed
+
+    return {"sweeps": sweeps, "improved_meals": improved, "completed": completed}
+
+
+def _construct_meal(items, meal, pools, scorer, rng, configured):
+    """Greedy construction: fill the roles one after the other, each with the
+    best candidate given the roles filled before it. Returns the new items if
+    they score better than the current ones, None otherwise."""
+    constructed = []
+    for position in range(len(meal)):
+        scores = _candidate_scores(
+            constructed, meal, position, pools, scorer, configured
+        )
+        constructed.append(_pick_best(pools[meal[position][0]], scores, rng))
+    if _meal_score(constructed, meal, pools, scorer, configured) > (
+        _meal_score(items, meal, pools, scorer, configured) + _EPSILON
+    ):
+        return constructed
+    return None
+
+
+def _improve_meal(items, meal, pools, scorer, rng, configured):
+    """Local search: replace the item of each role with the best candidate given
+    the rest of the meal. Returns the new items if any improved, None otherwise."""
+    improved = False
+    items = list(items)
+    for position in range(len(meal)):
+        pool = pools[meal[position][0]]
+        others = items[:position] + items[position + 1 :]
+        scores = _candidate_scores(others, meal, position, pools, scorer, configured)
+        if scores[pool.index[items[position]]] < scores.max() - _EPSILON:
+            items[position] = _pick_best(pool, scores, rng)
+            improved = True
+    return items if improved else None
+
+
+def _candidate_scores(others, meal, position, pools, scorer, configured):
+    """Score of the meal made of the other items (of the other roles, in order)
+    and each candidate of the role at position"""
+    other_coverage, other_mask = 0, 0
+    other_roles = [role for index, (role, _) in enumerate(meal) if index != position]
+    for role, item_id in zip(other_roles, others):
+        other_pool = pools[role]
+        item_index = other_pool.index.get(item_id)
+        if item_index is not None:
+            other_coverage += 1 if other_pool.covers[item_index] else -1
+            other_mask |= int(other_pool.masks[item_index])
+        else:
+            other_coverage -= 1
+
+    pool = pools[meal[position][0]]
+    repeated = np.zeros(len(pool.items), dtype=bool)
+    for item_id in others:
+        item_index = pool.index.get(item_id)
+        if item_index is not None:
+            repeated[item_index] = True
+
+    return scorer.score(
+        len(others) + 1,
+        len(set(others)) + ~repeated,
+        other_coverage + np.where(pool.covers, 1, -1),
+        configured,
+        np.bitwise_or(pool.masks, other_mask),
+    )
+
+
+def _meal_score(items, meal, pools, scorer, configured) -> float:
+    last = len(meal) - 1
+    scores = _candidate_scores(items[:last], meal, last, pools, scorer, configured)
+    return float(scores[pools[meal[last][0]].index[items[last]]])
+
+
+def _pick_best(pool: RolePool, scores: np.ndarray, rng: np.random.Generator):
+    """One of the best scoring candidates, at random"""
+    best = np.flatnonzero(scores >= scores.max() - _EPSILON)
+    return pool.items[rng.choice(best)]
+
+
+def optimize_days(
+    pools: Dict[str, Sequence[str]],
+    meal_configs: List[Dict],
+    num_days: int,
+    starting_date: datetime,
+    meal_plan_name: str,
+    user_preferences: Dict[str, int],
+    weights: Optional[Dict[str, float]] = None,
+    time_budget: float = 0.2,
+    rng: Optional[np.random.Generator] = None,
+    catalog: Optional[Catalog] = None,
+):
+    """Generate a meal plan maximizing the weighted goodness of its meals.
+
+    Positional arguments:
+    pools            -- Candidate item ids for each meal role ("main_course", "side", ...)
+    meal_configs     -- List of configuration objects that contain the structure of each user requested meal
+    num_days         -- Length of the meal plan in days
+    starting_date    -- Starting date of the meal plan
+    meal_plan_name   -- Name stored on every meal
+    user_preferences -- Dictionary of the form {'dairyPreference': 1, 'meatPreference': 0, 'nutsPreference': -1}
+    weights          -- Weight of each metric ("variety", "coverage", "constraint"), 1 by default
+    time_budget      -- Seconds the search may take, the best plan found so far is returned when it runs out
+
+    Returns:
+    days             -- A dictionary of day plans, consisting of a sequence of meals for each day
+    stats            -- Statistics of the search (sweeps, improved meals, whether it converged, time taken)
+    """
+    start = time.perf_counter()
+    rng = rng or np.random.default_rng()
+    catalog = catalog or get_catalog()
+    roles = meal_roles(meal_configs)
+    pools = {
+        role: RolePool(catalog, role, list(dict.fromkeys(items)))
+        for role, items in pools.items()
+        if any(role in meal for meal in roles)
+    }
+
+    drawn = draw_slots(
+        {role: pool.items for role, pool in pools.items()}, roles, num_days, rng
+    )
+    stats = optimize_slots(
+        drawn,
+        pools,
+        meal_configs,
+        MealScorer(user_preferences, weights),
+        rng,
+        start + time_budget,
+    )
+    stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    days = build_days(
+        drawn,
+        meal_configs,
+        roles,
+        plan_dates(starting_date, num_days),
+        meal_plan_name,
+    )
+    return days, stats
@@ -0,0 +1,192 @@
+"""Nutrition totals of meal plans against the user's nutritional goals
+
+The macronutrients of every catalog item are packed once per catalog version
+into an (item x nutrient) float32 matrix. Summing a plan then only gathers
+the rows of its items and adds them up per day, which is cheap enough to run
+on every generated meal plan.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .catalog import NUTRIENTS, Catalog, CatalogChanges, get_catalog
+
+# Meal role holding a beverage id, every other role holds a recipe id
+BEVERAGE_ROLE = "beverage"
+
+
+class NutrientMatrix:
+    """Macronutrients of every recipe and beverage of a catalog version.
+
+    Recipes and beverages have separate id spaces, so they are mapped to rows
+    separately. The last row is all zeros and stands for unknown items.
+    """
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        recipe_rows: Dict[str, int],
+        beverage_rows: Dict[str, int],
+    ):
+        self.matrix = matrix
+        self.recipe_rows = recipe_rows
+        self.beverage_rows = beverage_rows
+        self.missing_row = len(matrix) - 1
+
+    @classmethod
+    def from_catalog(cls, catalog: Catalog) -> "NutrientMatrix":
+        records = list(catalog.recipes.values()) + list(catalog.beverages.values())
+        matrix = np.zeros((len(records) + 1, len(NUTRIENTS)), dtype=np.float32)
+        if records:
+            matrix[:-1] = [record.nutrients for record in records]
+        recipe_rows = {item_id: row for row, item_id in enumerate(catalog.recipes)}
+        beverage_rows = {
+            item_id: row
+            for row, item_id in enumerate(catalog.beverages, start=len(catalog.recipes))
+        }
+        return cls(matrix, recipe_rows, beverage_rows)
+
+    def updated(
+        self, catalog: Catalog, changes: Optional[CatalogChanges] = None
+    ) -> "NutrientMatrix":
+        """Matrix of a new catalog version, rewriting only the rows of changed items.
+
+        Added items get new rows (before the zero row), removed items just lose
+        their row mapping. Returns a new matrix, this one is left untouched.
+        """
+        if changes is None or len(self.matrix) > 2 * (len(catalog) + 1):
+            return NutrientMatrix.from_catalog(catalog)
+        recipe_rows = dict(self.recipe_rows)
+        beverage_rows = dict(self.beverage_rows)
+        rows, added = {}, []
+        for item_rows, records, item_changes in (
+            (recipe_rows, catalog.recipes, changes.recipes),
+            (beverage_rows, catalog.beverages, changes.beverages),
+        ):
+            for item_id in item_changes:
+                record = records.get(item_id)
+                if record is None:
+                    item_rows.pop(item_id, None)
+                    continue
+                if item_id not in item_rows:
+                    item_rows[item_id] = self.missing_row + len(added)
+                    added.append(item_id)
+                rows[item_rows[item_id]] = record.nutrients
+
+        matrix = np.zeros(
+            (len(self.matrix) + len(added), len(NUTRIENTS)), dtype=np.float32
+        )
+        matrix[: self.missing_row] = self.matrix[: self.missing_row]
+        if rows:
+            matrix[list(rows)] = list(rows.values())
+        return NutrientMatrix(matrix, recipe_rows, beverage_rows)
+
+    def row(self, role: str, item_id: str) -> int:
+        rows = self.beverage_rows if role == BEVERAGE_ROLE else self.recipe_rows
+        return rows.get(item_id, self.missing_row)
+
+    def meal_rows(self, meal_types: Dict[str, str]) -> List[int]:
+        """Rows of the items of a meal ({role: item id}), skipping empty slots"""
+        return [
+            self.row(role, item_id) for role, item_id in meal_types.items() if item_id
+        ]
+
+    def totals(self, rows: Iterable[int]) -> np.ndarray:
+        return self.matrix[list(rows)].sum(axis=0, dtype=np.float32)
+
+
+def nutrient_matrix(catalog: Optional[Catalog] = None) -> NutrientMatrix:
+    """Nutrient matrix of a catalog version (the current one by default), built on first use"""
+    catalog = catalog or get_catalog()
+    return catalog.derived(
+        "nutrients", NutrientMatrix.from_catalog, NutrientMatrix.updated
+    )
+
+
+def day_meals(day_plan: Dict) -> List[Dict]:
+    """Meals of a day plan, stored as a list (generated plans) or keyed by meal id (saved plans)"""
+    meals = day_plan.get("meals") or []
+    return list(meals.values()) if isinstance(meals, dict) else list(meals)
+
+
+def day_nutrient_totals(
+    days: Dict[str, Dict], matrix: Optional[NutrientMatrix] = None
+) -> Tuple[List[str], np.ndarray]:
+    """Sum the nutrients of every day of a plan ({date: day plan}) in one pass.
+
+    Returns the dates and a (day x nutrient) float32 array of totals.
+    """
+    matrix = matrix or nutrient_matrix()
+    dates = list(days)
+    rows, day_index = [], []
+    for index, date in enumerate(dates):
+        for meal in day_meals(days[date]):
+            meal_rows = matrix.meal_rows(meal.get("meal_types") or {})
+            rows += meal_rows
+            day_index += [index] * len(meal_rows)
+
+    totals = np.zeros((len(dates), len(NUTRIENTS)), dtype=np.float32)
+    np.add.at(totals, np.asarray(day_index, dtype=np.intp), matrix.matrix[rows])
+    return dates, totals
+
+
+def goal_vector(goals: Optional[Dict]) -> np.ndarray:
+    """Daily goals as a nutrient vector, NaN for the nutrients without a (positive) goal"""
+    goals = goals or {}
+    vector = np.full(len(NUTRIENTS), np.nan, dtype=np.float32)
+    for column, nutrient in enumerate(NUTRIENTS):
+        try:
+            value = float(goals.get(nutrient) or 0)
+        except (TypeError, ValueError):
+            continue
+        if value > 0:
+            vector[column] = value
+    return vector
+
+
+def has_goals(goals: Optional[Dict]) -> bool:
+    """Whether any nutrient has a (positive) daily goal"""
+    return bool((~np.isnan(goal_vector(goals))).any())
+
+
+def nutrient_dict(values: np.ndarray) -> Dict[str, Optional[float]]:
+    """{nutrient: value} of a nutrient vector, rounded, None for NaN"""
+    return {
+        nutrient: None if np.isnan(value) else round(float(value), 2)
+        for nutrient, value in zip(NUTRIENTS, values)
+    }
+
+
+def meal_nutrients(
+    meal_types: Dict[str, str], matrix: Optional[NutrientMatrix] = None
+) -> Dict[str, Optional[float]]:
+    """Nutrient totals of a single meal ({role: item id})"""
+    matrix = matrix or nutrient_matrix()
+    return nutrient_dict(matrix.totals(matrix.meal_rows(meal_types)))
+
+
+def nutrition_summary(
+    days: Dict[str, Dict],
+    goals: Optional[Dict] = None,
+    matrix: Optional[NutrientMatrix] = None,
+) -> Dict:
+    """Per-day nutrient totals of a plan and their deltas against the daily goals.
+
+    Returns {"goals": {...}, "days": {date: {"totals": {...}, "deltas": {...}}}}.
+    A delta is total - goal (negative when the day falls short) and None for
+    nutrients the user has not set a goal for.
+    """
+    dates, totals = day_nutrient_totals(days, matrix)
+    goal = goal_vector(goals)
+    deltas = totals - goal
+    return {
+        "goals": nutrient_dict(goal),
+        "days": {
+            date: {
+                "totals": nutrient_dict(totals[index]),
+                "deltas": nutrient_dict(deltas[index]),
+            }
+            for index, date in enumerate(dates)
+        },
+    }
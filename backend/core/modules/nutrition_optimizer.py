@@ -0,0 +1,247 @@
+"""Nutrition-goal-targeted meal plan search
+
+The user's daily nutritional goals (calories, carbs, protein, fiber) are
+turned into a goal vector, and the items of every day are chosen to bring the
+day's nutrient totals close to it. The distance of a day from its goals is its
+relative L1 deviation: the sum over the nutrients with a goal of
+|total - goal| / goal.
+
+The search starts from a batched random draw (see meal_plan_generator.py),
+then sweeps over the slots of every day with local search: each slot gets the
+candidate of its pool bringing the day closest to the goals given the rest of
+the day. The candidate nutrient vectors of a role are gathered once from the
+catalog's nutrient matrix (see nutrition.py), so a slot is scored against its
+whole pool with a few NumPy operations. Only strict improvements are kept, so
+stopping when the time budget runs out leaves the best plan found so far.
+
+A candidate is skipped when it is already in the same meal, or when the role
+has a no-repeat window (see variety.py) and the item is used within it, so
+that the days do not all converge on the same best items.
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .meal_plan_generator import (
+    build_days,
+    draw_slots,
+    meal_roles,
+    plan_dates,
+)
+from .nutrition import NutrientMatrix, goal_vector, nutrient_matrix
+from .plan_model import slot_columns
+from .variety import draw_varied_slots, effective_window
+
+# Deviations closer than this are equal
+_EPSILON = 1e-9
+
+
+def day_deviation(totals: np.ndarray, goal: np.ndarray) -> np.ndarray:
+    """Relative L1 deviation of day totals (day x targeted nutrient) from the goals"""
+    return (np.abs(totals - goal) / goal).sum(axis=-1)
+
+
+class NutrientPool:
+    """Candidates of a meal role, with their vectors of targeted nutrients"""
+
+    def __init__(
+        self,
+        matrix: NutrientMatrix,
+        role: str,
+        items: Sequence[str],
+        targeted: np.ndarray,
+    ):
+        self.items = np.asarray(items, dtype=object)
+        self.index = {item_id: position for position, item_id in enumerate(items)}
+        rows = [matrix.row(role, item_id) for item_id in items]
+        self.vectors = matrix.matrix[rows][:, targeted].astype(np.float64)
+
+
+def search_nutrition(
+    drawn: Dict[str, List[List[str]]],
+    pools: Dict[str, NutrientPool],
+    roles: List[List[str]],
+    goal: np.ndarray,
+    windows: Dict[str, int],
+    rng: np.random.Generator,
+    deadline: float,
+) -> Dict:
+    """Improve the drawn items in place until no slot improves or the deadline passes.
+
+    goal holds the targeted nutrients only. Returns statistics of the search.
+    """
+    # (meal, role, column) of every slot of a day
+    slots = [
+        (meal_index, role, column)
+        for meal_index, meal in enumerate(slot_columns(roles))
+        for role, column in meal
+    ]
+    meal_slots = [
+        [(role, column) for role, column in meal] for meal in slot_columns(roles)
+    ]
+    num_days = len(next(iter(drawn.values()), []))
+
+    totals = np.zeros((num_days, len(goal)))
+    for day in range(num_days):
+        for _, role, column in slots:
+            pool = pools[role]
+            totals[day] += pool.vectors[pool.index[drawn[role][day][column]]]
+    before = day_deviation(totals, goal)
+
+    sweeps, improved, completed = 0, 0, False
+    while not completed:
+        if time.perf_counter() >= deadline:
+            break
+        sweeps += 1
+        changed = 0
+        for day in range(num_days):
+            if time.perf_counter() >= deadline:
+                break
+            for meal_index, role, column in slots:
+                pool = pools[role]
+                current = pool.index[drawn[role][day][column]]
+                candidates = totals[day] - pool.vectors[current] + pool.vectors
+                deviations = day_deviation(candidates, goal)
+                for item_id in _blocked(
+                    drawn, meal_slots[meal_index], role, column, day, windows
+                ):
+                    index = pool.index.get(item_id)
+                    if index is not None and index != current:
+                        deviations[index] = np.inf
+                best = deviations.min()
+                if deviations[current] > best + _EPSILON:
+                    choices = np.flatnonzero(deviations <= best + _EPSILON)
+                    chosen = int(rng.choice(choices))
+                    drawn[role][day][column] = pool.items[chosen]
+                    totals[day] += pool.vectors[chosen] - pool.vectors[current]
+                    changed += 1
+        else:
+            completed = not changed
+        improved += changed
+
+    after = day_deviation(totals, goal)
+    return {
+        "sweeps": sweeps,
+        "improved_slots": improved,
+        "completed": completed,
+        "deviation_before": round(float(before.mean()), 4) if num_days else None,
+        "deviation_after": round(float(after.mean()), 4) if num_days else None,
+        "day_deviations": [round(float(value), 4) for value in after],
+    }
+
+
+def _blocked(drawn, meal, role, column, day, windows):
+    """Items a slot must not take: the other items of its meal, and the items of
+    its role used within the role's no-repeat window"""
+    blocked = [
+        drawn[other_role][day][other_column]
+        for other_role, other_column in meal
+        if (other_role, other_column) != (role, column)
+    ]
+    window = windows.get(role, 0)
+    rows = drawn[role]
+    for other_day in range(max(0, day - window + 1), min(len(rows), day + window)):
+        for other_column, item_id in enumerate(rows[other_day]):
+            if (other_day, other_column) != (day, column):
+                blocked.append(item_id)
+    return blocked
+
+
+def optimize_nutrition(
+    pools: Dict[str, Sequence[str]],
+    meal_configs: List[Dict],
+    num_days: int,
+    starting_date: datetime,
+    meal_plan_name: str,
+    nutritional_goals: Optional[Dict],
+    time_budget: float = 0.2,
+    rng: Optional[np.random.Generator] = None,
+    no_repeat_days: Optional[Dict[str, int]] = None,
+    matrix: Optional[NutrientMatrix] = None,
+):
+    """Generate a meal plan whose daily nutrient totals are close to the user's goals.
+
+    Positional arguments:
+    pools             -- Candidate item ids for each meal role ("main_course", "side", ...)
+    meal_configs      -- List of configuration objects that contain the structure of each user requested meal
+    num_days          -- Length of the meal plan in days
+    starting_date     -- Starting date of the meal plan
+    meal_plan_name    -- Name stored on every meal
+    nutritional_goals -- Daily goals, e.g. {"calories": 2000, "carbs": 250, "protein": 100, "fiber": 30},
+                         nutrients without a (positive) goal are not targeted
+    time_budget       -- Seconds the search may take, the best plan found so far is returned when it runs out
+    no_repeat_days    -- Optional no-repeat window in days of each role, kept by the search
+
+    Returns:
+    days              -- A dictionary of day plans, consisting of a sequence of meals for each day
+    stats             -- Statistics of the search (sweeps, improved slots, whether it converged, mean
+                         deviation from the goals before and after, deviation of every day, time taken)
+    """
+    start = time.perf_counter()
+    rng = rng or np.random.default_rng()
+    matrix = matrix or nutrient_matrix()
+    roles = meal_roles(meal_configs)
+    items = {
+        role: list(dict.fromkeys(role_items))
+        for role, role_items in pools.items()
+        if any(role in meal for meal in roles)
+    }
+
+    if no_repeat_days:
+        drawn = draw_varied_slots(items, roles, num_days, rng, no_repeat_days)
+    else:
+        drawn = draw_slots(
+            {
+                role: np.asarray(role_items, dtype=object)
+                for role, role_items in items.items()
+            },
+            roles,
+            num_days,
+            rng,
+        )
+
+    goal = goal_vector(nutritional_goals)
+    targeted = ~np.isnan(goal)
+    if targeted.any():
+        slots_per_role = {
+            role: len(rows[0]) if rows else 0 for role, rows in drawn.items()
+        }
+        windows = {
+            role: effective_window(
+                (no_repeat_days or {}).get(role, 0),
+                len(items[role]),
+                slots_per_role[role],
+            )
+            for role in drawn
+        }
+        stats = search_nutrition(
+            drawn,
+            {role: NutrientPool(matrix, role, items[role], targeted) for role in drawn},
+            roles,
+            goal[targeted].astype(np.float64),
+            windows,
+            rng,
+            start + time_budget,
+        )
+    else:
+        stats = {
+            "sweeps": 0,
+            "improved_slots": 0,
+            "completed": True,
+            "deviation_before": None,
+            "deviation_after": None,
+            "day_deviations": [],
+        }
+    stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    days = build_days(
+        drawn,
+        meal_configs,
+        roles,
+        plan_dates(starting_date, num_days),
+        meal_plan_name,
+    )
+    return days, stats
@@ -1,36 +1,40 @@
 import warnings
-from .firebase import FirebaseManager
+from .catalog import get_catalog
 import traceback
 
 
 class User_Constraints:
-    # Define the user configuration (e.g., HasDairy, HasMeat, HasNuts)
-    constraints = {
-        "HasDairy": 0,
-        "HasMeat": 0,
-        "HasNuts": 0,
-    }  # -1: No, 0: Neutral, 1: Yes
+    """Nutritional constraint calculator of a single user configuration.
 
-    # Default number of user-defined constraints
-    num_constraints = 3  # HasDairy, HasMeat, HasNuts
+    Every instance keeps its own state, metrics.py scores meals with the
+    stateless scoring.constraint_score instead.
+    """
 
-    # Annotated food items
-    food_items = {}
+    def __init__(self):
+        # Define the user configuration (e.g., HasDairy, HasMeat, HasNuts)
+        self.constraints = {
+            "HasDairy": 0,
+            "HasMeat": 0,
+            "HasNuts": 0,
+        }  # -1: No, 0: Neutral, 1: Yes
 
-    # Calculate the configuration score
-    config_score = 0
+        # Default number of user-defined constraints
+        self.num_constraints = 3  # HasDairy, HasMeat, HasNuts
+
+        # Annotated food items
+        self.food_items = {}
+
+        # Calculate the configuration score
+        self.config_score = 0
 
-    def __init__(self):
         # Recipe calibration
-        firebaseManager = FirebaseManager()
-        self.r3_items, _ = firebaseManager.get_r3()
-        self.bev_items, _ = firebaseManager.get_beverages()
+        catalog = get_catalog()
 
-        for id_, recipe in self.r3_items.items():
+        for id_, recipe in catalog.recipes.items():
             features_dict = {
-                "hasDairy": recipe.get("hasDairy", False),
-                "hasMeat": recipe.get("hasMeat", False),
-                "hasNuts": recipe.get("hasNuts", False),
+                "hasDairy": recipe.has_dairy,
+                "hasMeat": recipe.has_meat,
+                "hasNuts": recipe.has_nuts,
             }
             compt_features = []
             for feature, compt in features_dict.items():
@@ -38,11 +42,11 @@ class User_Constraints:
                     compt_features.append(feature)
             self.add_annotated_food_item(id_, compt_features)
 
-        for id_, bev in self.bev_items.items():
+        for id_, bev in catalog.beverages.items():
             features_dict = {
-                "hasDairy": bev.get("hasDairy", False),
-                "hasMeat": bev.get("hasMeat", False),
-                "hasNuts": bev.get("hasNuts", False),
+                "hasDairy": bev.has_dairy,
+                "hasMeat": bev.has_meat,
+                "hasNuts": bev.has_nuts,
             }
             compt_features = []
 
@@ -51,8 +55,6 @@ class User_Constraints:
                     compt_features.append(feature)
             self.add_annotated_food_item(id_, compt_features)
 
-        print("Nutritional Constraint Calculator Locked and Loaded")
-
     def set_num_constraints(self, num_constraints: int):
         """Define the number of user-defined constraints.
 
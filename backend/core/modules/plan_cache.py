@@ -0,0 +1,164 @@
+"""Cache of generated meal plans
+
+A plan only depends on the user's favorite items, the meal configs, the
+dietary conditions, the number of days and the generation seed (plus the few
+other request inputs listed in plan_cache_key()), so a repeated request, for
+instance when the frontend reloads, can be served the plan and scores that
+were already generated instead of drawing and scoring them again. The
+candidate pools of a user are cached the same way, so that a single slot of a
+plan can be regenerated without filtering the catalog again.
+
+The cache is per process, bounded in entries (least recently used plans are
+evicted first) and in age (entries expire after a TTL), and counts its hits
+and misses for monitoring. Plans are copied in and out of the cache, as
+callers fill them in; candidate pools are immutable and shared as they are.
+"""
+
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+
+def _digest(value: Any) -> str:
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+def plan_cache_key(
+    favorite_items: Dict[str, List[str]],
+    meal_configs: List[Dict],
+    dietary_conditions: Dict[str, bool],
+    num_days: int,
+    seed: int,
+    **inputs: Any,
+) -> str:
+    """Hash of the inputs a generated plan depends on.
+
+    Favorite item lists are compared as sets. inputs are the other request
+    inputs the plan or its scores depend on (starting date, preferences, ...).
+    """
+    favorites = {role: sorted(set(ids)) for role, ids in favorite_items.items()}
+    return _digest(
+        [favorites, meal_configs, dietary_conditions, num_days, seed, inputs]
+    )
+
+
+def pool_cache_key(
+    favorite_items: Dict[str, List[str]],
+    roles: List[str],
+    dietary_conditions: Dict[str, bool],
+    catalog_version: Optional[str],
+) -> str:
+    """Hash of the inputs the candidate pools of a user depend on"""
+    favorites = {role: sorted(set(ids)) for role, ids in favorite_items.items()}
+    return _digest([favorites, sorted(roles), dietary_conditions, catalog_version])
+
+
+class PlanCache:
+    """Thread-safe LRU cache of meal plans with a time to live.
+
+    Entries are deep copied in and out unless copy_entries is unset, for
+    immutable entries which can be shared between requests.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, copy_entries: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.copy_entries = copy_entries
+        # key -> (expiry time, plan), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Copy of the cached plan (or the entry itself, see copy_entries), None if it
+        is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            plan = entry[1]
+        # callers add user ids and scores to the plan they get, keep ours intact
+        return copy.deepcopy(plan) if self.copy_entries else plan
+
+    def put(self, key: str, plan: Dict):
+        if self.max_entries <= 0:
+            return
+        if self.copy_entries:
+            plan = copy.deepcopy(plan)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, plan)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_plan_cache: Optional[PlanCache] = None
+_pool_cache: Optional[PlanCache] = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> PlanCache:
+    """The process-wide plan cache, sized by PLAN_CACHE_MAX_ENTRIES and PLAN_CACHE_TTL"""
+    global _plan_cache
+    if _plan_cache is None:
+        with _plan_cache_lock:
+            if _plan_cache is None:
+                _plan_cache = PlanCache(
+                    settings.PLAN_CACHE_MAX_ENTRIES, settings.PLAN_CACHE_TTL
+                )
+    return _plan_cache
+
+
+def get_pool_cache() -> PlanCache:
+    """The process-wide cache of candidate pools, sized by POOL_CACHE_MAX_ENTRIES and
+    PLAN_CACHE_TTL, shared by plan generation and slot regeneration. Pools can hold
+    much of the catalog, they are kept as tuples and not copied"""
+    global _pool_cache
+    if _pool_cache is None:
+        with _plan_cache_lock:
+            if _pool_cache is None:
+                _pool_cache = PlanCache(
+                    settings.POOL_CACHE_MAX_ENTRIES,
+                    settings.PLAN_CACHE_TTL,
+                    copy_entries=False,
+                )
+    return _pool_cache
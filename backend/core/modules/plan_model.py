@@ -0,0 +1,146 @@
+"""Compact model of a generated meal plan
+
+Generation works on the items drawn for each role, day by day (see
+meal_plan_generator.py). PlanGrid keeps a plan in that shape instead of as
+nested day and meal dictionaries: for every role, one tuple of items per day,
+in the order of the meals requesting the role, plus the ids of the days and
+meals. The {date: {"_id", "meals"}} structure sent to the frontend and saved
+to Firestore is only built by to_days(), as fresh dictionaries every time, so
+no two days or meals ever share a dictionary.
+
+PlanGrid is immutable. with_item() is copy-on-write: the new plan shares every
+row it does not change with the old one, so editing a slot of a long plan costs
+one new row and one new tuple of rows for the role, and the old plan stays
+valid.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+from bson import ObjectId
+
+
+def slot_columns(roles: List[List[str]]) -> List[List[Tuple[str, int]]]:
+    """(role, column) of each slot of each meal, the column of the slot in the
+    rows drawn for its role"""
+    columns = []
+    next_column: Dict[str, int] = {}
+    for meal in roles:
+        meal_columns = []
+        for role in meal:
+            meal_columns.append((role, next_column.get(role, 0)))
+            next_column[role] = next_column.get(role, 0) + 1
+        columns.append(meal_columns)
+    return columns
+
+
+class PlanGrid:
+    """Items of a meal plan, day x meal x role"""
+
+    __slots__ = (
+        "dates",
+        "meal_names",
+        "meal_plan_name",
+        "columns",
+        "rows",
+        "day_ids",
+        "meal_ids",
+    )
+
+    def __init__(
+        self,
+        dates: Tuple[str, ...],
+        meal_names: Tuple[str, ...],
+        meal_plan_name: str,
+        columns: Tuple[Tuple[Tuple[str, int], ...], ...],
+        rows: Dict[str, Tuple[Tuple[str, ...], ...]],
+        day_ids: Tuple[str, ...],
+        meal_ids: Tuple[Tuple[str, ...], ...],
+    ):
+        self.dates = dates
+        self.meal_names = meal_names
+        self.meal_plan_name = meal_plan_name
+        # (role, column in the role's rows) of each slot of each meal
+        self.columns = columns
+        # role -> items of the role on each day
+        self.rows = rows
+        self.day_ids = day_ids
+        self.meal_ids = meal_ids
+
+    @classmethod
+    def from_drawn(
+        cls,
+        drawn: Dict[str, List[List[str]]],
+        meal_configs: List[Dict],
+        roles: List[List[str]],
+        dates: Sequence[str],
+        meal_plan_name: str,
+    ) -> "PlanGrid":
+        """Plan of the items drawn for each role ({role: rows}, see draw_slots),
+        with new day and meal ids"""
+        return cls(
+            tuple(dates),
+            tuple(meal_config["meal_name"] for meal_config in meal_configs),
+            meal_plan_name,
+            tuple(tuple(meal) for meal in slot_columns(roles)),
+            {role: tuple(map(tuple, role_rows)) for role, role_rows in drawn.items()},
+            tuple(str(ObjectId()) for _ in dates),
+            tuple(tuple(str(ObjectId()) for _ in meal_configs) for _ in dates),
+        )
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def meal_items(self, day: int, meal: int) -> Dict[str, str]:
+        """{role: item id} of a meal"""
+        return {
+            role: self.rows[role][day][column] for role, column in self.columns[meal]
+        }
+
+    def with_item(self, day: int, meal: int, role: str, item_id: str) -> "PlanGrid":
+        """Copy of the plan with the role of a meal set to item_id, sharing the
+        unchanged rows. Day and meal ids are kept"""
+        for slot_role, column in self.columns[meal]:
+            if slot_role == role:
+                break
+        else:
+            raise KeyError(f"Meal {meal} has no {role}")
+        role_rows = self.rows[role]
+        row = role_rows[day]
+        row = row[:column] + (item_id,) + row[column + 1 :]
+        rows = dict(self.rows)
+        rows[role] = role_rows[:day] + (row,) + role_rows[day + 1 :]
+        return PlanGrid(
+            self.dates,
+            self.meal_names,
+            self.meal_plan_name,
+            self.columns,
+            rows,
+            self.day_ids,
+            self.meal_ids,
+        )
+
+    def to_days(self) -> Dict[str, Dict]:
+        """The {date: {"_id", "meals"}} structure of the plan, as new dictionaries"""
+        meals = [
+            (meal_name, [(self.rows[role], role, column) for role, column in meal])
+            for meal_name, meal in zip(self.meal_names, self.columns)
+        ]
+        days = {}
+        for day, date in enumerate(self.dates):
+            meal_ids = self.meal_ids[day]
+            days[date] = {
+                "_id": self.day_ids[day],
+                "meals": [
+                    {
+                        "_id": meal_ids[meal],
+                        "meal_name": meal_name,
+                        "meal_plan_name": self.meal_plan_name,
+                        "meal_types": {
+                            role: role_rows[day][column]
+                            for role_rows, role, column in meal_columns
+                        },
+                    }
+                    for meal, (meal_name, meal_columns) in enumerate(meals)
+                ],
+            }
+        return days
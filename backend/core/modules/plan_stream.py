@@ -0,0 +1,143 @@
+"""Streaming of generated meal plans as NDJSON
+
+A long plan is otherwise scored, saved day by day to Firestore and only then
+returned as one JSON document, so the client waits for all of it before it can
+show the first day. In streaming mode the plan is written as one JSON object
+per line (NDJSON) and each day is sent as soon as it is scored:
+
+    {"type": "plan", "_id": ..., "user_id": ..., "name": ..., "seed": ...}
+    {"type": "day", "date": "2025-03-08", "day": {...}, "scores": {...}, "nutrition": {...}}
+    ...
+    {"type": "end", "scores": {...}, "nutrition_goals": {...}, "variety": {...}}
+
+An error after the first line can no longer change the status code, it ends
+the stream with {"type": "error", "Error": ...} instead. The writes to
+Firestore are handed to a background executor as the days are sent.
+"""
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from termcolor import colored
+
+from .nutrition import nutrient_matrix, nutrition_summary
+from .recommendation_helpers import calculate_goodness
+from .variety import variety_stats
+
+logger = logging.getLogger(__name__)
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+SCORE_KEYS = ("variety_scores", "coverage_scores", "constraint_scores")
+
+
+def ndjson_line(obj: Dict) -> str:
+    return json.dumps(obj, cls=DjangoJSONEncoder) + "\n"
+
+
+def stream_meal_plan(
+    meal_plan: Dict,
+    meal_configs: List[Dict],
+    user_preferences: Dict[str, int],
+    nutritional_goals: Optional[Dict] = None,
+    on_day: Optional[Callable[[str, Dict], None]] = None,
+    on_complete: Optional[Callable[[Dict], None]] = None,
+) -> Iterator[str]:
+    """NDJSON lines of a meal plan, scoring each day right before it is sent.
+
+    A plan that was already scored (e.g. served from the plan cache) is sent
+    with its scores. Otherwise the scores and nutrition summary are collected
+    into meal_plan as the days are sent, and on_complete(meal_plan) is called
+    once the last day is. on_day(date, day_plan) is called before each day is
+    sent, e.g. to save it.
+    """
+    header = {
+        key: value
+        for key, value in meal_plan.items()
+        if key not in ("days", "scores", "nutrition", "variety")
+    }
+    yield ndjson_line({"type": "plan", **header})
+
+    scored = "scores" in meal_plan
+    if scored:
+        scores = meal_plan["scores"]
+        nutrition = meal_plan["nutrition"]
+    else:
+        scores = {key: [] for key in SCORE_KEYS}
+        nutrition = {"goals": None, "days": {}}
+    matrix = nutrient_matrix()
+    offset = 0
+    try:
+        for date, day_plan in meal_plan["days"].items():
+            if scored:
+                count = len(day_plan["meals"])
+                day_scores = {
+                    key: scores[key][offset : offset + count] for key in SCORE_KEYS
+                }
+                offset += count
+            else:
+                day_scores = calculate_goodness(
+                    {date: day_plan}, meal_configs, user_preferences
+                )
+                for key in SCORE_KEYS:
+                    scores[key] += day_scores[key]
+                summary = nutrition_summary({date: day_plan}, nutritional_goals, matrix)
+                nutrition["goals"] = summary["goals"]
+                nutrition["days"][date] = summary["days"][date]
+            if on_day is not None:
+                on_day(date, day_plan)
+            yield ndjson_line(
+                {
+                    "type": "day",
+                    "date": date,
+                    "day": day_plan,
+                    "scores": day_scores,
+                    "nutrition": nutrition["days"][date],
+                }
+            )
+    except Exception as e:
+        logger.error(colored(f"Error while streaming the meal plan: {e}", "red"))
+        yield ndjson_line(
+            {
+                "type": "error",
+                "Error": f"There was an error evaluating the recommendation: {e}",
+            }
+        )
+        return
+
+    if not scored:
+        meal_plan["scores"] = scores
+        meal_plan["nutrition"] = nutrition
+        meal_plan["variety"] = variety_stats(meal_plan["days"])
+        if on_complete is not None:
+            on_complete(meal_plan)
+    yield ndjson_line(
+        {
+            "type": "end",
+            "scores": scores,
+            "nutrition_goals": nutrition["goals"],
+            "variety": meal_plan.get("variety"),
+        }
+    )
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def background_executor() -> ThreadPoolExecutor:
+    """Process-wide executor of the writes made on behalf of streamed responses"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PLAN_PERSIST_WORKERS,
+                    thread_name_prefix="plan-persist",
+                )
+    return _executor
@@ -1,8 +1,13 @@
-import random
 import json
 import os
 import re
-from .firebase import FirebaseManager
+from .catalog import get_catalog
+from .meal_plan_generator import ROLE_ITEMS, generate_days, meal_roles
+from .meal_plan_optimizer import optimize_days
+from .nutrition import day_meals, nutrition_summary
+from .nutrition_optimizer import optimize_nutrition
+from .plan_cache import get_pool_cache, pool_cache_key
+from .scoring import score_meals
 import shutil
 import subprocess
 from bson import ObjectId
@@ -14,16 +19,11 @@ from .metrics import (
     nutritional_constraint_score,
 )
 
-from typing import Dict, List, Tuple
-import copy
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 import logging
 from termcolor import colored
 
-firebaseManager = FirebaseManager()
-food_items, _ = firebaseManager.get_r3()
-beverages, _ = firebaseManager.get_beverages()
-
-
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -31,18 +31,16 @@ logger = logging.getLogger(__name__)
 def filter_based_on_dietary_conditions(
     food_ids: Dict[str, List], bev_ids: List[str], dietary_conditions: Dict[str, bool]
 ) -> Tuple[List[str], List[str]]:
+    catalog = get_catalog()
+
     # convert to set for O(1) lookup
     logger.info(colored("Collecting all food ids", "green"))
-    all_food_ids = [id for role_ids in food_ids.values() for id in role_ids]
+    all_food_ids = {id for role_ids in food_ids.values() for id in role_ids}
     bev_ids = set(bev_ids)
 
-    # create deepcopy to avoid altering original dictionaries by reference
-    filtered_foods = copy.deepcopy(food_items)
-    filtered_bevs = copy.deepcopy(beverages)
-
-    # filter based off of provided food ids
-    filtered_foods = {i: r3 for i, r3 in filtered_foods.items() if i in all_food_ids}
-    filtered_bevs = {i: bev for i, bev in filtered_bevs.items() if i in bev_ids}
+    # filter based off of provided food ids (catalog records are never mutated, so no copy is needed)
+    filtered_foods = {i: r3 for i, r3 in catalog.recipes.items() if i in all_food_ids}
+    filtered_bevs = {i: bev for i, bev in catalog.beverages.items() if i in bev_ids}
 
     # get list of user's dietary conditions, subset of ["diabetes", "vegan", "vegetarian", "gluten_free"]
     dietary_conditions = [
@@ -54,28 +52,27 @@ def filter_based_on_dietary_conditions(
     for condition in dietary_conditions:
         if condition == "diabetes":
             filtered_foods = {
-                i: r3 for i, r3 in filtered_foods.items() if r3["isLowSugar"]
+                i: r3 for i, r3 in filtered_foods.items() if r3.is_low_sugar
             }
         elif condition == "gluten_free":
             filtered_foods = {
-                i: r3 for i, r3 in filtered_foods.items() if r3["isGlutenFree"]
+                i: r3 for i, r3 in filtered_foods.items() if r3.is_gluten_free
             }
         elif condition == "vegan":
-            filtered_foods = {
-                i: r3 for i, r3 in filtered_foods.items() if r3["isVegan"]
-            }
+            filtered_foods = {i: r3 for i, r3 in filtered_foods.items() if r3.is_vegan}
             filtered_bevs = {
-                i: bev for i, bev in filtered_bevs.items() if not bev["hasDairy"]
+                i: bev for i, bev in filtered_bevs.items() if not bev.has_dairy
             }
         elif condition == "vegetarian":
             filtered_foods = {
-                i: r3 for i, r3 in filtered_foods.items() if not r3["hasMeat"]
+                i: r3 for i, r3 in filtered_foods.items() if not r3.has_meat
             }
 
     logger.info(colored("Reconstructing food ids for meal roles", "green"))
 
+    # sorted, so that seeded draws from these lists do not depend on set ordering
     food_ids = {
-        role: list(set(role_ids).intersection(set(filtered_foods)))
+        role: sorted(set(role_ids).intersection(set(filtered_foods)))
         for role, role_ids in food_ids.items()
     }
     # now we just need to return the ids of the foods and bevs
@@ -83,9 +80,8 @@ def filter_based_on_dietary_conditions(
 
 
 def get_food_items_with_dietary_conditions(dietary_conditions):
-    logger.info(colored("Copying Food Items", "green"))
-    # create deepcopy to avoid altering original dictionaries by reference
-    filtered_foods = copy.deepcopy(food_items)
+    # every filter below builds a new dictionary, so the catalog is never altered
+    filtered_foods = get_catalog().recipes
 
     logger.info(colored("Filtering dietary conditions", "green"))
     # get list of user's dietary conditions, subset of ["diabetes", "vegan", "vegetarian", "gluten_free"]
@@ -99,41 +95,44 @@ def get_food_items_with_dietary_conditions(dietary_conditions):
     for condition in dietary_conditions:
         if condition == "diabetes":
             filtered_foods = {
-                i: r3 for i, r3 in filtered_foods.items() if r3["isLowSugar"]
+                i: r3 for i, r3 in filtered_foods.items() if r3.is_low_sugar
             }
         elif condition == "gluten_free":
             filtered_foods = {
-                i: r3 for i, r3 in filtered_foods.items() if r3["isGlutenFree"]
+                i: r3 for i, r3 in filtered_foods.items() if r3.is_gluten_free
             }
         elif condition == "vegan":
-            filtered_foods = {
-                i: r3 for i, r3 in filtered_foods.items() if r3["isVegan"]
-            }
+            filtered_foods = {i: r3 for i, r3 in filtered_foods.items() if r3.is_vegan}
 
         elif condition == "vegetarian":
             filtered_foods = {
-                i: r3 for i, r3 in filtered_foods.items() if not r3["hasMeat"]
+                i: r3 for i, r3 in filtered_foods.items() if not r3.has_meat
             }
 
     return list(filtered_foods)
 
 
-def get_highest_prob_foods(items_probs, num_users):
+def get_highest_prob_foods(
+    items_probs, num_users, rng: Optional[np.random.Generator] = None
+):
     """Group together the highest probability food items in each role (dessert, main course, etc.).
 
     Positional arguments:
     items_probs --
     num_users   -- The number of users that for which we are grouping together food items
+    rng         -- Random generator filling the empty roles, a fresh one by default
     """
+    rng = rng or np.random.default_rng()
 
     user_items = {
         i: {"Main Course": [], "Side": [], "Dessert": []}
         for i in range(1, num_users + 1)
     }
 
+    catalog = get_catalog()
     for user, item, prob in items_probs:
         # get item roles
-        item_roles = food_items[item]["food_role"]
+        item_roles = catalog.recipes[item].roles
         for role in item_roles:
             if role == "Beverage":
                 continue
@@ -163,9 +162,9 @@ def get_highest_prob_foods(items_probs, num_users):
                 non_empty.append(key)
 
         for empty_role in empty:
-            role_dict[empty_role] = random.choice(
-                [rec_user_items[user][non_empty_role] for non_empty_role in non_empty]
-            )
+            role_dict[empty_role] = rec_user_items[user][
+                non_empty[rng.integers(len(non_empty))]
+            ]
 
     return rec_user_items
 
@@ -248,15 +247,16 @@ def gen_facts(dairy_opinions, meat_opinions, nut_opinions):
             user_facts.append(f"preference(user_{user}, negative_{feature_name}).")
 
     # Generate food attribute facts
-    all_data = [beverages, food_items]
+    catalog = get_catalog()
+    all_data = [catalog.beverages, catalog.recipes]
 
     for data, prefix in zip(all_data, ["bev", "food"]):
         for key, item_info in data.items():
-            if item_info.get("hasNuts"):
+            if item_info.has_nuts:
                 food_facts.append(f"item({prefix}_{key}, has_nuts).")
-            if item_info.get("hasMeat"):
+            if item_info.has_meat:
                 food_facts.append(f"item({prefix}_{key}, has_meat).")
-            if item_info.get("hasDairy"):
+            if item_info.has_dairy:
                 food_facts.append(f"item({prefix}_{key}, has_dairy).")
 
     return user_facts, food_facts
@@ -280,25 +280,14 @@ def gen_pairs(users, dairy_opinions, meat_opinions, nut_opinions):
     _, neg_meat, _ = meat_opinions
     _, neg_nuts, _ = nut_opinions
 
+    catalog = get_catalog()
     for user in users:
-        for data, is_bev in ((beverages, True), (food_items, False)):
+        for data, is_bev in ((catalog.beverages, True), (catalog.recipes, False)):
             for key, item_info in data.items():
                 if (
-                    (
-                        "hasNuts" in item_info
-                        and item_info["hasNuts"]
-                        and user in neg_nuts
-                    )
-                    or (
-                        "hasDairy" in item_info
-                        and item_info["hasDairy"]
-                        and user in neg_dairy
-                    )
-                    or (
-                        "hasDairy" in item_info
-                        and item_info["hasMeat"]
-                        and user in neg_meat
-                    )
+                    (item_info.has_nuts and user in neg_nuts)
+                    or (item_info.has_dairy and user in neg_dairy)
+                    or (item_info.has_meat and user in neg_meat)
                 ):
                     if is_bev:
                         neg_pairs.append(f"recommendation(user_{user},bev_{key}).")
@@ -313,16 +302,18 @@ def gen_pairs(users, dairy_opinions, meat_opinions, nut_opinions):
     return pos_pairs, neg_pairs
 
 
-def split_train_test(array, per_train=0.8):
+def split_train_test(array, per_train=0.8, rng: Optional[np.random.Generator] = None):
     """
     Split a list into training and testing datasets.
     Args:
         array (list): List of data to split.
         per_train (float): Proportion of data to use for training.
+        rng (Generator): Random generator shuffling the data, a fresh one by default.
     Returns:
         Tuple of lists: (train_data, test_data)
     """
-    random.shuffle(array)
+    rng = rng or np.random.default_rng()
+    rng.shuffle(array)
     split_index = int(len(array) * per_train)
     return array[:split_index], array[split_index:]
 
@@ -444,7 +435,7 @@ def clean_dir():
             shutil.rmtree(dir)
 
 
-def configure_bandit(num_days: int):
+def configure_bandit(num_days: int, rng: Optional[np.random.Generator] = None):
     # clean previous directories of bandit training sessions
     clean_dir()
 
@@ -464,10 +455,11 @@ def configure_bandit(num_days: int):
     )
 
     # Split into training and testing data
-    user_train, user_test = split_train_test(user_facts)
-    food_train, food_test = split_train_test(food_facts)
-    train_pos, test_pos = split_train_test(pos_pairs)
-    train_neg, test_neg = split_train_test(neg_pairs)
+    rng = rng or np.random.default_rng()
+    user_train, user_test = split_train_test(user_facts, rng=rng)
+    food_train, food_test = split_train_test(food_facts, rng=rng)
+    train_pos, test_pos = split_train_test(pos_pairs, rng=rng)
+    train_neg, test_neg = split_train_test(neg_pairs, rng=rng)
 
     # combine training and testing sets
     train_facts = user_train + food_train
@@ -574,6 +566,7 @@ def get_bandit_favorite_items(
     trial_num: int,
     user_preferences: Dict[str, int],
     dietary_conditions: Dict[str, bool],
+    rng: Optional[np.random.Generator] = None,
 ) -> Dict[str, List[str]]:
     # Read bandit's evaluation on test set, and consider those items for recommendation
     with open(
@@ -595,7 +588,7 @@ def get_bandit_favorite_items(
 
     rec_user_bevs = get_highest_prob_bevs(bev_items_and_probs, 27)
 
-    rec_user_foods = get_highest_prob_foods(food_items_and_probs, 27)
+    rec_user_foods = get_highest_prob_foods(food_items_and_probs, 27, rng)
 
     all_users_opinions = [
         [0, 0, 0],
@@ -655,9 +648,13 @@ def gen_bandit_rec(
     starting_date: datetime,
     dietary_conditions: Dict[str, bool],
     meal_plan_name: str,
+    rng: Optional[np.random.Generator] = None,
+    no_repeat_days: Optional[Dict[str, int]] = None,
 ) -> Dict:
     """Take Bandit Output and generate a meal plan
 
+    Every slot of every day is drawn in one batch per role (see meal_plan_generator.py).
+
     Positional arguments:
     trial_num        -- Number of the bandit training session
     user_preferences -- Dictionary of the form {'dairyPreference': 1, 'meatPreference': 0, 'nutsPreference': -1}.
@@ -665,84 +662,161 @@ def gen_bandit_rec(
     num_days         -- Length of the meal plan in days
     meal_configs     -- List of configuration objects that contain the structure of each user requested meal
     starting_date    -- Starting date of the meal plan
+    rng              -- Random generator to draw the items with, a fresh one by default
+    no_repeat_days   -- Optional no-repeat window in days of each role, e.g. {"main_course": 3}
+                        (see variety.py)
 
     Returns:
     days             -- A dictionary of meal plans, consisting of a sequence of meals for each day
     """
+    return generate_days(
+        cached_candidate_pools(favorite_items, meal_configs, dietary_conditions),
+        meal_configs,
+        num_days,
+        starting_date,
+        meal_plan_name,
+        rng,
+        no_repeat_days,
+    )
 
-    # create a skeleton structure of meals that will be recommended throughout a single day
-    meal_list = []
 
-    # iterate over each meal config and populate day meal list
-    # for item roles (main course, side dish, etc.) create a key-val pair
-    # if the user expects that role to be in the meal
-    for meal_config in meal_configs:
-        meal_components = {}
-        for item_role, is_present in meal_config["meal_types"].items():
-            if not is_present:
-                continue
-            meal_components[item_role] = ""
-
-        meal = {
-            "_id": str(ObjectId()),  # Unique ID for the meal
-            "meal_name": meal_config["meal_name"],
-            "meal_plan_name": meal_plan_name,
-            # "meal_time": meal_config.get("meal_time", ""),
-            "meal_types": meal_components,
-        }
-        meal_list.append(meal)
+def gen_optimized_rec(
+    favorite_items: Dict[str, List[str]],
+    num_days: int,
+    meal_configs: List[Dict],
+    starting_date: datetime,
+    dietary_conditions: Dict[str, bool],
+    meal_plan_name: str,
+    user_preferences: Dict[str, int],
+    time_budget: float,
+    weights: Optional[Dict[str, float]] = None,
+    rng: Optional[np.random.Generator] = None,
+) -> Tuple[Dict, Dict]:
+    """Like gen_bandit_rec, but search for the plan with the best goodness scores
+    within time_budget seconds (see meal_plan_optimizer.py).
+
+    Returns the days of the plan and statistics of the search
+    """
+    return optimize_days(
+        cached_candidate_pools(favorite_items, meal_configs, dietary_conditions),
+        meal_configs,
+        num_days,
+        starting_date,
+        meal_plan_name,
+        user_preferences,
+        weights=weights,
+        time_budget=time_budget,
+        rng=rng,
+    )
 
-    # create a skeleton structure for the number of days that the user wants the meal plan
-    days = {
-        (starting_date + timedelta(days=day_index)).strftime("%Y-%m-%d"): {
-            "_id": str(ObjectId()),
-            "meals": meal_list.copy(),
+
+def gen_nutrition_rec(
+    favorite_items: Dict[str, List[str]],
+    num_days: int,
+    meal_configs: List[Dict],
+    starting_date: datetime,
+    dietary_conditions: Dict[str, bool],
+    meal_plan_name: str,
+    nutritional_goals: Dict,
+    time_budget: float,
+    rng: Optional[np.random.Generator] = None,
+    no_repeat_days: Optional[Dict[str, int]] = None,
+) -> Tuple[Dict, Dict]:
+    """Like gen_bandit_rec, but pick the items of every day to bring its nutrient
+    totals close to the nutritional goals within time_budget seconds (see
+    nutrition_optimizer.py).
+
+    Returns the days of the plan and statistics of the search
+    """
+    return optimize_nutrition(
+        cached_candidate_pools(favorite_items, meal_configs, dietary_conditions),
+        meal_configs,
+        num_days,
+        starting_date,
+        meal_plan_name,
+        nutritional_goals,
+        time_budget=time_budget,
+        rng=rng,
+        no_repeat_days=no_repeat_days,
+    )
+
+
+def candidate_pools(
+    favorite_items: Dict[str, List[str]],
+    meal_configs: List[Dict],
+    dietary_conditions: Dict[str, bool],
+) -> Dict[str, List[str]]:
+    """Candidate item ids of every role requested by the meal configs.
+
+    Roles come from the favorite items, falling back to every beverage, or to
+    every food item compatible with the dietary conditions, when the user has
+    no favorites for them.
+    """
+    pools = {}
+    backup_foods = None
+    for role in {role for meal in meal_roles(meal_configs) for role in meal}:
+        items = favorite_items.get(ROLE_ITEMS.get(role, role)) or []
+        if not items and role == "beverage":
+            items = get_catalog().beverage_ids()
+        elif not items:
+            if backup_foods is None:
+                backup_foods = get_food_items_with_dietary_conditions(
+                    dietary_conditions
+                )
+            items = backup_foods
+        # sorted, so that seeded draws do not depend on the order favorites were stored in
+        pools[role] = sorted(set(items))
+    return pools
+
+
+def cached_candidate_pools(
+    favorite_items: Dict[str, List[str]],
+    meal_configs: List[Dict],
+    dietary_conditions: Dict[str, bool],
+) -> Dict[str, Tuple[str, ...]]:
+    """candidate_pools(), served from the process-wide pool cache when the same
+    favorites, roles and dietary conditions were seen recently.
+
+    The pools are shared with the other requests, as tuples, and must not be modified.
+    """
+    roles = {role for meal in meal_roles(meal_configs) for role in meal}
+    # pools only depend on the catalog when a role falls back to it
+    falls_back = any(
+        not favorite_items.get(ROLE_ITEMS.get(role, role)) for role in roles
+    )
+    key = pool_cache_key(
+        favorite_items,
+        list(roles),
+        dietary_conditions,
+        get_catalog().version if falls_back else None,
+    )
+    pool_cache = get_pool_cache()
+    pools = pool_cache.get(key)
+    if pools is None:
+        pools = {
+            role: tuple(items)
+            for role, items in candidate_pools(
+                favorite_items, meal_configs, dietary_conditions
+            ).items()
         }
-        for day_index in range(num_days)
-    }
+        pool_cache.put(key, pools)
+    return pools
 
-    # popoulate each day recommendation for the user
-    mains = favorite_items["Main Course"]
-    sides = favorite_items["Side"]
-    desserts = favorite_items["Dessert"]
-
-    backup_foods = get_food_items_with_dietary_conditions(dietary_conditions)
-
-    bevs = favorite_items["Beverage"]
-    for day_rec in days.values():
-        # iterate over meals
-        for meal in day_rec["meals"]:
-            # populate each meal component
-            meal = meal["meal_types"]
-            if "beverage" in meal:
-                try:
-                    # meal["beverage"] = beverages[random.choice(bevs)]["bev-id"]
-                    meal["beverage"] = random.choice(bevs)
-                except:
-                    bev_num = random.choice(list(beverages.keys()))
-                    meal["beverage"] = beverages[bev_num]
-
-            if "main_course" in meal:
-                try:
-                    # meal["main_course"] = food_items[random.choice(mains)]["recipe-id"]
-                    meal["main_course"] = random.choice(mains)
-                except:
-                    meal["main_course"] = random.choice(backup_foods)
-
-            if "side" in meal:
-                try:
-                    # meal["side"] = food_items[random.choice(sides)]["recipe-id"]
-                    meal["side"] = random.choice(sides)
-                except:
-                    meal["side"] = random.choice(backup_foods)
-
-            if "dessert" in meal:
-                try:
-                    # meal["dessert"] = food_items[random.choice(desserts)]["recipe-id"]
-                    meal["dessert"] = random.choice(desserts)
-                except:
-                    meal["dessert"] = random.choice(backup_foods)
-    return days
+
+def score_meal(meal: Dict, meal_config: Dict, user_preferences: Dict[str, int]):
+    """Calculate the 3 goodness scores of a single meal, inserting them into the meal dictionary.
+    Returns the (variety, item coverage, nutritional constraint) scores
+    """
+    meal["variety_score"] = food_variety_score(meal["meal_types"])
+    meal["item_coverage_score"] = food_item_coverage_score(meal, meal_config)
+    meal["nutritional_constraint_score"] = nutritional_constraint_score(
+        meal, user_preferences
+    )
+    return (
+        meal["variety_score"],
+        meal["item_coverage_score"],
+        meal["nutritional_constraint_score"],
+    )
 
 
 def calculate_goodness(
@@ -751,32 +825,78 @@ def calculate_goodness(
     """Given meal plan calculates 3 scores for each meal: variety, item coverage, and nutritional constraints (see metrics.py for more details)
     Edits meal_plan dictionary parameter by reference, inserting 3 new keys for 3 scores for each meal
     Also edits 3 lists of 3 scores, which can be used for further statistical analysis
-    """
-
-    variety_scores = []
-    coverage_scores = []
-    constraint_scores = []
 
+    Every meal of the plan is scored at once (see scoring.score_meals)
+    """
+    meals = []
+    configured_roles = []
     for day_meals in meal_plan.values():
-        day_meals = day_meals["meals"]
-        for meal, meal_config in zip(day_meals, meal_configs):
-            # meal = meal["meal_types"]
-
-            meal_dup_score = food_variety_score(meal["meal_types"])
-            meal["variety_score"] = meal_dup_score
-            variety_scores.append(meal_dup_score)
-
-            meal_item_coverage_score = food_item_coverage_score(meal, meal_config)
-            meal["item_coverage_score"] = meal_item_coverage_score
-            coverage_scores.append(meal_item_coverage_score)
-
-            meal_nutritional_constraint_score = nutritional_constraint_score(
-                meal, user_preferences
-            )
-            meal["nutritional_constraint_score"] = meal_nutritional_constraint_score
-            constraint_scores.append(meal_nutritional_constraint_score)
+        for meal, meal_config in zip(day_meals["meals"], meal_configs):
+            meals.append(meal)
+            configured_roles.append(meal_config["meal_types"])
+
+    variety, coverage, constraint = score_meals(
+        [meal["meal_types"] for meal in meals], configured_roles, user_preferences
+    )
+    variety_scores = variety.tolist()
+    coverage_scores = coverage.tolist()
+    constraint_scores = constraint.tolist()
+    for meal, variety, coverage, constraint in zip(
+        meals, variety_scores, coverage_scores, constraint_scores
+    ):
+        meal["variety_score"] = variety
+        meal["item_coverage_score"] = coverage
+        meal["nutritional_constraint_score"] = constraint
     return {
         "variety_scores": variety_scores,
         "coverage_scores": coverage_scores,
         "constraint_scores": constraint_scores,
     }
+
+
+def rescore_meal(
+    meal_plan: Dict,
+    date: str,
+    meal_index: int,
+    meal_configs: List[Dict],
+    user_preferences: Dict[str, int],
+) -> Dict:
+    """Rescore one meal of a scored meal plan after its items changed, without rescoring the plan.
+
+    The meal's 3 scores are recomputed (see score_meal), and the plan-level aggregates are patched
+    in place: the meal's entries in the score lists of calculate_goodness and the nutrient totals of
+    its day. The plan-wide variety stats are left as they are.
+    Returns the changed fields of the meal plan, as field paths ({"scores.variety_scores": [...], ...})
+    """
+    days = meal_plan["days"]
+    meal = day_meals(days[date])[meal_index]
+    changed = {f"days.{date}.meals": days[date]["meals"]}
+    # like calculate_goodness, which pairs the meals of a day with the meal configs in order,
+    # and only scores the meals of a day up to the number of meal configs
+    if meal_index >= len(meal_configs):
+        return changed
+    scores = score_meal(meal, meal_configs[meal_index], user_preferences)
+
+    # plans are scored in date order, the days the client sent back may be in any order
+    plan_scores = meal_plan.get("scores")
+    if isinstance(plan_scores, dict):
+        position = meal_index + sum(
+            min(len(day_meals(days[other_date])), len(meal_configs))
+            for other_date in days
+            if other_date < date
+        )
+        for key, score in zip(
+            ("variety_scores", "coverage_scores", "constraint_scores"), scores
+        ):
+            values = plan_scores.get(key)
+            if isinstance(values, list) and position < len(values):
+                if values[position] != score:
+                    values[position] = score
+                    changed[f"scores.{key}"] = values
+
+    nutrition = meal_plan.get("nutrition")
+    if isinstance(nutrition, dict) and date in (nutrition.get("days") or {}):
+        day_nutrition = nutrition_summary({date: days[date]}, nutrition.get("goals"))
+        nutrition["days"][date] = day_nutrition["days"][date]
+        changed[f"nutrition.days.{date}"] = nutrition["days"][date]
+    return changed
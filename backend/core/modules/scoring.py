@@ -0,0 +1,277 @@
+"""Stateless meal scoring
+
+The dietary features of every recipe and beverage (dairy, meat, nuts) are
+packed into a bitmask once per catalog version, in a FeatureTable derived
+from the catalog like the other indexes (see Catalog.derived), together with
+the meal roles every recipe can fill. A user's preferences become the mask of
+the features they dislike, so the nutritional constraint score of a meal is
+the union of the masks of its items, intersected with the disliked mask, and
+its item coverage score is a lookup per role: O(items in the meal), without
+any per-request setup.
+
+Nothing is stored outside of the tables, which are never modified once built
+(a new catalog version gets new tables), so the functions here can score
+meals from any number of threads at once.
+
+Recipes and beverages have separate id spaces, so the table keeps them apart
+and items are looked up by the role they fill.
+
+score_meals scores many meals at once (e.g. a whole plan): every role becomes
+a column of slot codes (the features of the item filling it, and whether it
+fits the role, packed together and looked up in a single dict of the table),
+and the three scores of every meal are computed with array operations on the
+columns.
+"""
+
+from typing import Collection, Dict, FrozenSet, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .catalog import Catalog, CatalogChanges, get_catalog
+
+# User preference -> bit of the item feature it constrains
+PREFERENCE_BITS = {"dairyPreference": 1, "meatPreference": 2, "nutsPreference": 4}
+
+# Number of set bits of every feature mask
+POPCOUNT = tuple(bin(mask).count("1") for mask in range(8))
+_POPCOUNT = np.array(POPCOUNT, dtype=np.int64)
+
+# Bits of a slot code above the feature bits: the slot has an item, which fits
+# its role
+FILLED = 8
+FITS = 16
+
+
+def meal_role(catalog_role: str) -> str:
+    """Meal role of a catalog food role ("Main Course" -> "main_course")"""
+    return "_".join(catalog_role.lower().split())
+
+
+def feature_mask(record) -> int:
+    return (
+        (1 if record.has_dairy else 0)
+        | (2 if record.has_meat else 0)
+        | (4 if record.has_nuts else 0)
+    )
+
+
+class FeatureTable:
+    """Feature mask of every recipe and beverage of a catalog version, and the
+    meal roles of every recipe"""
+
+    __slots__ = (
+        "recipe_masks",
+        "beverage_masks",
+        "recipe_roles",
+        "role_codes",
+        "recipe_codes",
+    )
+
+    def __init__(
+        self,
+        recipe_masks: Dict[str, int],
+        beverage_masks: Dict[str, int],
+        recipe_roles: Dict[str, FrozenSet[str]],
+    ):
+        self.recipe_masks = recipe_masks
+        self.beverage_masks = beverage_masks
+        self.recipe_roles = recipe_roles
+        # slot codes of the items fitting every role, and of any recipe filling
+        # a role it does not fit
+        self.recipe_codes = {
+            item_id: mask | FILLED for item_id, mask in recipe_masks.items()
+        }
+        self.role_codes: Dict[str, Dict[str, int]] = {
+            "beverage": {
+                item_id: mask | FILLED | FITS
+                for item_id, mask in beverage_masks.items()
+            }
+        }
+        for item_id, roles in recipe_roles.items():
+            code = self.recipe_codes[item_id] | FITS
+            for role in roles:
+                if role != "beverage":
+                    self.role_codes.setdefault(role, {})[item_id] = code
+
+    @classmethod
+    def from_catalog(cls, catalog: Catalog) -> "FeatureTable":
+        return cls(
+            {
+                item_id: feature_mask(record)
+                for item_id, record in catalog.recipes.items()
+            },
+            {
+                item_id: feature_mask(record)
+                for item_id, record in catalog.beverages.items()
+            },
+            {
+                item_id: frozenset(map(meal_role, record.roles))
+                for item_id, record in catalog.recipes.items()
+            },
+        )
+
+    def updated(
+        self, catalog: Catalog, changes: Optional[CatalogChanges] = None
+    ) -> "FeatureTable":
+        """Table of a new catalog version, recomputing only the entries of changed
+        items. Returns a new table, this one is left untouched."""
+        if changes is None:
+            return FeatureTable.from_catalog(catalog)
+        recipe_masks = dict(self.recipe_masks)
+        beverage_masks = dict(self.beverage_masks)
+        recipe_roles = dict(self.recipe_roles)
+        for item_id in changes.recipes:
+            record = catalog.recipes.get(item_id)
+            if record is None:
+                recipe_masks.pop(item_id, None)
+                recipe_roles.pop(item_id, None)
+            else:
+                recipe_masks[item_id] = feature_mask(record)
+                recipe_roles[item_id] = frozenset(map(meal_role, record.roles))
+        for item_id in changes.beverages:
+            record = catalog.beverages.get(item_id)
+            if record is None:
+                beverage_masks.pop(item_id, None)
+            else:
+                beverage_masks[item_id] = feature_mask(record)
+        return FeatureTable(recipe_masks, beverage_masks, recipe_roles)
+
+    def covers(self, role: str, item_id: str) -> bool:
+        """Whether an item may fill a meal role ("main_course", "beverage", ...)"""
+        if role == "beverage":
+            return item_id in self.beverage_masks
+        return role in self.recipe_roles.get(item_id, ())
+
+    def mask(self, role: str, item_id: str) -> int:
+        """Features of the item filling a meal role, 0 for unknown items"""
+        masks = self.beverage_masks if role == "beverage" else self.recipe_masks
+        return masks.get(item_id, 0)
+
+    def meal_mask(self, meal_types: Dict[str, str]) -> int:
+        """Union of the features of the items of a meal ({role: item id})"""
+        mask = 0
+        for role, item_id in meal_types.items():
+            mask |= self.mask(role, item_id)
+        return mask
+
+
+def feature_table(catalog: Optional[Catalog] = None) -> FeatureTable:
+    """Feature table of a catalog version (the current one by default), built on first use"""
+    catalog = catalog or get_catalog()
+    return catalog.derived("features", FeatureTable.from_catalog, FeatureTable.updated)
+
+
+def disliked_mask(user_preferences: Dict[str, int]) -> int:
+    """Features the user does not want (preference -1)"""
+    mask = 0
+    for preference, value in user_preferences.items():
+        if value == -1:
+            mask |= PREFERENCE_BITS.get(preference, 0)
+    return mask
+
+
+def num_constraints(user_preferences: Dict[str, int]) -> int:
+    """Number of constraints the preferences define, at least 1"""
+    return max(
+        1, sum(1 for preference in user_preferences if preference in PREFERENCE_BITS)
+    )
+
+
+def constraint_score(
+    meal_types: Dict[str, str],
+    user_preferences: Dict[str, int],
+    table: Optional[FeatureTable] = None,
+) -> float:
+    """Share of the user's constraints a meal ({role: item id}) respects: each
+    disliked feature present in the meal violates one"""
+    table = table or feature_table()
+    violated = POPCOUNT[table.meal_mask(meal_types) & disliked_mask(user_preferences)]
+    return 1 - violated / num_constraints(user_preferences)
+
+
+def coverage_score(
+    meal_types: Dict[str, str],
+    configured_roles: Iterable[str],
+    table: Optional[FeatureTable] = None,
+) -> float:
+    """How well a meal ({role: item id}) fills the roles of its meal config, every
+    configured role (requested or not) weighing the same: +1 for an item that
+    fits its role, -1 for one that does not, nothing for a role left empty.
+    Negative scores count as 0"""
+    table = table or feature_table()
+    configured_roles = list(configured_roles)
+    if not configured_roles:
+        return 0.0
+    score = 0
+    for role in configured_roles:
+        item_id = meal_types.get(role)
+        if item_id:
+            score += 1 if table.covers(role, item_id) else -1
+    return max(0.0, score / len(configured_roles))
+
+
+def score_meals(
+    meals: Sequence[Dict[str, str]],
+    configured_roles: Sequence[Collection[str]],
+    user_preferences: Dict[str, int],
+    table: Optional[FeatureTable] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Variety, item coverage and nutritional constraint scores of many meals
+    ({role: item id}), configured_roles holding the roles of the meal config of
+    each meal. The scores are the ones of metrics.py, as float64 arrays"""
+    table = table or feature_table()
+    num_meals = len(meals)
+    roles = set().union(*meals, *configured_roles)
+    num_items = np.zeros(num_meals, dtype=np.int64)
+    num_distinct = np.zeros(num_meals, dtype=np.int64)
+    fit = np.zeros(num_meals, dtype=np.int64)
+    union = np.zeros(num_meals, dtype=np.int64)
+    seen = []
+    for role in roles:
+        role_codes = table.role_codes.get(role, {})
+        recipe_codes = {} if role == "beverage" else table.recipe_codes
+        items = [meal.get(role) for meal in meals]
+        codes = np.array(
+            [
+                (
+                    (role_codes.get(item_id) or recipe_codes.get(item_id, FILLED))
+                    if item_id
+                    else 0
+                )
+                for item_id in items
+            ],
+            dtype=np.int64,
+        )
+        configured = np.array([role in config for config in configured_roles], bool)
+        items = np.array(items, dtype=object)
+        present = np.not_equal(items, None)
+
+        # variety: items not already in an earlier role of the meal
+        distinct = present.copy()
+        for earlier, earlier_present in seen:
+            distinct &= ~(earlier_present & (items == earlier))
+        seen.append((items, present))
+        num_items += present
+        num_distinct += distinct
+
+        # coverage: +1 / -1 for the items of the configured roles
+        filled = configured & (codes & FILLED != 0)
+        fit += np.where(codes & FITS != 0, filled, -filled.astype(np.int64))
+
+        # constraint: union of the item features
+        union |= codes & 7
+
+    variety = np.where(
+        num_items > 0, 1 - (num_items - num_distinct) / np.maximum(num_items, 1), 0.0
+    )
+    num_configured = np.array(
+        [len(config) for config in configured_roles], dtype=np.int64
+    )
+    coverage = np.where(
+        num_configured > 0,
+        np.maximum(fit / np.maximum(num_configured, 1), 0.0),
+        0.0,
+    )
+    violated = _POPCOUNT[union & disliked_mask(user_preferences)]
+    constraint = 1 - violated / num_constraints(user_preferences)
+    return variety, coverage, constraint
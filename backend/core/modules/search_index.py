@@ -0,0 +1,446 @@
+"""In-memory search over the catalog's recipe names, ingredients and beverage names
+
+Every catalog item gets a slot number. The postings of the tokens (the slots
+of the items using them) are sorted arrays of slots, stored back to back in
+token order in a single numpy array, so each posting only costs 4 bytes and
+the postings of all the tokens starting with a prefix are one contiguous
+slice: the sorted tokens serve prefix queries like a trie. The few large sets
+(the items having a meal role, a dietary flag, the items still alive) are
+Python ints used as bitsets over the slots.
+
+When the catalog changes, the index is derived incrementally from the one of
+the previous version: only the items whose document changed are re-tokenized,
+and when the changes are known (live sync) only those items are visited. The
+postings of the items added since the arrays were built are kept in a small
+overlay until there are enough of them to rebuild the arrays, and removed
+items are dropped from the results by the alive bitset.
+"""
+
+import json
+import threading
+from bisect import bisect_left, insort
+from itertools import chain
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .catalog import Catalog, CatalogChanges
+from .ingredient_index import document_ingredients, normalize_ingredient
+
+RECIPE = "recipe"
+BEVERAGE = "beverage"
+
+# Meal role of every beverage
+BEVERAGE_ROLE = "Beverage"
+
+# Role names used by meal configs -> role names of the catalog
+ROLE_ALIASES = {
+    "main_course": "Main Course",
+    "side": "Side",
+    "dessert": "Dessert",
+    "beverage": BEVERAGE_ROLE,
+}
+
+# Dietary filter -> (record attribute, required value)
+DIETARY_FILTERS = {
+    "vegan": ("is_vegan", True),
+    "gluten_free": ("is_gluten_free", True),
+    "low_sugar": ("is_low_sugar", True),
+    "dairy_free": ("has_dairy", False),
+    "meat_free": ("has_meat", False),
+    "nut_free": ("has_nuts", False),
+}
+
+_FLAG_ATTRIBUTES = tuple(attribute for attribute, _ in DIETARY_FILTERS.values())
+
+# Largest number of slots held by the prefix unions remembered by an index
+_PREFIX_CACHE_SLOTS = 1 << 22
+
+# Share of the slots which can be added or removed before the postings are rebuilt
+_COMPACT_RATIO = 16
+
+
+def tokenize(text: str) -> List[str]:
+    """Words of a name or query, folded like ingredient names"""
+    return normalize_ingredient(text).split()
+
+
+class Postings:
+    """Sorted slots of the items using each token, back to back in token order.
+
+    The slots of tokens[i] are slots[offsets[i]:offsets[i + 1]].
+    """
+
+    __slots__ = ("tokens", "offsets", "slots")
+
+    def __init__(self, token_slots: Dict[str, List[int]]):
+        """token_slots maps every token to the sorted slots of the items using it"""
+        self.tokens = sorted(token_slots)
+        counts = np.fromiter(
+            (len(token_slots[token]) for token in self.tokens),
+            dtype=np.int64,
+            count=len(self.tokens),
+        )
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.slots = np.fromiter(
+            chain.from_iterable(token_slots[token] for token in self.tokens),
+            dtype=np.uint32,
+            count=int(self.offsets[-1]),
+        )
+        # requests slice the postings, which must not change under them
+        self.offsets.flags.writeable = False
+        self.slots.flags.writeable = False
+
+    def prefix(self, prefix: str) -> Tuple[np.ndarray, int]:
+        """Postings of the tokens starting with prefix, and the number of these tokens"""
+        start = bisect_left(self.tokens, prefix)
+        end = bisect_left(self.tokens, prefix + "\U0010ffff", start)
+        return self.slots[self.offsets[start] : self.offsets[end]], end - start
+
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.slots.nbytes
+
+
+class SearchIndex:
+    """Token postings and filter bitsets over the items of one catalog version"""
+
+    def __init__(self):
+        # slot -> (kind, item id), None once the item is removed
+        self.slots: List[Optional[Tuple[str, str]]] = []
+        self.slot_of: Dict[Tuple[str, str], int] = {}
+        # slot -> hash of the document it was indexed from
+        self.document_hashes: List[int] = []
+        # slot -> (name tokens, ingredient tokens)
+        self.slot_tokens: List[Tuple[FrozenSet[str], FrozenSet[str]]] = []
+        # postings of the name tokens, and of the name and ingredient tokens
+        self.name_postings = Postings({})
+        self.postings = Postings({})
+        # token -> slots of the items added since the postings were built
+        self.added_name_slots: Dict[str, Tuple[int, ...]] = {}
+        self.added_slots: Dict[str, Tuple[int, ...]] = {}
+        self.added_tokens: List[str] = []
+        # items added or removed since the postings were built
+        self.changed = 0
+        self.role_bits: Dict[str, int] = {}
+        self.flag_bits: Dict[str, int] = {
+            attribute: 0 for attribute in _FLAG_ATTRIBUTES
+        }
+        self.alive = 0
+        self._prefix_cache: Dict[Tuple[str, bool], np.ndarray] = {}
+        self._prefix_cache_slots = 0
+        self._prefix_lock = threading.Lock()
+
+    @classmethod
+    def from_catalog(cls, catalog: Catalog) -> "SearchIndex":
+        index = cls()
+        role_slots: Dict[str, List[int]] = {}
+        flag_slots: Dict[str, List[int]] = {
+            attribute: [] for attribute in _FLAG_ATTRIBUTES
+        }
+        for slot, (kind, item_id, raw) in enumerate(_catalog_documents(catalog)):
+            record, roles, name_tokens, ingredient_tokens = _item_terms(
+                catalog, kind, item_id, raw
+            )
+            index.slots.append((kind, item_id))
+            index.slot_of[(kind, item_id)] = slot
+            index.document_hashes.append(hash(raw))
+            index.slot_tokens.append((name_tokens, ingredient_tokens))
+            for role in roles:
+                role_slots.setdefault(role, []).append(slot)
+            for attribute in _FLAG_ATTRIBUTES:
+                if getattr(record, attribute, False):
+                    flag_slots[attribute].append(slot)
+
+        # setting bits one at a time would copy the growing ints over and over
+        size = len(index.slots)
+        index.role_bits = {r: _bitset(s, size) for r, s in role_slots.items()}
+        index.flag_bits = {a: _bitset(s, size) for a, s in flag_slots.items()}
+        index.alive = (1 << size) - 1
+        index._compact()
+        return index
+
+    @property
+    def tokens(self) -> List[str]:
+        """Sorted tokens of the postings, those of removed items linger until they are rebuilt"""
+        if not self.added_tokens:
+            return self.postings.tokens
+        return sorted(set(self.postings.tokens).union(self.added_tokens))
+
+    def updated(
+        self, catalog: Catalog, changes: Optional[CatalogChanges] = None
+    ) -> "SearchIndex":
+        """Index of a new catalog version, re-tokenizing only the changed items.
+
+        With the changes that lead to the new version, only the changed items
+        are visited, otherwise every document is compared with the one it was
+        indexed from. Returns a new index, this one is left untouched for the
+        requests still using the previous catalog.
+        """
+        index = self._copy()
+        if changes is None:
+            seen = set()
+            for kind, item_id, raw in _catalog_documents(catalog):
+                seen.add((kind, item_id))
+                index._sync(catalog, kind, item_id, raw)
+            for key in [key for key in index.slot_of if key not in seen]:
+                index._remove(index.slot_of[key])
+        else:
+            for kind, item_ids, documents in (
+                (RECIPE, changes.recipes, catalog.recipe_documents),
+                (BEVERAGE, changes.beverages, catalog.beverage_documents),
+            ):
+                for item_id in item_ids:
+                    index._sync(catalog, kind, item_id, documents.get(item_id))
+
+        # too many removed slots, start over
+        if len(index.slot_of) < len(index.slots) // 2:
+            return SearchIndex.from_catalog(catalog)
+        if index.changed * _COMPACT_RATIO > len(index.slots):
+            index._compact()
+        return index
+
+    def _sync(self, catalog: Catalog, kind: str, item_id: str, raw: Optional[bytes]):
+        """Re-index an item from its current document (None once removed)"""
+        slot = self.slot_of.get((kind, item_id))
+        if slot is not None and raw is not None:
+            if self.document_hashes[slot] == hash(raw):
+                return
+        if slot is not None:
+            self._remove(slot)
+        if raw is not None:
+            self._add(catalog, kind, item_id, raw)
+
+    def _copy(self) -> "SearchIndex":
+        # postings, bitsets and token sets are immutable, shallow copies are enough
+        index = SearchIndex()
+        index.slots = list(self.slots)
+        index.slot_of = dict(self.slot_of)
+        index.document_hashes = list(self.document_hashes)
+        index.slot_tokens = list(self.slot_tokens)
+        index.name_postings = self.name_postings
+        index.postings = self.postings
+        index.added_name_slots = dict(self.added_name_slots)
+        index.added_slots = dict(self.added_slots)
+        index.added_tokens = list(self.added_tokens)
+        index.changed = self.changed
+        index.role_bits = dict(self.role_bits)
+        index.flag_bits = dict(self.flag_bits)
+        index.alive = self.alive
+        return index
+
+    def _compact(self):
+        """Rebuild the postings from the tokens of the items still alive"""
+        name_slots: Dict[str, List[int]] = {}
+        token_slots: Dict[str, List[int]] = {}
+        for slot, (name_tokens, ingredient_tokens) in enumerate(self.slot_tokens):
+            if self.slots[slot] is None:
+                continue
+            for token in name_tokens:
+                name_slots.setdefault(token, []).append(slot)
+            for token in name_tokens | ingredient_tokens:
+                token_slots.setdefault(token, []).append(slot)
+        self.name_postings = Postings(name_slots)
+        self.postings = Postings(token_slots)
+        self.added_name_slots = {}
+        self.added_slots = {}
+        self.added_tokens = []
+        self.changed = 0
+
+    def _add(self, catalog: Catalog, kind: str, item_id: str, raw: bytes):
+        record, roles, name_tokens, ingredient_tokens = _item_terms(
+            catalog, kind, item_id, raw
+        )
+
+        slot = len(self.slots)
+        bit = 1 << slot
+        self.slots.append((kind, item_id))
+        self.slot_of[(kind, item_id)] = slot
+        self.document_hashes.append(hash(raw))
+        self.slot_tokens.append((name_tokens, ingredient_tokens))
+        # slots only grow, the new one goes last
+        for token in name_tokens:
+            self.added_name_slots[token] = self.added_name_slots.get(token, ()) + (
+                slot,
+            )
+        for token in name_tokens | ingredient_tokens:
+            if token not in self.added_slots:
+                insort(self.added_tokens, token)
+            self.added_slots[token] = self.added_slots.get(token, ()) + (slot,)
+        for role in roles:
+            self.role_bits[role] = self.role_bits.get(role, 0) | bit
+        for attribute in _FLAG_ATTRIBUTES:
+            if getattr(record, attribute, False):
+                self.flag_bits[attribute] |= bit
+        self.alive |= bit
+        self.changed += 1
+
+    def _remove(self, slot: int):
+        # the slot stays in the postings until they are rebuilt, the alive bitset hides it
+        bit = 1 << slot
+        kind_and_id = self.slots[slot]
+        self.slots[slot] = None
+        del self.slot_of[kind_and_id]
+        for role, bits in self.role_bits.items():
+            self.role_bits[role] = bits & ~bit
+        for attribute, bits in self.flag_bits.items():
+            self.flag_bits[attribute] = bits & ~bit
+        self.alive &= ~bit
+        self.changed += 1
+
+    def prefix_slots(self, prefix: str, names_only: bool = False) -> np.ndarray:
+        """Sorted slots of the items with a token starting with prefix (in their name
+        when names_only is set), removed items included"""
+        key = (prefix, names_only)
+        slots = self._prefix_cache.get(key)
+        if slots is not None:
+            return slots
+
+        postings = self.name_postings if names_only else self.postings
+        added = self.added_name_slots if names_only else self.added_slots
+        slots, num_tokens = postings.prefix(prefix)
+        start = bisect_left(self.added_tokens, prefix)
+        end = bisect_left(self.added_tokens, prefix + "\U0010ffff", start)
+        added_slots = [
+            slot
+            for token in self.added_tokens[start:end]
+            for slot in added.get(token, ())
+        ]
+        if added_slots:
+            slots = np.concatenate((slots, np.array(added_slots, dtype=np.uint32)))
+        if num_tokens > 1 or added_slots:
+            # an item can use several of the tokens
+            slots = _unique(slots, len(self.slots))
+
+        with self._prefix_lock:
+            if self._prefix_cache_slots + len(slots) > _PREFIX_CACHE_SLOTS:
+                self._prefix_cache.clear()
+                self._prefix_cache_slots = 0
+            self._prefix_cache[key] = slots
+            self._prefix_cache_slots += len(slots)
+        return slots
+
+    def filter_bits(
+        self, roles: Iterable[str] = (), dietary_filters: Iterable[str] = ()
+    ) -> int:
+        """Items having any of the roles and every dietary filter (see DIETARY_FILTERS)"""
+        bits = self.alive
+        roles = [ROLE_ALIASES.get(role, role) for role in roles]
+        if roles:
+            role_bits = 0
+            for role in roles:
+                role_bits |= self.role_bits.get(role, 0)
+            bits &= role_bits
+        for dietary_filter in dietary_filters:
+            attribute, required = DIETARY_FILTERS[dietary_filter]
+            if required:
+                bits &= self.flag_bits[attribute]
+            else:
+                bits &= ~self.flag_bits[attribute]
+        return bits
+
+    def search(
+        self,
+        query: str,
+        roles: Iterable[str] = (),
+        dietary_filters: Iterable[str] = (),
+        limit: int = 20,
+    ) -> Tuple[List[Tuple[str, str]], int]:
+        """Find the items matching every word of the query as a prefix of a name
+        or ingredient word, and passing the filters.
+
+        Items matching every word in their name come first. Returns up to limit
+        (kind, item id) pairs and the total number of matches.
+        """
+        size = len(self.slots)
+        passing = _mask(self.filter_bits(roles, dietary_filters), size)
+        words = set(tokenize(query))
+        if not words:
+            matches = name_matches = np.flatnonzero(passing)
+        else:
+            matches = _intersection([self.prefix_slots(word) for word in words], size)
+            name_matches = _intersection(
+                [self.prefix_slots(word, names_only=True) for word in words], size
+            )
+            matches = matches[passing[matches]]
+            name_matches = name_matches[passing[name_matches]]
+
+        ranked = name_matches[:limit]
+        if len(ranked) < limit:
+            # name matches are also matches, the others come next
+            in_name = np.zeros(size, dtype=bool)
+            in_name[name_matches] = True
+            others = matches[~in_name[matches]]
+            ranked = np.concatenate((ranked, others[: limit - len(ranked)]))
+        return [self.slots[slot] for slot in ranked.tolist()], len(matches)
+
+    def nbytes(self) -> int:
+        """Memory held by the postings arrays"""
+        return self.name_postings.nbytes() + self.postings.nbytes()
+
+
+def _item_terms(catalog: Catalog, kind: str, item_id: str, raw: bytes):
+    """Record, meal roles, name tokens and ingredient tokens of an item"""
+    if kind == RECIPE:
+        record = catalog.recipes[item_id]
+        roles = record.roles
+        ingredient_tokens = frozenset(
+            token
+            for ingredient in document_ingredients(json.loads(raw))
+            for token in ingredient.split()
+        )
+    else:
+        record = catalog.beverages[item_id]
+        roles = (BEVERAGE_ROLE,)
+        ingredient_tokens = frozenset()
+    return record, roles, frozenset(tokenize(record.name)), ingredient_tokens
+
+
+def _unique(slots: np.ndarray, size: int) -> np.ndarray:
+    """Sorted distinct slots"""
+    # sorting is cheaper for a few slots, marking them for many
+    if len(slots) * 16 < size:
+        return np.unique(slots)
+    marked = np.zeros(size, dtype=bool)
+    marked[slots] = True
+    return np.flatnonzero(marked)
+
+
+def _intersection(postings: List[np.ndarray], size: int) -> np.ndarray:
+    """Sorted slots of the items in every one of the postings"""
+    postings = sorted(postings, key=len)
+    slots = postings[0]
+    for other in postings[1:]:
+        if not len(slots):
+            break
+        marked = np.zeros(size, dtype=bool)
+        marked[other] = True
+        slots = slots[marked[slots]]
+    return slots
+
+
+def _mask(bits: int, size: int) -> np.ndarray:
+    """Boolean array over the slots of a bitset"""
+    bitmap = np.frombuffer(bits.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(bitmap, count=size, bitorder="little").view(bool)
+
+
+def _bitset(slots: List[int], size: int) -> int:
+    """Int with the bits of the given slots set"""
+    if len(slots) < 8:
+        return sum(1 << slot for slot in slots)
+    bitmap = bytearray((size + 7) // 8)
+    for slot in slots:
+        bitmap[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bitmap, "little")
+
+
+def _catalog_documents(catalog: Catalog):
+    for item_id in catalog.recipes:
+        yield RECIPE, item_id, catalog.recipe_documents.get(item_id)
+    for item_id in catalog.beverages:
+        yield BEVERAGE, item_id, catalog.beverage_documents.get(item_id)
+
+
+def search_index(catalog: Catalog) -> SearchIndex:
+    """Search index of a catalog version, derived from the previous version's when possible"""
+    return catalog.derived("search", SearchIndex.from_catalog, SearchIndex.updated)
@@ -0,0 +1,45 @@
+"""Per-request random generators
+
+Every random stage of meal plan generation (the bandit's train/test split,
+the choice of favorite items, the draw and search of the plan) takes an
+explicit NumPy Generator instead of using the global random module. The
+generators of a request all derive from one seed, itself derived from the
+request's inputs unless the client supplies it, and the seed is recorded on
+the plan. Identical requests therefore produce identical plans, and a plan
+can be replayed by sending its seed back.
+"""
+
+import hashlib
+import json
+import zlib
+from typing import Any, Optional
+
+import numpy as np
+
+# Seeds stay below 2**53 so they survive a round trip through JavaScript numbers
+MAX_SEED = 2**53 - 1
+
+# Generation stages, each gets its own generator so that changing one stage
+# (e.g. skipping the bandit training) leaves the draws of the others unchanged
+SPLIT_STAGE = "split"
+FAVORITES_STAGE = "favorites"
+PLAN_STAGE = "plan"
+
+
+def derive_seed(*inputs: Any) -> int:
+    """Seed derived from JSON-serializable inputs, independent of dict key order"""
+    encoded = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.blake2b(encoded.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & MAX_SEED
+
+
+def parse_seed(value: Any) -> Optional[int]:
+    """Seed given by a client, None if it is not an integer in [0, MAX_SEED]"""
+    if isinstance(value, bool) or not isinstance(value, int):
+        return None
+    return value if 0 <= value <= MAX_SEED else None
+
+
+def stage_rng(seed: int, stage: str) -> np.random.Generator:
+    """Generator of one generation stage of a request"""
+    return np.random.default_rng([seed, zlib.crc32(stage.encode())])
@@ -146,7 +146,7 @@ class User:
 
 
     def get_nutritional_goals(self) -> Dict[str, int]:
-        if self.nutritional_goals:
+        if getattr(self, "nutritional_goals", None):
             return self.nutritional_goals
         return {"calories": 0, "carbs": 0, "protein": 0, "fiber": 0}
 
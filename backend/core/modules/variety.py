@@ -0,0 +1,145 @@
+"""Cross-day variety of meal plans
+
+Drawing every slot independently lets the same main course come back day
+after day, and food_variety_score only looks inside a single meal. The
+sampler here enforces a no-repeat window per role instead: an item used on
+one day is not drawn again for that role during the following
+window - 1 days (a window of 1 only keeps a day's meals from sharing items).
+
+Each role keeps its candidates in one array split in two: the items that can
+be drawn, then the items blocked by the window. Drawing swaps the item to the
+blocked side, and when a day leaves the window its items are swapped back, so
+every slot costs O(1) and never has to retry. A window larger than the pool
+can sustain is shortened to what it can.
+"""
+
+from collections import deque
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from .nutrition import day_meals
+
+
+def effective_window(no_repeat_days: int, pool_size: int, slots_per_day: int) -> int:
+    """Longest window, up to no_repeat_days, the pool has enough items for"""
+    if slots_per_day > pool_size:
+        return 0
+    return max(0, min(no_repeat_days, pool_size // slots_per_day))
+
+
+class WindowSampler:
+    """Draws the items of one role, none repeating within a window of days"""
+
+    __slots__ = ("items", "position", "available", "window", "recent")
+
+    def __init__(self, pool: Sequence[str], window: int):
+        self.items: List[str] = list(dict.fromkeys(pool))
+        self.position: Dict[str, int] = {
+            item: index for index, item in enumerate(self.items)
+        }
+        # items[:available] can be drawn, the rest are blocked by the window
+        self.available = len(self.items)
+        self.window = window
+        # items drawn on each day of the window, oldest first
+        self.recent: deque = deque()
+
+    def start_day(self):
+        if not self.window:
+            return
+        if len(self.recent) == self.window:
+            for item in self.recent.popleft():
+                self._release(item)
+        self.recent.append([])
+
+    def draw(self, uniform: float) -> str:
+        """Item for a uniform number in [0, 1)"""
+        index = int(uniform * self.available)
+        item = self.items[index]
+        if self.window:
+            self._swap(index, self.available - 1)
+            self.available -= 1
+            self.recent[-1].append(item)
+        return item
+
+    def _release(self, item: str):
+        self._swap(self.position[item], self.available)
+        self.available += 1
+
+    def _swap(self, i: int, j: int):
+        items, position = self.items, self.position
+        items[i], items[j] = items[j], items[i]
+        position[items[i]] = i
+        position[items[j]] = j
+
+
+def draw_varied_slots(
+    pools: Dict[str, Sequence[str]],
+    roles: List[List[str]],
+    num_days: int,
+    rng: np.random.Generator,
+    no_repeat_days: Dict[str, int],
+) -> Dict[str, List[List[str]]]:
+    """Like draw_slots, but no item repeats within its role's no-repeat window.
+
+    Roles without a window are drawn independently, as by draw_slots.
+    """
+    slots_per_role: Dict[str, int] = {}
+    for meal in roles:
+        for role in meal:
+            slots_per_role[role] = slots_per_role.get(role, 0) + 1
+
+    drawn = {}
+    for role, num_slots in slots_per_role.items():
+        pool = pools.get(role)
+        if pool is None or not len(pool):
+            raise ValueError(f"No candidate items for {role}")
+        items = list(dict.fromkeys(pool))
+        sampler = WindowSampler(
+            items,
+            effective_window(no_repeat_days.get(role, 0), len(items), num_slots),
+        )
+        uniforms = rng.random((num_days, num_slots)).tolist()
+        rows = []
+        for day_uniforms in uniforms:
+            sampler.start_day()
+            rows.append([sampler.draw(uniform) for uniform in day_uniforms])
+        drawn[role] = rows
+    return drawn
+
+
+def variety_stats(days: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Plan-level variety of every role of a plan ({date: day plan}).
+
+    For each role: the number of slots and distinct items, the share of
+    repeated slots, the most uses of a single item, the smallest number of days
+    between two uses of an item (None if no item repeats) and how many times an
+    item came back the day after it was used.
+    """
+    uses: Dict[str, Dict[str, List[int]]] = {}
+    for day_index, day_plan in enumerate(days.values()):
+        for meal in day_meals(day_plan):
+            for role, item_id in (meal.get("meal_types") or {}).items():
+                if item_id:
+                    uses.setdefault(role, {}).setdefault(item_id, []).append(day_index)
+
+    stats = {}
+    for role, item_days in uses.items():
+        day_sets = [set(used) for used in item_days.values()]
+        num_slots = sum(len(used) for used in item_days.values())
+        gaps = [
+            later - earlier
+            for used in item_days.values()
+            for earlier, later in zip(used, used[1:])
+        ]
+        stats[role] = {
+            "slots": num_slots,
+            "distinct_items": len(item_days),
+            "repeat_rate": round(1 - len(item_days) / num_slots, 4),
+            "max_uses": max(len(used) for used in item_days.values()),
+            "min_gap_days": min(gaps) if gaps else None,
+            "next_day_repeats": sum(
+                1 for used in day_sets for day_index in used if day_index - 1 in used
+            ),
+        }
+    return stats
@@ -3,11 +3,17 @@ from . import views
 
 urlpatterns = [
     path("recommendation/bandit", views.bandit_recommendation, name="bandit_recommendation"),
+    path("recommendation/bandit-batch", views.batch_bandit_recommendation, name="batch_bandit_recommendation"),
     path("recommendation/regenerate-partial", views.regenerate_partial_meal_plan, name="regenerate_partial_meal_plan"),
+    path("recommendation/regenerate-slot", views.regenerate_meal_slot, name="regenerate_meal_slot"),
     path("recommendation/edit-meal", views.edit_meal_plan, name="edit_meal_plan"),
+    path("recommendation/score", views.score_meal_plans, name="score_meal_plans"),
+    path("recommendation/plan-cache-stats", views.plan_cache_stats, name="plan_cache_stats"),
     path("recommendation/retrieve-days/<str:user_id>", views.retrieve_day_plans, name="retrieve_day_plans"),
     path("get-recipe-info/<str:recipe_id>", views.get_recipe_info, name="get_recipe_info"),
     path("get-beverage-info/<str:beverage_id>", views.get_beverage_info, name="get_beverage_info"),
+    path("items/batch", views.get_items_batch, name="get_items_batch"),
+    path("catalog/search", views.search_catalog, name="search_catalog"),
 
     # User management
     path("user/signup", views.create_user, name="create_user"),
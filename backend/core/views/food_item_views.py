@@ -1,10 +1,22 @@
-from django.http import JsonResponse, HttpRequest
+from django.http import JsonResponse, HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import csrf_exempt
 
 
+from ..modules.catalog import get_catalog
 from ..modules.firebase import FirebaseManager
+from ..modules.search_index import (
+    BEVERAGE,
+    BEVERAGE_ROLE,
+    DIETARY_FILTERS,
+    search_index,
+)
 
 
+from termcolor import colored
 import logging
+import json
 
 
 firebaseManager = FirebaseManager()  # DB manager
@@ -12,10 +24,40 @@ firebaseManager = FirebaseManager()  # DB manager
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
 logger = logging.getLogger(__name__)
 
+# How long browsers may reuse an item before revalidating it with its ETag
+ITEM_INFO_MAX_AGE = 5 * 60
+
+# Largest number of ids accepted by one batch request
+MAX_BATCH_ITEMS = 2000
+
+# Default and largest number of results returned by a search
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+
+def _catalog_item_response(request: HttpRequest, catalog, raw: bytes):
+    """
+    Serve an encoded catalog document as is, answering 304 when the client already has this version of it.
+    """
+    etag = quote_etag(catalog.document_etag(raw))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(raw, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=ITEM_INFO_MAX_AGE)
+    return response
+
 
 def get_recipe_info(request: HttpRequest, recipe_id):
     if request.method != "GET":
         return JsonResponse({"Error": "Incorrect HTTP method"}, status=400)
+
+    catalog = get_catalog()
+    raw = catalog.recipe_documents.get(recipe_id)
+    if raw is not None:
+        return _catalog_item_response(request, catalog, raw)
+
+    # not in the catalog (yet), fall back to Firestore
     # Get R3 representation of the specified recipe
     r3, _ = firebaseManager.get_single_r3(recipe_id)
 
@@ -28,7 +70,169 @@ def get_recipe_info(request: HttpRequest, recipe_id):
 def get_beverage_info(request: HttpRequest, beverage_id):
     if request.method != "GET":
         return JsonResponse({"Error": "Incorrect HTTP method"}, status=400)
+
+    catalog = get_catalog()
+    raw = catalog.beverage_documents.get(beverage_id)
+    if raw is not None:
+        return _catalog_item_response(request, catalog, raw)
+
+    # not in the catalog (yet), fall back to Firestore
     bev, _ = firebaseManager.get_single_beverage(beverage_id)
     if isinstance(bev, Exception):
         return JsonResponse({"Error": "Error retrieving beverage"}, status=400)
     return JsonResponse(bev, status=200)
+
+
+def _parse_id_list(data, key):
+    """
+    Read an optional list of string ids from the request body, dropping duplicates but keeping the order.
+    Returns None if the value is not a list of strings.
+    """
+    ids = data.get(key, [])
+    if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+        return None
+    return list(dict.fromkeys(ids))
+
+
+def _batch_section(documents, ids, fields):
+    """
+    Encode {id: document} for the ids found in the document store, and return the ids that were not found.
+    Without a projection the stored documents are spliced in as is, without decoding them.
+    """
+    entries, missing = [], []
+    for item_id in ids:
+        raw = documents.get(item_id)
+        if raw is None:
+            missing.append(item_id)
+            continue
+        if fields is not None:
+            document = json.loads(raw)
+            raw = json.dumps(
+                {field: document[field] for field in fields if field in document},
+                separators=(",", ":"),
+            ).encode()
+        entries.append(json.dumps(item_id).encode() + b":" + raw)
+    return b"{" + b",".join(entries) + b"}", missing
+
+
+@csrf_exempt
+def get_items_batch(request: HttpRequest):
+    """
+    Retrieve many recipes and beverages from the catalog in one request, e.g. to render a whole meal plan.
+    Optionally only returns the requested top level fields of every item, and lists the ids that were not found.
+    """
+    if request.method != "POST":
+        return JsonResponse({"Error": "Invalid Request Method"}, status=400)
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"Error": "Request body must be valid JSON"}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({"Error": "Request body must be a JSON object"}, status=400)
+
+    recipe_ids = _parse_id_list(data, "recipe_ids")
+    beverage_ids = _parse_id_list(data, "beverage_ids")
+    if recipe_ids is None or beverage_ids is None:
+        return JsonResponse(
+            {"Error": "recipe_ids and beverage_ids must be lists of id strings"},
+            status=400,
+        )
+    if len(recipe_ids) + len(beverage_ids) > MAX_BATCH_ITEMS:
+        return JsonResponse(
+            {"Error": f"At most {MAX_BATCH_ITEMS} items can be requested at once"},
+            status=400,
+        )
+
+    fields = data.get("fields")
+    if fields is not None and (
+        not isinstance(fields, list) or not all(isinstance(f, str) for f in fields)
+    ):
+        return JsonResponse(
+            {"Error": "fields must be a list of field names"}, status=400
+        )
+
+    catalog = get_catalog()
+    recipes, missing_recipes = _batch_section(
+        catalog.recipe_documents, recipe_ids, fields
+    )
+    beverages, missing_beverages = _batch_section(
+        catalog.beverage_documents, beverage_ids, fields
+    )
+    logger.info(
+        colored(
+            f"Batch item info: {len(recipe_ids)} recipes, {len(beverage_ids)} beverages, "
+            f"{len(missing_recipes) + len(missing_beverages)} missing",
+            "green",
+        )
+    )
+
+    missing = json.dumps(
+        {"recipe_ids": missing_recipes, "beverage_ids": missing_beverages},
+        separators=(",", ":"),
+    ).encode()
+    body = (
+        b'{"catalog_version":'
+        + json.dumps(catalog.version).encode()
+        + b',"recipes":'
+        + recipes
+        + b',"beverages":'
+        + beverages
+        + b',"missing":'
+        + missing
+        + b"}"
+    )
+    return HttpResponse(body, content_type="application/json")
+
+
+def search_catalog(request: HttpRequest):
+    """
+    Search the recipes and beverages by name and ingredients, e.g. to find a replacement item for a meal.
+    Query parameters: q (words matched as prefixes), role (repeatable or comma separated, e.g. main_course),
+    dietary filters set to true (vegan, gluten_free, low_sugar, dairy_free, meat_free, nut_free) and limit.
+    """
+    if request.method != "GET":
+        return JsonResponse({"Error": "Incorrect HTTP method"}, status=400)
+
+    query = request.GET.get("q", "")
+    roles = [
+        role
+        for value in request.GET.getlist("role")
+        for role in value.split(",")
+        if role
+    ]
+    dietary_filters = [
+        name
+        for name in DIETARY_FILTERS
+        if request.GET.get(name, "").lower() in ("1", "true")
+    ]
+    try:
+        limit = min(int(request.GET.get("limit", SEARCH_LIMIT)), MAX_SEARCH_LIMIT)
+    except ValueError:
+        return JsonResponse({"Error": "limit must be an integer"}, status=400)
+
+    catalog = get_catalog()
+    matches, total = search_index(catalog).search(
+        query, roles, dietary_filters, max(limit, 0)
+    )
+
+    results = []
+    for kind, item_id in matches:
+        if kind == BEVERAGE:
+            record = catalog.beverages[item_id]
+            roles_of_item = [BEVERAGE_ROLE]
+        else:
+            record = catalog.recipes[item_id]
+            roles_of_item = list(record.roles)
+        result = {
+            "id": item_id,
+            "type": kind,
+            "name": record.name,
+            "roles": roles_of_item,
+        }
+        for name, (attribute, required) in DIETARY_FILTERS.items():
+            result[name] = getattr(record, attribute, False) == required
+        results.append(result)
+
+    return JsonResponse(
+        {"query": query, "total": total, "results": results}, status=200
+    )
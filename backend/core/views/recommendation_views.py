@@ -1,15 +1,49 @@
-from django.http import JsonResponse, HttpRequest, HttpResponse
+from django.conf import settings
+from django.http import JsonResponse, HttpRequest, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 
 from ..modules.recommendation_helpers import (
+    cached_candidate_pools,
+    score_meal,
     configure_bandit,
     train_bandit,
     test_bandit,
     gen_bandit_rec,
+    gen_optimized_rec,
+    gen_nutrition_rec,
     calculate_goodness,
     get_bandit_favorite_items,
+    rescore_meal,
+)
+from ..modules.batch_generation import (
+    PoolCache,
+    evaluate_plan,
+    evaluate_plans,
+    generate_plan_days,
+    group_users,
+    run_parallel,
 )
 from ..modules.firebase import FirebaseManager
+from ..modules.meal_plan_generator import ROLE_ITEMS
+from ..modules.catalog import get_catalog
+from ..modules.nutrition import day_meals, has_goals, meal_nutrients, nutrition_summary
+from ..modules.plan_cache import get_plan_cache, plan_cache_key
+from ..modules.plan_stream import (
+    NDJSON_CONTENT_TYPE,
+    background_executor,
+    stream_meal_plan,
+)
+from ..modules.scoring import score_meals
+from ..modules.variety import variety_stats
+from ..modules.seeding import (
+    FAVORITES_STAGE,
+    MAX_SEED,
+    PLAN_STAGE,
+    SPLIT_STAGE,
+    derive_seed,
+    parse_seed,
+    stage_rng,
+)
 
 import random
 from datetime import datetime, timedelta
@@ -26,9 +60,115 @@ logger = logging.getLogger(__name__)
 
 GUEST_ID = "67ee9325af31921234bf1241"
 
+# assumed when a generation request has no dietary conditions
+DEFAULT_DIETARY_CONDITIONS = {
+    "diabetes": False,
+    "gluten_free": True,
+    "vegan": True,
+    "vegetarian": False,
+}
+
 """Recommendation API Endpoints"""
 
 
+def _log_failure(action: str, result):
+    msg, status = result
+    if status != 200:
+        logger.error(colored(f"Failed to {action}: {msg}", "red"))
+
+
+def _save_dayplan(user_id: str, date: str, day_plan: dict):
+    _log_failure(
+        f"save the day plan of {date}",
+        firebaseManager.add_dayplan_temp(user_id, date, day_plan),
+    )
+
+
+def _save_user_settings(user, meal_plan_config, user_preferences, dietary_conditions):
+    _log_failure(
+        "save the meal plan config", user.set_meal_plan_config(meal_plan_config)
+    )
+    _log_failure(
+        "save the user preferences", user.set_numerical_preferences(user_preferences)
+    )
+    _log_failure(
+        "save the dietary conditions", user.set_dietary_conditions(dietary_conditions)
+    )
+
+
+def _stream_response(
+    meal_plan: dict,
+    meal_configs,
+    user_preferences,
+    nutritional_goals,
+    user_id,
+    user,
+    meal_plan_config,
+    dietary_conditions,
+    on_complete=None,
+):
+    """NDJSON response sending the meal plan day by day (see plan_stream.py). The
+    Firestore writes run in the background, each day is queued as it is sent"""
+    executor = background_executor()
+    on_day = None
+    if user_id:
+        executor.submit(
+            _save_user_settings,
+            user,
+            meal_plan_config,
+            user_preferences,
+            dietary_conditions,
+        )
+
+        def on_day(date, day_plan):
+            day_plan["user_id"] = user_id
+            executor.submit(_save_dayplan, user_id, date, day_plan)
+
+    return StreamingHttpResponse(
+        stream_meal_plan(
+            meal_plan,
+            meal_configs,
+            user_preferences,
+            nutritional_goals,
+            on_day=on_day,
+            on_complete=on_complete,
+        ),
+        content_type=NDJSON_CONTENT_TYPE,
+    )
+
+
+def _time_budget(data: dict):
+    """Seconds the meal plan search may take, from the optional 'time_budget_ms' key
+    (capped by MAX_MEAL_PLAN_TIME_BUDGET_MS), None if it is invalid"""
+    budget = data.get("time_budget_ms", settings.MEAL_PLAN_TIME_BUDGET_MS)
+    if isinstance(budget, bool) or not isinstance(budget, (int, float)) or budget <= 0:
+        return None
+    return min(budget, settings.MAX_MEAL_PLAN_TIME_BUDGET_MS) / 1000
+
+
+def _no_repeat_days(data: dict):
+    """No-repeat window in days of each meal role, MEAL_PLAN_NO_REPEAT_DAYS updated with
+    the optional 'no_repeat_days' key, None if it is invalid"""
+    windows = data.get("no_repeat_days", {})
+    if not isinstance(windows, dict) or any(
+        role not in ROLE_ITEMS
+        or isinstance(days, bool)
+        or not isinstance(days, int)
+        or days < 0
+        for role, days in windows.items()
+    ):
+        return None
+    return {**settings.MEAL_PLAN_NO_REPEAT_DAYS, **windows}
+
+
+def _request_seed(data: dict, *inputs):
+    """Seed of a generation request: the optional 'seed' key, derived from the inputs
+    otherwise. None if the given seed is invalid"""
+    if data.get("seed") is None:
+        return derive_seed(*inputs)
+    return parse_seed(data["seed"])
+
+
 @csrf_exempt
 def bandit_recommendation(request: HttpRequest):
     """
@@ -92,15 +232,49 @@ def bandit_recommendation(request: HttpRequest):
 
         user_preferences = data["user_preferences"]
         user_id = data["user_id"]
-        dietary_conditions = data.get(
-            "dietary_conditions",
-            {
-                "diabetes": False,
-                "gluten_free": True,
-                "vegan": True,
-                "vegetarian": False,
-            },
+
+        # optionally search for the best scoring plan instead of sampling one
+        optimize = bool(data.get("optimize", False))
+        # optionally pick the items bringing every day closest to the user's nutritional goals
+        target_nutrition = bool(data.get("target_nutrition", False))
+        if optimize and target_nutrition:
+            return JsonResponse(
+                {"Error": "'optimize' and 'target_nutrition' cannot be combined"},
+                status=400,
+            )
+        # optionally send the plan day by day as NDJSON while it is scored and saved
+        stream = bool(data.get("stream", False))
+        time_budget = _time_budget(data)
+        if time_budget is None:
+            return JsonResponse(
+                {"Error": "'time_budget_ms' must be a positive number"},
+                status=400,
+            )
+        no_repeat_days = _no_repeat_days(data)
+        if no_repeat_days is None:
+            return JsonResponse(
+                {"Error": "'no_repeat_days' must map meal roles to a number of days"},
+                status=400,
+            )
+
+        dietary_conditions = data.get("dietary_conditions", DEFAULT_DIETARY_CONDITIONS)
+
+        # every random stage of the generation is seeded from the request, so identical
+        # requests get identical plans and a plan can be replayed from its seed
+        seed = _request_seed(
+            data,
+            user_id,
+            meal_plan_config,
+            user_preferences,
+            dietary_conditions,
+            starting_date.strftime("%Y-%m-%d"),
+            optimize,
         )
+        if seed is None:
+            return JsonResponse(
+                {"Error": f"'seed' must be an integer between 0 and {MAX_SEED}"},
+                status=400,
+            )
 
         logger.info(f"User ID: {user_id}")
 
@@ -111,6 +285,13 @@ def bandit_recommendation(request: HttpRequest):
                 status=status,
             )
 
+        nutritional_goals = user.get_nutritional_goals()
+        if target_nutrition and not has_goals(nutritional_goals):
+            return JsonResponse(
+                {"Error": "User has no nutritional goals to target"},
+                status=400,
+            )
+
         old_dietary_conditions = user.get_dietary_conditions()
 
         bandit_counter = user.get_bandit_counter()
@@ -140,7 +321,9 @@ def bandit_recommendation(request: HttpRequest):
 
             try:
                 start = time.time()
-                bandit_trial_path, trial_num = configure_bandit(num_days)
+                bandit_trial_path, trial_num = configure_bandit(
+                    num_days, rng=stage_rng(seed, SPLIT_STAGE)
+                )
                 end = time.time()
                 execution_time = end - start
                 logger.info(f"Configuring bandit: {execution_time:.4f} seconds")
@@ -175,7 +358,10 @@ def bandit_recommendation(request: HttpRequest):
             logger.info("Fetching recommended favorite items")
             # get the favorite items recommended by the bandit and save them to firebase
             favorite_items = get_bandit_favorite_items(
-                trial_num, user_preferences, dietary_conditions
+                trial_num,
+                user_preferences,
+                dietary_conditions,
+                rng=stage_rng(seed, FAVORITES_STAGE),
             )
 
             # update user favorite items
@@ -199,48 +385,130 @@ def bandit_recommendation(request: HttpRequest):
         for key, item_list in permanent_favorite_items.items():
             favorite_items[key] = list(set(favorite_items[key] + item_list))
 
-        # Generate Bandit Recommendation
-        start = time.time()
-        logger.info("Generating recommendation")
-        try:
-            days = gen_bandit_rec(
-                favorite_items=favorite_items,
-                num_days=num_days,
-                meal_configs=meal_configs,
-                starting_date=starting_date,
-                dietary_conditions=dietary_conditions,
-                meal_plan_name=meal_plan_name,
-            )
-            # Construct meal plan object
-            meal_plan = {
-                "_id": str(ObjectId()),  # Unique ID for the meal plan
-                "user_id": user_id,  # Link to the specific user
-                "name": meal_plan_name,
-                "days": days,
-            }
-        except:
-            logger.error("There was an error in generating the meal plan")
-            return JsonResponse(
-                {"Error": "There was an error in generating the meal plan"},
-                status=500,
-            )
-        end = time.time()
-        execution_time = end - start
-        logger.info(f"Generating Rec: {execution_time:.4f} seconds")
-
-        try:
+        # a repeated request (e.g. the frontend reloading) is served the plan and scores
+        # generated the first time
+        plan_cache = get_plan_cache()
+        cache_key = plan_cache_key(
+            favorite_items,
+            meal_configs,
+            dietary_conditions,
+            num_days,
+            seed,
+            # plans and their day plans keep their ids, never serve them to another user
+            user_id=user_id,
+            starting_date=starting_date.strftime("%Y-%m-%d"),
+            meal_plan_name=meal_plan_name,
+            user_preferences=user_preferences,
+            nutritional_goals=nutritional_goals,
+            time_budget=time_budget if optimize or target_nutrition else None,
+            no_repeat_days=None if optimize else no_repeat_days,
+            target_nutrition=target_nutrition,
+            catalog_version=get_catalog().version,
+        )
+        meal_plan = plan_cache.get(cache_key)
+        if meal_plan is not None:
+            logger.info(colored("Serving cached meal plan", "green"))
+        else:
+            # Generate Bandit Recommendation
             start = time.time()
-            scores = calculate_goodness(
-                meal_plan["days"], meal_configs, user_preferences
-            )
-            meal_plan["scores"] = scores
+            logger.info("Generating recommendation")
+            try:
+                search_stats = None
+                if optimize:
+                    days, search_stats = gen_optimized_rec(
+                        favorite_items=favorite_items,
+                        num_days=num_days,
+                        meal_configs=meal_configs,
+                        starting_date=starting_date,
+                        dietary_conditions=dietary_conditions,
+                        meal_plan_name=meal_plan_name,
+                        user_preferences=user_preferences,
+                        time_budget=time_budget,
+                        weights=settings.MEAL_PLAN_SCORE_WEIGHTS,
+                        rng=stage_rng(seed, PLAN_STAGE),
+                    )
+                    logger.info(f"Meal plan search: {search_stats}")
+                elif target_nutrition:
+                    days, search_stats = gen_nutrition_rec(
+                        favorite_items=favorite_items,
+                        num_days=num_days,
+                        meal_configs=meal_configs,
+                        starting_date=starting_date,
+                        dietary_conditions=dietary_conditions,
+                        meal_plan_name=meal_plan_name,
+                        nutritional_goals=nutritional_goals,
+                        time_budget=time_budget,
+                        rng=stage_rng(seed, PLAN_STAGE),
+                        no_repeat_days=no_repeat_days,
+                    )
+                    logger.info(f"Nutrition search: {search_stats}")
+                else:
+                    days = gen_bandit_rec(
+                        favorite_items=favorite_items,
+                        num_days=num_days,
+                        meal_configs=meal_configs,
+                        starting_date=starting_date,
+                        dietary_conditions=dietary_conditions,
+                        meal_plan_name=meal_plan_name,
+                        rng=stage_rng(seed, PLAN_STAGE),
+                        no_repeat_days=no_repeat_days,
+                    )
+                # Construct meal plan object
+                meal_plan = {
+                    "_id": str(ObjectId()),  # Unique ID for the meal plan
+                    "user_id": user_id,  # Link to the specific user
+                    "name": meal_plan_name,
+                    "days": days,
+                    "seed": seed,  # Replays the plan when sent back with the same request
+                }
+                if search_stats is not None:
+                    meal_plan["search"] = search_stats
+            except:
+                logger.error("There was an error in generating the meal plan")
+                return JsonResponse(
+                    {"Error": "There was an error in generating the meal plan"},
+                    status=500,
+                )
             end = time.time()
             execution_time = end - start
-            logger.info(f"Evaluating Rec: {execution_time:.4f} seconds")
-        except Exception as e:
-            return JsonResponse(
-                {"Error": f"There was an error evaluating the recommendation: {e}"},
-                status=500,
+            logger.info(f"Generating Rec: {execution_time:.4f} seconds")
+
+            # streamed plans are scored day by day as they are sent
+            if not stream:
+                try:
+                    start = time.time()
+                    scores = calculate_goodness(
+                        meal_plan["days"], meal_configs, user_preferences
+                    )
+                    meal_plan["scores"] = scores
+                    meal_plan["nutrition"] = nutrition_summary(
+                        meal_plan["days"], nutritional_goals
+                    )
+                    meal_plan["variety"] = variety_stats(meal_plan["days"])
+                    end = time.time()
+                    execution_time = end - start
+                    logger.info(f"Evaluating Rec: {execution_time:.4f} seconds")
+                except Exception as e:
+                    return JsonResponse(
+                        {
+                            "Error": f"There was an error evaluating the recommendation: {e}"
+                        },
+                        status=500,
+                    )
+
+                plan_cache.put(cache_key, meal_plan)
+
+        if stream:
+            return _stream_response(
+                meal_plan,
+                meal_configs,
+                user_preferences,
+                nutritional_goals,
+                user_id,
+                user,
+                meal_plan_config,
+                dietary_conditions,
+                on_complete=lambda plan: plan_cache.put(cache_key, plan),
             )
 
         logger.info(f"Saving meal plan to firebase")
@@ -284,6 +552,420 @@ def bandit_recommendation(request: HttpRequest):
         )
 
 
+def _batch_entry(data: dict, optimize: bool):
+    """Generation inputs of one user of a batch request, or an error message"""
+    if not isinstance(data, dict) or "user_id" not in data:
+        return None, "Entry is missing key 'user_id'"
+    meal_plan_config = data.get("meal_plan_config")
+    if not isinstance(meal_plan_config, dict) or (
+        "num_days" not in meal_plan_config or "meal_configs" not in meal_plan_config
+    ):
+        return None, "meal_plan_config key is missing key 'meal_configs' or 'num_days'"
+    if "user_preferences" not in data:
+        return None, "Entry is missing key 'user_preferences'"
+    try:
+        starting_date = (
+            datetime.strptime(data["starting_date"], "%Y-%m-%d")
+            if "starting_date" in data
+            else datetime.now()
+        )
+    except (TypeError, ValueError):
+        return None, "'starting_date' must be a date of the form YYYY-MM-DD"
+
+    entry = {
+        "user_id": data["user_id"],
+        "user_preferences": data["user_preferences"],
+        "dietary_conditions": data.get(
+            "dietary_conditions", DEFAULT_DIETARY_CONDITIONS
+        ),
+        "meal_plan_config": meal_plan_config,
+        "meal_configs": meal_plan_config["meal_configs"],
+        "num_days": meal_plan_config["num_days"],
+        "starting_date": starting_date,
+        "meal_plan_name": data.get("meal_plan_name", "User Meal Plan"),
+    }
+    # seeded like a single bandit recommendation of the same user
+    entry["seed"] = _request_seed(
+        data,
+        entry["user_id"],
+        meal_plan_config,
+        entry["user_preferences"],
+        entry["dietary_conditions"],
+        starting_date.strftime("%Y-%m-%d"),
+        optimize,
+    )
+    if entry["seed"] is None:
+        return None, f"'seed' must be an integer between 0 and {MAX_SEED}"
+    return entry, None
+
+
+@csrf_exempt
+def batch_bandit_recommendation(request: HttpRequest):
+    """
+    Generate bandit-based meal plans for many users at once, e.g. a cohort being onboarded.
+    Users with the same dietary conditions and preferences share one set of favorite items
+    (from a single bandit training), their plans are generated in parallel and saved with
+    batched writes.
+    """
+    if request.method != "POST":
+        return JsonResponse({"Error": "Incorrect HTTP method"}, status=400)
+    try:
+        logger.info("Batch Meal Plan Generation API Called ...")
+        data: dict = json.loads(request.body)
+        users_data = data.get("users")
+        if not isinstance(users_data, list) or not users_data:
+            return JsonResponse(
+                {"Error": "Request body is missing key 'users'"},
+                status=403,
+            )
+        if len(users_data) > settings.MAX_BATCH_USERS:
+            return JsonResponse(
+                {"Error": f"At most {settings.MAX_BATCH_USERS} users per request"},
+                status=400,
+            )
+
+        optimize = bool(data.get("optimize", False))
+        time_budget = _time_budget(data)
+        if time_budget is None:
+            return JsonResponse(
+                {"Error": "'time_budget_ms' must be a positive number"},
+                status=400,
+            )
+        no_repeat_days = _no_repeat_days(data)
+        if no_repeat_days is None:
+            return JsonResponse(
+                {"Error": "'no_repeat_days' must map meal roles to a number of days"},
+                status=400,
+            )
+
+        # results and saved plans are keyed by user id
+        seen, duplicates = set(), set()
+        for entry_data in users_data:
+            user_id = isinstance(entry_data, dict) and entry_data.get("user_id")
+            if isinstance(user_id, str):
+                (duplicates if user_id in seen else seen).add(user_id)
+        if duplicates:
+            return JsonResponse(
+                {
+                    "Error": f"Duplicate 'user_id' entries: {', '.join(sorted(duplicates))}"
+                },
+                status=400,
+            )
+
+        errors = {}
+        entries = []
+        for index, entry_data in enumerate(users_data):
+            entry, error = _batch_entry(entry_data, optimize)
+            if error is not None:
+                # entries without a user id are reported by position
+                user_id = isinstance(entry_data, dict) and entry_data.get("user_id")
+                errors[str(user_id or index)] = error
+            else:
+                entries.append(entry)
+
+        users, status = firebaseManager.get_users_by_id(
+            [entry["user_id"] for entry in entries]
+        )
+        if status != 200:
+            return JsonResponse({"Error": users}, status=status)
+        for entry in entries:
+            if entry["user_id"] not in users:
+                errors[entry["user_id"]] = "User not found"
+        entries = [entry for entry in entries if entry["user_id"] in users]
+        if not entries:
+            return JsonResponse({"meal_plans": {}, "errors": errors}, status=400)
+
+        groups = group_users(entries)
+        logger.info(f"Batch of {len(entries)} users in {len(groups)} groups")
+
+        # one bandit training serves every preference profile
+        start = time.time()
+        try:
+            bandit_trial_path, trial_num = configure_bandit(
+                max(entry["num_days"] for entry in entries),
+                rng=stage_rng(derive_seed(sorted(groups)), SPLIT_STAGE),
+            )
+        except:
+            return JsonResponse(
+                {"Error": "There was an error in configuring the bandit setup"},
+                status=500,
+            )
+        if not train_bandit(bandit_trial_path):
+            return JsonResponse(
+                {"Error": "There was an error in training the boosted bandit"},
+                status=500,
+            )
+        if not test_bandit(bandit_trial_path):
+            return JsonResponse(
+                {"Error": "There was an error in testing the boosted bandit"},
+                status=500,
+            )
+        logger.info(f"Training bandit: {time.time() - start:.4f} seconds")
+
+        # favorite items of every group, and of every user with their permanent favorites
+        start = time.time()
+        group_favorites = {}
+        for key, indices in groups.items():
+            first = entries[indices[0]]
+            group_favorites[key] = get_bandit_favorite_items(
+                trial_num,
+                first["user_preferences"],
+                first["dietary_conditions"],
+                rng=stage_rng(derive_seed(key), FAVORITES_STAGE),
+            )
+            for index in indices:
+                favorite_items = dict(group_favorites[key])
+                permanent_favorite_items = (
+                    users[entries[index]["user_id"]].get_permanent_favorite_items()
+                    or {}
+                )
+                for role, item_list in permanent_favorite_items.items():
+                    favorite_items[role] = list(
+                        set(favorite_items.get(role, []) + item_list)
+                    )
+                entries[index]["group"] = key
+                entries[index]["favorite_items"] = favorite_items
+
+        pool_cache = PoolCache()
+        results = run_parallel(
+            lambda entry: generate_plan_days(
+                pool_cache.get(
+                    entry["favorite_items"],
+                    entry["meal_configs"],
+                    entry["dietary_conditions"],
+                ),
+                entry,
+                optimize=optimize,
+                time_budget=time_budget,
+                weights=settings.MEAL_PLAN_SCORE_WEIGHTS,
+                no_repeat_days=no_repeat_days,
+            ),
+            entries,
+            settings.BATCH_GENERATION_WORKERS,
+        )
+        logger.info(
+            f"Generating {len(entries)} plans from {len(pool_cache)} candidate pools: "
+            f"{time.time() - start:.4f} seconds"
+        )
+
+        # the goodness metrics are stateless, plans are scored in parallel too
+        start = time.time()
+        generated = []
+        for entry, (result, error) in zip(entries, results):
+            if error is not None:
+                logger.error(
+                    f"Error generating the meal plan of {entry['user_id']}: {error}"
+                )
+                errors[entry["user_id"]] = (
+                    "There was an error in generating the meal plan"
+                )
+            else:
+                generated.append((entry, *result))
+        evaluations = run_parallel(
+            lambda plan: evaluate_plan(
+                plan[1],
+                plan[0]["meal_configs"],
+                plan[0]["user_preferences"],
+                users[plan[0]["user_id"]].get_nutritional_goals(),
+            ),
+            generated,
+            settings.BATCH_GENERATION_WORKERS,
+        )
+
+        meal_plans = {}
+        day_plans = {}
+        user_updates = {}
+        for (entry, days, search_stats), (evaluation, error) in zip(
+            generated, evaluations
+        ):
+            user_id = entry["user_id"]
+            if error is not None:
+                errors[user_id] = (
+                    f"There was an error evaluating the recommendation: {error}"
+                )
+                continue
+            user = users[user_id]
+            meal_plan = {
+                "_id": str(ObjectId()),
+                "user_id": user_id,
+                "name": entry["meal_plan_name"],
+                "days": days,
+                "seed": entry["seed"],
+            }
+            if search_stats is not None:
+                meal_plan["search"] = search_stats
+            meal_plan.update(evaluation)
+            for day_plan in days.values():
+                day_plan["user_id"] = user_id
+            meal_plans[user_id] = meal_plan
+            day_plans[user_id] = days
+            user_updates[user_id] = {
+                "favorite_items": group_favorites[entry["group"]],
+                "bandit_counter": user.get_bandit_counter() + 1,
+                "meal_plan_config": entry["meal_plan_config"],
+                "dietary_preferences.numerical_preferences": entry["user_preferences"],
+                "dietary_conditions": entry["dietary_conditions"],
+            }
+        logger.info(
+            f"Evaluating {len(meal_plans)} plans: {time.time() - start:.4f} seconds"
+        )
+
+        response = {"meal_plans": meal_plans, "errors": errors, "groups": len(groups)}
+        start = time.time()
+        writes, status = firebaseManager.save_generated_plans(day_plans, user_updates)
+        logger.info(f"Saving {writes} documents: {time.time() - start:.4f} seconds")
+        if status != 200:
+            logger.error(f"Error while saving meal plans: {writes}")
+            return JsonResponse(response, status=201)
+        return JsonResponse(response, status=200)
+    except:
+        return JsonResponse(
+            {"Error": "There was an error in generating the meal plans"},
+            status=500,
+        )
+
+
+def plan_cache_stats(request: HttpRequest):
+    """
+    Size and hit/miss counters of this worker's meal plan cache.
+    """
+    if request.method != "GET":
+        return JsonResponse({"Error": "Incorrect HTTP method"}, status=400)
+    return JsonResponse(get_plan_cache().stats(), status=200)
+
+
+def _valid_meal(meal) -> bool:
+    """Whether a meal maps its roles to item ids"""
+    meal_types = meal.get("meal_types") if isinstance(meal, dict) else None
+    return isinstance(meal_types, dict) and all(
+        isinstance(item_id, str) for item_id in meal_types.values()
+    )
+
+
+def _valid_meal_config(meal_config) -> bool:
+    return isinstance(meal_config, dict) and isinstance(
+        meal_config.get("meal_types"), dict
+    )
+
+
+def _plan_days(plan):
+    """Days of a meal plan to score, or an error message"""
+    days = plan.get("days") if isinstance(plan, dict) else None
+    if not isinstance(days, dict):
+        return None, "a meal plan is missing key 'days'"
+    for date, day_plan in days.items():
+        if not isinstance(day_plan, dict) or not isinstance(
+            day_plan.get("meals"), (list, dict)
+        ):
+            return None, f"the day plan of {date} is missing key 'meals'"
+        if not all(_valid_meal(meal) for meal in day_meals(day_plan)):
+            return None, f"a meal of {date} does not map its meal types to item ids"
+    return days, None
+
+
+@csrf_exempt
+def score_meal_plans(request: HttpRequest):
+    """
+    Score meal plans built or edited by the client, or a single meal, like generated plans
+    are scored. All the meals of the request are scored at once with the catalog's feature
+    table and nutrient matrix, and nothing is read from or written to Firestore.
+    """
+    if request.method != "POST":
+        return JsonResponse({"Error": "Incorrect HTTP method"}, status=400)
+    try:
+        data: dict = json.loads(request.body)
+        user_preferences = data.get("user_preferences")
+        if not isinstance(user_preferences, dict):
+            return JsonResponse(
+                {"Error": "Request body is missing key 'user_preferences'"},
+                status=403,
+            )
+        nutritional_goals = data.get("nutritional_goals")
+        if nutritional_goals is not None and not isinstance(nutritional_goals, dict):
+            return JsonResponse(
+                {"Error": "'nutritional_goals' must map nutrients to daily goals"},
+                status=400,
+            )
+
+        if "meal" in data:
+            if not _valid_meal_config(data.get("meal_config")):
+                return JsonResponse(
+                    {"Error": "Request body is missing key 'meal_config'"},
+                    status=403,
+                )
+            if not _valid_meal(data["meal"]):
+                return JsonResponse(
+                    {"Error": "'meal' must map its meal types to item ids"},
+                    status=400,
+                )
+            meal_types = data["meal"]["meal_types"]
+            variety, coverage, constraint = score_meals(
+                [meal_types], [data["meal_config"]["meal_types"]], user_preferences
+            )
+            return JsonResponse(
+                {
+                    "variety_score": variety.tolist()[0],
+                    "item_coverage_score": coverage.tolist()[0],
+                    "nutritional_constraint_score": constraint.tolist()[0],
+                    "nutrition": meal_nutrients(meal_types),
+                },
+                status=200,
+            )
+
+        single = "meal_plan" in data
+        plans = [data["meal_plan"]] if single else data.get("meal_plans")
+        if not isinstance(plans, list) or not plans:
+            return JsonResponse(
+                {
+                    "Error": "Request body is missing key 'meal_plans', 'meal_plan' or 'meal'"
+                },
+                status=403,
+            )
+        if len(plans) > settings.MAX_SCORED_PLANS:
+            return JsonResponse(
+                {
+                    "Error": f"At most {settings.MAX_SCORED_PLANS} meal plans per request"
+                },
+                status=400,
+            )
+        meal_configs = data.get("meal_configs")
+        if not isinstance(meal_configs, list) or not all(
+            _valid_meal_config(meal_config) for meal_config in meal_configs
+        ):
+            return JsonResponse(
+                {"Error": "Request body is missing key 'meal_configs'"},
+                status=403,
+            )
+        plan_days = []
+        for plan in plans:
+            days, error = _plan_days(plan)
+            if error is not None:
+                return JsonResponse(
+                    {"Error": f"Invalid meal plan: {error}"}, status=400
+                )
+            plan_days.append(days)
+
+        start = time.time()
+        evaluations = evaluate_plans(
+            plan_days, meal_configs, user_preferences, nutritional_goals
+        )
+        logger.info(
+            f"Scoring {len(plan_days)} meal plans: {time.time() - start:.4f} seconds"
+        )
+        scored = [
+            {"days": days, **evaluation}
+            for days, evaluation in zip(plan_days, evaluations)
+        ]
+        if single:
+            return JsonResponse({"meal_plan": scored[0]}, status=200)
+        return JsonResponse({"meal_plans": scored}, status=200)
+    except:
+        return JsonResponse(
+            {"Error": "There was an error in scoring the meal plans"},
+            status=500,
+        )
+
+
 @csrf_exempt
 def regenerate_partial_meal_plan(request: HttpRequest):
     """
@@ -330,13 +1012,37 @@ def regenerate_partial_meal_plan(request: HttpRequest):
             )
 
         dietary_conditions = user.get_dietary_conditions()
+
+        # the bandit counter changes on every call, so each regeneration gives new meals
+        # while staying replayable from the returned seed
+        seed = _request_seed(
+            data,
+            user_id,
+            dates_to_regenerate,
+            meal_plan_config,
+            user_preferences,
+            dietary_conditions,
+            bandit_counter,
+        )
+        if seed is None:
+            return JsonResponse(
+                {"Error": f"'seed' must be an integer between 0 and {MAX_SEED}"},
+                status=400,
+            )
+        no_repeat_days = _no_repeat_days(data)
+        if no_repeat_days is None:
+            return JsonResponse(
+                {"Error": "'no_repeat_days' must map meal roles to a number of days"},
+                status=400,
+            )
+
         if need_to_train:
             logger.info("Retraining bandit for new recommendations...")
             # Train bandit
             try:
                 # configure bandit
                 bandit_trial_path, trial_num = configure_bandit(
-                    len(dates_to_regenerate)
+                    len(dates_to_regenerate), rng=stage_rng(seed, SPLIT_STAGE)
                 )
 
                 # train and test bandit
@@ -347,7 +1053,10 @@ def regenerate_partial_meal_plan(request: HttpRequest):
 
                 # extract favorite items
                 favorite_items = get_bandit_favorite_items(
-                    trial_num, user_preferences, dietary_conditions=dietary_conditions
+                    trial_num,
+                    user_preferences,
+                    dietary_conditions=dietary_conditions,
+                    rng=stage_rng(seed, FAVORITES_STAGE),
                 )
 
                 # update user in firebase
@@ -375,6 +1084,8 @@ def regenerate_partial_meal_plan(request: HttpRequest):
                 starting_date=datetime.strptime(dates_to_regenerate[0], "%Y-%m-%d"),
                 dietary_conditions=dietary_conditions,
                 meal_plan_name=meal_plan_name,
+                rng=stage_rng(seed, PLAN_STAGE),
+                no_repeat_days=no_repeat_days,
             )
         except Exception as e:
             return JsonResponse(
@@ -407,18 +1118,175 @@ def regenerate_partial_meal_plan(request: HttpRequest):
                 status=500,
             )
 
-        return JsonResponse({"days": days}, status=200)
+        return JsonResponse(
+            {
+                "days": days,
+                "nutrition": nutrition_summary(days, user.get_nutritional_goals()),
+                "seed": seed,
+            },
+            status=200,
+        )
 
     except Exception as e:
         logger.exception("An error occurred while regenerating the meal plan")
         return JsonResponse({"Error": str(e)}, status=500)
 
 
+@csrf_exempt
+def regenerate_meal_slot(request: HttpRequest):
+    """
+    Replace the item of one role (e.g. the side) of one meal of a saved day plan with another
+    candidate item. Only that meal is rescored and the day plan is saved with a single update.
+    """
+    if request.method != "POST":
+        return JsonResponse({"Error": "Incorrect HTTP method"}, status=400)
+    try:
+        data: dict = json.loads(request.body)
+        for field in ("user_id", "date", "meal_id", "role"):
+            if field not in data:
+                return JsonResponse(
+                    {"Error": f"Request body is missing key '{field}'"},
+                    status=403,
+                )
+        user_id = data["user_id"]
+        date = data["date"]
+        meal_id = data["meal_id"]
+        role = data["role"]
+        if role not in ROLE_ITEMS:
+            return JsonResponse(
+                {"Error": f"'role' must be one of {', '.join(ROLE_ITEMS)}"},
+                status=400,
+            )
+
+        user, status = firebaseManager.get_user_by_id(user_id)
+        if status != 200:
+            return JsonResponse({"Error": user}, status=status)
+        day_plan_id = (user.get_temp_day_plans() or {}).get(date)
+        if day_plan_id is None:
+            return JsonResponse(
+                {"Error": f"No meal plan exists for date: {date}"}, status=404
+            )
+        day_plan, status = firebaseManager.get_temp_dayplan_by_id(day_plan_id)
+        if status != 200:
+            return JsonResponse({"Error": day_plan}, status=status)
+
+        meals = day_plan.get("meals") or []
+        meal = next((meal for meal in meals if meal.get("_id") == meal_id), None)
+        if meal is None:
+            return JsonResponse(
+                {"Error": f"Meal '{meal_id}' not found on {date}"}, status=404
+            )
+        meal_configs = user.get_meal_plan_config()["meal_configs"]
+        meal_config = next(
+            (
+                meal_config
+                for meal_config in meal_configs
+                if meal_config["meal_name"] == meal.get("meal_name")
+            ),
+            None,
+        )
+        if meal_config is None or not meal_config["meal_types"].get(role):
+            return JsonResponse(
+                {"Error": f"Meal '{meal.get('meal_name')}' has no {role}"},
+                status=400,
+            )
+
+        # the same candidates the plan was drawn from
+        favorite_items = dict(user.get_favorite_items())
+        for key, item_list in (user.get_permanent_favorite_items() or {}).items():
+            favorite_items[key] = list(set(favorite_items.get(key, []) + item_list))
+        dietary_conditions = user.get_dietary_conditions()
+        pools = cached_candidate_pools(favorite_items, meal_configs, dietary_conditions)
+
+        meal_types = meal.setdefault("meal_types", {})
+        previous_item = meal_types.get(role)
+        # the meal remembers how often the slot was regenerated and the items it last showed,
+        # so that repeated regenerations neither replay the same draws nor go back and forth
+        slot = meal.setdefault("regenerations", {}).setdefault(
+            role, {"count": 0, "recent": []}
+        )
+        shown = set(slot["recent"]) | {previous_item}
+        # prefer items the meal does not already have and that were not shown recently,
+        # then anything not shown recently, then anything but the current item
+        candidates = (
+            [
+                item
+                for item in pools[role]
+                if item not in meal_types.values() and item not in shown
+            ]
+            or [item for item in pools[role] if item not in shown]
+            or [item for item in pools[role] if item != previous_item]
+        )
+        if not candidates:
+            return JsonResponse(
+                {"Error": f"There is no other candidate {role}"}, status=409
+            )
+
+        seed = _request_seed(
+            data, user_id, date, meal_id, role, previous_item, slot["count"]
+        )
+        if seed is None:
+            return JsonResponse(
+                {"Error": f"'seed' must be an integer between 0 and {MAX_SEED}"},
+                status=400,
+            )
+        rng = stage_rng(seed, PLAN_STAGE)
+        meal_types[role] = candidates[int(rng.integers(len(candidates)))]
+        # at most half of the pool is held back, so that the slot keeps some choice
+        slot["count"] += 1
+        slot["recent"] = (slot["recent"] + [previous_item])[
+            -max(1, len(pools[role]) // 2) :
+        ]
+
+        try:
+            score_meal(meal, meal_config, user.get_numerical_preferences())
+        except Exception as e:
+            return JsonResponse(
+                {"Error": f"There was an error evaluating the meal: {e}"},
+                status=500,
+            )
+
+        # day plans keep their meals in an array, which Firestore only updates whole
+        msg, status = firebaseManager.update_temp_dayplan(day_plan_id, {"meals": meals})
+        if status != 200:
+            return JsonResponse({"Error": msg}, status=status)
+
+        return JsonResponse(
+            {
+                "date": date,
+                "day_plan_id": day_plan_id,
+                "meal": meal,
+                "previous_item": previous_item,
+                "seed": seed,
+            },
+            status=200,
+        )
+    except Exception as e:
+        logger.exception("regenerate_meal_slot failed")
+        return JsonResponse({"Error": f"Unexpected error: {str(e)}"}, status=500)
+
+
+def _item_exists(role: str, item_id: str) -> bool:
+    """Whether item_id is a beverage (for the beverage role) or a recipe, looked up in the
+    catalog, and in Firestore only for items the catalog does not have (yet)"""
+    catalog = get_catalog()
+    if role == "beverage":
+        if item_id in catalog.beverages:
+            return True
+        item, _ = firebaseManager.get_single_beverage(item_id)
+    else:
+        if item_id in catalog.recipes:
+            return True
+        item, _ = firebaseManager.get_single_r3(item_id)
+    return not isinstance(item, Exception)
+
+
 @csrf_exempt
 def edit_meal_plan(request: HttpRequest):
     """
     Edit a specific meal within a generated meal plan.
     You can add, update, or delete individual meal items (beverage, main_course, dessert, side).
+    Only the edited meal is rescored, and only the changed fields of the plans are saved.
     """
     if request.method != "POST":
         return JsonResponse({"Error": "Invalid request method. Use POST."}, status=400)
@@ -468,7 +1336,7 @@ def edit_meal_plan(request: HttpRequest):
 
         # Find the meal to update
         meal_found = False
-        for meal in meals:
+        for meal_index, meal in enumerate(meals):
             if meal.get("meal_name", "").lower() == meal_name:
                 meal_found = True
                 meal_types = meal.setdefault("meal_types", {})
@@ -478,20 +1346,12 @@ def edit_meal_plan(request: HttpRequest):
                     if val is None:
                         meal_types.pop(key, None)
                     else:
-                        # Validate that the new item exists in the database
-                        if key == "beverage":
-                            beverage, _ = firebaseManager.get_single_beverage(val)
-                            if isinstance(beverage, Exception):
-                                return JsonResponse(
-                                    {"Error": f"Invalid beverage ID: {val}"}, status=400
-                                )
-                        else:
-                            food, _ = firebaseManager.get_single_r3(val)
-                            if isinstance(food, Exception):
-                                return JsonResponse(
-                                    {"Error": f"Invalid food item ID: {val}"},
-                                    status=400,
-                                )
+                        # Validate that the new item exists
+                        if not _item_exists(key, val):
+                            kind = "beverage" if key == "beverage" else "food item"
+                            return JsonResponse(
+                                {"Error": f"Invalid {kind} ID: {val}"}, status=400
+                            )
                         meal_types[key] = val
                 break
 
@@ -500,19 +1360,47 @@ def edit_meal_plan(request: HttpRequest):
                 {"Error": f"Meal '{meal_name}' not found on {date}"}, status=404
             )
 
-        # Update day plan in Firebase
-        day_plan["user_id"] = user_id
+        # Rescore only the edited meal, patching the plan's aggregates. The meal configs and
+        # preferences the plan was generated with are only read from the user when not sent
+        meal_plan_config = data.get("meal_plan_config")
+        user_preferences = data.get("user_preferences")
+        if (
+            not isinstance(meal_plan_config, dict)
+            or "meal_configs" not in meal_plan_config
+        ):
+            meal_plan_config = None
+        if not isinstance(user_preferences, dict):
+            user_preferences = None
+        if meal_plan_config is None or user_preferences is None:
+            user, status = firebaseManager.get_user_by_id(user_id)
+            if status != 200:
+                return JsonResponse({"Error": user}, status=status)
+            meal_plan_config = meal_plan_config or user.get_meal_plan_config()
+            if user_preferences is None:
+                user_preferences = user.get_numerical_preferences()
+        changed = rescore_meal(
+            meal_plan,
+            date,
+            meal_index,
+            meal_plan_config["meal_configs"],
+            user_preferences,
+        )
 
-        msg, status = firebaseManager.add_dayplan_temp(user_id, date, day_plan)
+        # Update day plan in Firebase, saving it whole if it was never saved
+        day_plan["user_id"] = user_id
+        msg, status = firebaseManager.update_temp_dayplan(
+            day_plan["_id"], {"meals": meals}
+        )
+        if status != 200:
+            msg, status = firebaseManager.add_dayplan_temp(user_id, date, day_plan)
         if status != 200:
             return JsonResponse(
                 {"Error": f"Failed to update day plan for {date}", "details": msg},
                 status=status,
             )
 
-        # Update meal plan in Firebase
-        meal_plan["days"][date] = day_plan
-        msg, status = firebaseManager.add_meal_plan(user_id, meal_plan)
+        # Update only the changed fields of the meal plan in Firebase
+        msg, status = firebaseManager.update_meal_plan(user_id, meal_plan, changed)
         if status != 200:
             return JsonResponse({"Error": "Failed to update meal plan"}, status=status)
 
@@ -2,7 +2,6 @@ from django.http import JsonResponse, HttpRequest, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from firebase_admin import firestore
 from django.contrib.auth.hashers import make_password 
 
 
@@ -15,7 +14,6 @@ import json
 from termcolor import colored
 
 firebaseManager = FirebaseManager()
-db = firestore.client()
 # DB manager
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
@@ -406,7 +404,7 @@ def logout_user(request):
         if not user_id:
             return Response({"error": "Missing user_id"}, status=400)
 
-        user_ref = db.collection("users").document(user_id)
+        user_ref = firebaseManager.db.collection("users").document(user_id)
         user_doc = user_ref.get()
 
         if not user_doc.exists:
@@ -416,7 +414,9 @@ def logout_user(request):
         temp_day_plans = user_data.get("temp_day_plans", {})
 
         for day, temp_plan_id in temp_day_plans.items():
-            temp_day_plan_ref = db.collection("temp_day_plans").document(temp_plan_id)
+            temp_day_plan_ref = firebaseManager.db.collection(
+                "temp_day_plans"
+            ).document(temp_plan_id)
             temp_day_plan_ref.delete()
 
         user_ref.update({"temp_day_plans": {}})
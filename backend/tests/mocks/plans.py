@@ -0,0 +1,5 @@
+def items(days):
+    """Items of every meal of every day of a plan ({date: day plan}), to compare plans by"""
+    return [
+        [meal["meal_types"] for meal in day_plan["meals"]] for day_plan in days.values()
+    ]
@@ -0,0 +1,192 @@
+import json
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from django.test import RequestFactory
+
+from core.modules.batch_generation import PoolCache, generate_plan_days, group_users
+from core.modules.catalog import Catalog
+from core.modules.firebase import FIRESTORE_BATCH_SIZE, FirebaseManager
+from core.modules.recommendation_helpers import candidate_pools, gen_bandit_rec
+from core.modules.seeding import PLAN_STAGE, stage_rng
+from core.views import batch_bandit_recommendation
+
+from .mocks.plans import items
+from .test_meal_plan_optimizer import BEVERAGES, MEAL_CONFIGS, RECIPES
+
+FAVORITE_ITEMS = {
+    "Main Course": ["steak", "curry", "stir fry"],
+    "Side": ["salad", "fries"],
+    "Dessert": ["cake", "sorbet"],
+    "Beverage": ["milk", "tea"],
+}
+
+NEUTRAL = {"dairyPreference": 0, "meatPreference": 0, "nutsPreference": 0}
+NO_DAIRY = {"dairyPreference": -1, "meatPreference": 0, "nutsPreference": 0}
+
+
+def entry(user_id, user_preferences=NEUTRAL, dietary_conditions=None, **kwargs):
+    return {
+        "user_id": user_id,
+        "user_preferences": user_preferences,
+        "dietary_conditions": dietary_conditions or {"vegan": False},
+        "meal_plan_config": {
+            "num_days": 3,
+            "num_meals": len(MEAL_CONFIGS),
+            "meal_configs": MEAL_CONFIGS,
+        },
+        "starting_date": "2025-03-08",
+        **kwargs,
+    }
+
+
+class TestBatchGeneration(unittest.TestCase):
+    def setUp(self):
+        catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        patcher = patch("core.modules.catalog._catalog", catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_users_are_grouped_by_conditions_and_preferences(self):
+        entries = [
+            entry("a"),
+            entry("b", NO_DAIRY),
+            entry("c", dietary_conditions={"vegan": True}),
+            entry("d"),
+        ]
+        self.assertEqual(list(group_users(entries).values()), [[0, 3], [1], [2]])
+
+    def test_pools_are_shared(self):
+        pool_cache = PoolCache()
+        with patch(
+            "core.modules.batch_generation.candidate_pools", wraps=candidate_pools
+        ) as filtered:
+            first = pool_cache.get(FAVORITE_ITEMS, MEAL_CONFIGS, {"vegan": False})
+            reordered = {role: ids[::-1] for role, ids in FAVORITE_ITEMS.items()}
+            second = pool_cache.get(reordered, MEAL_CONFIGS, {"vegan": False})
+            pool_cache.get(FAVORITE_ITEMS, MEAL_CONFIGS, {"vegan": True})
+        self.assertIs(first, second)
+        self.assertEqual(filtered.call_count, 2)
+        self.assertEqual(pool_cache.hits, 1)
+
+    def test_batch_plan_matches_single_plan(self):
+        """
+        A user of a batch should get the plan a single request with the same seed gets.
+        """
+        batch_entry = {
+            "meal_configs": MEAL_CONFIGS,
+            "num_days": 7,
+            "starting_date": datetime(2025, 3, 8),
+            "meal_plan_name": "Plan",
+            "user_preferences": NEUTRAL,
+            "seed": 11,
+        }
+        pools = PoolCache().get(FAVORITE_ITEMS, MEAL_CONFIGS, {})
+        days, search_stats = generate_plan_days(pools, batch_entry)
+        single = gen_bandit_rec(
+            FAVORITE_ITEMS,
+            7,
+            MEAL_CONFIGS,
+            datetime(2025, 3, 8),
+            {},
+            "Plan",
+            rng=stage_rng(11, PLAN_STAGE),
+        )
+        self.assertIsNone(search_stats)
+        self.assertEqual(items(days), items(single))
+
+    @patch("core.views.recommendation_views.test_bandit", return_value=True)
+    @patch("core.views.recommendation_views.train_bandit", return_value=True)
+    @patch(
+        "core.views.recommendation_views.configure_bandit",
+        return_value=("boosted_bandit/trial1", 1),
+    )
+    @patch(
+        "core.views.recommendation_views.get_bandit_favorite_items",
+        return_value=FAVORITE_ITEMS,
+    )
+    @patch("core.views.recommendation_views.firebaseManager")
+    def test_endpoint(self, firebase, favorites, configure, train, test):
+        """
+        The bandit should be trained once, favorites drawn once per group and the plans saved in one call.
+        """
+        user = MagicMock()
+        user.get_permanent_favorite_items.return_value = {"Side": ["stir fry"]}
+        user.get_nutritional_goals.return_value = {"Calories": 2000}
+        user.get_bandit_counter.return_value = 4
+        firebase.get_users_by_id.return_value = (
+            {user_id: user for user_id in ("a", "b", "c")},
+            200,
+        )
+        firebase.save_generated_plans.return_value = (12, 200)
+        body = {
+            "users": [
+                entry("a"),
+                entry("b", NO_DAIRY),
+                entry("c"),
+                entry("missing"),
+                {"user_preferences": NEUTRAL},
+            ]
+        }
+        request = RequestFactory().post(
+            "/beacon/recommendation/bandit-batch",
+            json.dumps(body),
+            content_type="application/json",
+        )
+        response = batch_bandit_recommendation(request)
+        self.assertEqual(response.status_code, 200)
+        content = json.loads(response.content)
+
+        self.assertEqual(content["groups"], 2)
+        self.assertEqual(set(content["meal_plans"]), {"a", "b", "c"})
+        self.assertEqual(set(content["errors"]), {"missing", "4"})
+        configure.assert_called_once()
+        train.assert_called_once()
+        self.assertEqual(favorites.call_count, 2)
+        for user_id, meal_plan in content["meal_plans"].items():
+            self.assertEqual(len(meal_plan["days"]), 3)
+            self.assertEqual(len(meal_plan["scores"]["variety_scores"]), 6)
+            self.assertIn("nutrition", meal_plan)
+            for day_plan in meal_plan["days"].values():
+                self.assertEqual(day_plan["user_id"], user_id)
+
+        firebase.save_generated_plans.assert_called_once()
+        day_plans, user_updates = firebase.save_generated_plans.call_args[0]
+        self.assertEqual(set(day_plans), {"a", "b", "c"})
+        self.assertEqual(user_updates["b"]["favorite_items"], FAVORITE_ITEMS)
+        self.assertEqual(user_updates["b"]["bandit_counter"], 5)
+        self.assertEqual(
+            user_updates["b"]["dietary_preferences.numerical_preferences"], NO_DAIRY
+        )
+
+    @patch("core.views.recommendation_views.firebaseManager")
+    def test_duplicate_users_are_rejected(self, firebase):
+        body = {"users": [entry("a"), entry("b"), entry("a", NO_DAIRY)]}
+        request = RequestFactory().post(
+            "/beacon/recommendation/bandit-batch",
+            json.dumps(body),
+            content_type="application/json",
+        )
+        response = batch_bandit_recommendation(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("a", json.loads(response.content)["Error"])
+        firebase.get_users_by_id.assert_not_called()
+
+    def test_plans_are_saved_with_batched_writes(self):
+        db = MagicMock()
+        day_plans = {
+            "a": {f"day{i}": {"_id": f"a{i}"} for i in range(FIRESTORE_BATCH_SIZE)},
+            "b": {"2025-03-08": {"_id": "b0"}},
+        }
+        with patch.object(FirebaseManager(), "_db", db):
+            writes, status = FirebaseManager().save_generated_plans(
+                day_plans, {"b": {"bandit_counter": 2}}
+            )
+        self.assertEqual((writes, status), (FIRESTORE_BATCH_SIZE + 3, 200))
+        batch = db.batch.return_value
+        self.assertEqual(batch.commit.call_count, 2)
+        update = batch.update.call_args_list[-1][0][1]
+        self.assertEqual(
+            update, {"bandit_counter": 2, "temp_day_plans.2025-03-08": "b0"}
+        )
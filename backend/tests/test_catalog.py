@@ -0,0 +1,185 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from core.modules import catalog as catalog_module
+from core.modules.catalog import Catalog, RecipeRecord, parse_measure
+from core.modules.catalog_snapshot import read_snapshot, write_snapshot
+
+RECIPES = [
+    {
+        "recipe-id": "1",
+        "recipe_name": "Veggie Omelette",
+        "food_role": ["Main Course", "Side"],
+        "isVegan": False,
+        "isGlutenFree": True,
+        "isLowSugar": True,
+        "hasDairy": True,
+        "hasMeat": False,
+        "hasNuts": False,
+        "macronutrients": {
+            "Calories": {"measure": "320 kcal", "unit": "kcal"},
+            "Carbohydrates": {"measure": "12", "unit": "g"},
+            "Protein": {"measure": "21.5", "unit": "g"},
+            "Fiber": {"measure": "3", "unit": "g"},
+        },
+        "ingredients": [{"name": "egg"}, {"name": "spinach"}],
+        "instructions": [{"original_text": "Whisk the eggs."}],
+    },
+    {
+        "recipe-id": "2",
+        "recipe_name": "Fruit Salad",
+        "food_role": ["Dessert"],
+        "isVegan": True,
+        "ingredients": [{"name": "apple"}],
+    },
+]
+
+BEVERAGES = [
+    {"bev-id": "1", "name": "Milk", "hasDairy": True},
+    {"bev-id": "2", "name": "Orange Juice"},
+]
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog.from_documents(iter(RECIPES), iter(BEVERAGES))
+
+    def test_records_hold_hot_fields(self):
+        """
+        Recipes and beverages should be kept as slotted records with their roles, flags and nutrients.
+        """
+        omelette = self.catalog.get_recipe("1")
+        self.assertIsInstance(omelette, RecipeRecord)
+        self.assertEqual(omelette.roles, ("Main Course", "Side"))
+        self.assertTrue(omelette.has_dairy and omelette.is_low_sugar)
+        self.assertEqual(omelette.nutrients, (320.0, 12.0, 21.5, 3.0))
+        self.assertFalse(hasattr(omelette, "__dict__"))
+
+        salad = self.catalog.get_recipe("2")
+        self.assertTrue(salad.is_vegan)
+        self.assertFalse(salad.has_meat)
+        self.assertEqual(salad.nutrients, (0.0, 0.0, 0.0, 0.0))
+
+        self.assertTrue(self.catalog.get_beverage("1").has_dairy)
+        self.assertFalse(self.catalog.get_beverage("2").has_dairy)
+        self.assertEqual(len(self.catalog), 4)
+
+    def test_full_documents_are_decoded_lazily(self):
+        """
+        The full document should round trip, and each call should return an independent copy.
+        """
+        document = self.catalog.recipe_document("1")
+        self.assertEqual(document, RECIPES[0])
+        document["ingredients"].clear()
+        self.assertEqual(self.catalog.recipe_document("1"), RECIPES[0])
+        self.assertEqual(self.catalog.beverage_document("2"), BEVERAGES[1])
+        self.assertIsNone(self.catalog.recipe_document("missing"))
+
+    def test_version_tracks_content(self):
+        """
+        The catalog version should only change when a document changes.
+        """
+        same = Catalog.from_documents(RECIPES, BEVERAGES)
+        self.assertEqual(same.version, self.catalog.version)
+
+        changed = Catalog.from_documents(
+            RECIPES, [{"bev-id": "1", "name": "Oat Milk"}, BEVERAGES[1]]
+        )
+        self.assertNotEqual(changed.version, self.catalog.version)
+
+    def test_parse_measure(self):
+        self.assertEqual(parse_measure({"measure": "1,200 kcal"}), 1200.0)
+        self.assertEqual(parse_measure(4), 4.0)
+        self.assertEqual(parse_measure(None), 0.0)
+        self.assertEqual(parse_measure("n/a"), 0.0)
+
+
+class TestCatalogSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "catalog_snapshot.bin")
+        self.catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        write_snapshot(self.catalog, self.path)
+
+    def tearDown(self):
+        catalog_module.set_catalog(None)
+        self.tmp_dir.cleanup()
+
+    def test_snapshot_round_trip(self):
+        """
+        A catalog read back from a snapshot should match the exported one, records and documents alike.
+        """
+        loaded = read_snapshot(self.path)
+        self.assertEqual(loaded.version, self.catalog.version)
+        for item_id, record in self.catalog.recipes.items():
+            for field in RecipeRecord.__slots__:
+                self.assertEqual(
+                    getattr(loaded.recipes[item_id], field), getattr(record, field)
+                )
+            self.assertEqual(
+                loaded.recipe_document(item_id), self.catalog.recipe_document(item_id)
+            )
+        self.assertTrue(loaded.get_beverage("1").has_dairy)
+        self.assertEqual(loaded.beverage_document("2"), BEVERAGES[1])
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as file:
+            file.write(b"not a snapshot")
+        with self.assertRaises(ValueError):
+            read_snapshot(self.path)
+
+    def test_boot_from_snapshot_then_reconcile(self):
+        """
+        Workers should boot from the snapshot and swap in the Firestore catalog once it is fetched.
+        """
+        live = Catalog.from_documents(RECIPES[:1], BEVERAGES)
+        fetched = threading.Event()
+
+        def fetch():
+            fetched.set()
+            return live
+
+        with patch.object(catalog_module, "settings") as settings, patch.object(
+            catalog_module, "fetch_catalog", side_effect=fetch
+        ), patch.object(catalog_module.threading, "Thread") as thread:
+            settings.CATALOG_SNAPSHOT_PATH = self.path
+            booted = catalog_module.get_catalog()
+            self.assertEqual(booted.version, self.catalog.version)
+            self.assertFalse(fetched.is_set())
+
+            # run the background reconciliation synchronously
+            _, kwargs = thread.call_args
+            kwargs["target"](*kwargs["args"])
+        self.assertIs(catalog_module.get_catalog(), live)
+
+    def test_boot_without_snapshot_downloads(self):
+        live = Catalog.from_documents(RECIPES, BEVERAGES)
+        with patch.object(catalog_module, "settings") as settings, patch.object(
+            catalog_module, "fetch_catalog", return_value=live
+        ):
+            settings.CATALOG_SNAPSHOT_PATH = os.path.join(self.tmp_dir.name, "missing")
+            self.assertIs(catalog_module.get_catalog(), live)
+
+
+class TestLazyInitialization(unittest.TestCase):
+    def test_importing_views_stays_offline(self):
+        """
+        Importing the views should neither load the catalog nor import the Firestore client.
+        """
+        script = (
+            "import sys, django; django.setup(); import core.urls\n"
+            "from core.modules import catalog\n"
+            "print(catalog._catalog is None, 'firebase_admin' in sys.modules)"
+        )
+        output = subprocess.check_output(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE="config.settings"),
+            text=True,
+        )
+        self.assertEqual(output.split(), ["True", "False"])
@@ -0,0 +1,226 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from core.modules import catalog as catalog_module
+from core.modules.catalog import Catalog, CatalogChanges
+from core.modules.firebase import FirebaseManager
+from core.modules.ingredient_index import IngredientIndex, ingredient_index
+from core.modules.nutrition import NutrientMatrix, nutrient_matrix
+from core.modules.search_index import SearchIndex, search_index
+
+from .test_catalog import BEVERAGES, RECIPES
+
+OMELETTE = {
+    **RECIPES[0],
+    "recipe_name": "Tofu Scramble",
+    "isVegan": True,
+    "hasDairy": False,
+    "ingredients": [{"name": "tofu"}, {"name": "spinach"}],
+}
+
+PANCAKES = {
+    "recipe-id": "3",
+    "recipe_name": "Banana Pancakes",
+    "food_role": ["Main Course"],
+    "macronutrients": {"Calories": {"measure": "410"}, "Protein": {"measure": "9"}},
+    "ingredients": [{"name": "bananas"}, {"name": "flour"}],
+}
+
+
+class FakeCollection:
+    """Firestore collection whose snapshot listener is fed by the test"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def on_snapshot(self, callback):
+        self.callbacks.append(callback)
+        return MagicMock()
+
+    def push(self, *changes):
+        for callback in self.callbacks:
+            callback([], list(changes), None)
+
+
+def change(kind, document_id, document=None):
+    return SimpleNamespace(
+        type=SimpleNamespace(name=kind),
+        document=SimpleNamespace(id=document_id, to_dict=lambda: document),
+    )
+
+
+class TestApplyChanges(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        self.changes = CatalogChanges(
+            recipes={"1": OMELETTE, "2": None, "3": PANCAKES},
+            beverages={"2": {**BEVERAGES[1], "name": "Apple Juice"}},
+        )
+
+    def test_changes_make_a_new_version(self):
+        """
+        Applying changes should give the catalog a full rebuild would, and leave the previous one as it was.
+        """
+        updated = self.catalog.apply_changes(self.changes)
+        rebuilt = Catalog.from_documents(
+            [OMELETTE, PANCAKES], [BEVERAGES[0], self.changes.beverages["2"]]
+        )
+        self.assertEqual(updated.version, rebuilt.version)
+        self.assertEqual(sorted(updated.recipe_ids()), ["1", "3"])
+        self.assertEqual(len(updated.recipe_documents), 2)
+        self.assertNotIn("2", updated.recipe_documents)
+        self.assertEqual(updated.recipe_document("3"), PANCAKES)
+        self.assertTrue(updated.get_recipe("1").is_vegan)
+        self.assertEqual(updated.get_beverage("2").name, "Apple Juice")
+
+        self.assertEqual(self.catalog.recipe_document("1"), RECIPES[0])
+        self.assertIn("2", self.catalog.recipes)
+        self.assertNotIn("3", self.catalog.recipe_documents)
+
+    def test_unchanged_documents_are_ignored(self):
+        """
+        A listener's first batch lists every document, which should not create a new version.
+        """
+        changes = CatalogChanges(
+            {recipe["recipe-id"]: recipe for recipe in RECIPES},
+            {"1": BEVERAGES[0], "404": None},
+        )
+        self.assertIs(self.catalog.apply_changes(changes), self.catalog)
+
+    def test_derived_indexes_are_updated_incrementally(self):
+        """
+        Indexes of the new version should only be patched, and answer like indexes built from scratch.
+        """
+        search_index(self.catalog)
+        nutrient_matrix(self.catalog)
+        ingredient_index(self.catalog)
+        updated = self.catalog.apply_changes(self.changes)
+        updated = updated.apply_changes(
+            CatalogChanges(recipes={"3": {**PANCAKES, "recipe_name": "Crepes"}})
+        )
+
+        with patch.object(SearchIndex, "from_catalog") as build_search, patch.object(
+            NutrientMatrix, "from_catalog"
+        ) as build_matrix, patch.object(
+            IngredientIndex, "from_catalog"
+        ) as build_ingredients:
+            search = search_index(updated)
+            matrix = nutrient_matrix(updated)
+            ingredients = ingredient_index(updated)
+        build_search.assert_not_called()
+        build_matrix.assert_not_called()
+        build_ingredients.assert_not_called()
+
+        rebuilt_search = SearchIndex.from_catalog(updated)
+        for query in ("tofu", "crepe", "banana", "salad", "juice", ""):
+            self.assertEqual(
+                sorted(search.search(query)[0]),
+                sorted(rebuilt_search.search(query)[0]),
+            )
+
+        rebuilt_matrix = NutrientMatrix.from_catalog(updated)
+        for role, item_id in (("main_course", "3"), ("side", "2"), ("beverage", "2")):
+            np.testing.assert_array_equal(
+                matrix.matrix[matrix.row(role, item_id)],
+                rebuilt_matrix.matrix[rebuilt_matrix.row(role, item_id)],
+            )
+
+        rebuilt_ingredients = IngredientIndex.from_catalog(updated)
+        self.assertEqual(ingredients.postings, rebuilt_ingredients.postings)
+        self.assertEqual(ingredient_index(self.catalog).recipes_with(["tofu"]), set())
+
+
+class TestLiveSync(unittest.TestCase):
+    def setUp(self):
+        self.recipes = FakeCollection()
+        self.beverages = FakeCollection()
+        db = MagicMock()
+        db.collection.side_effect = {
+            "food-recipes": self.recipes,
+            "beverages": self.beverages,
+        }.get
+        patcher = patch.object(FirebaseManager(), "_db", db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        watches = patch.object(catalog_module, "_watches", None)
+        watches.start()
+        self.addCleanup(watches.stop)
+        listed = patch.object(catalog_module, "_listed", set())
+        listed.start()
+        self.addCleanup(listed.stop)
+
+        self.catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        catalog_module.set_catalog(self.catalog)
+        self.addCleanup(catalog_module.set_catalog, None)
+
+    def test_listener_changes_reach_the_catalog(self):
+        """
+        Added, modified and removed documents should be applied to the process-wide catalog as they arrive.
+        """
+        catalog_module.watch_catalog()
+        catalog_module.watch_catalog()
+        self.assertEqual(len(self.recipes.callbacks), 1)
+
+        # initial snapshot of an up to date catalog
+        self.recipes.push(
+            *(change("ADDED", recipe["recipe-id"], recipe) for recipe in RECIPES)
+        )
+        self.beverages.push(
+            *(change("ADDED", beverage["bev-id"], beverage) for beverage in BEVERAGES)
+        )
+        self.assertIs(catalog_module.get_catalog(), self.catalog)
+
+        self.recipes.push(
+            change("MODIFIED", "1", OMELETTE),
+            change("ADDED", "3", PANCAKES),
+            change("REMOVED", "2", RECIPES[1]),
+        )
+        self.beverages.push(change("REMOVED", "1"))
+        catalog = catalog_module.get_catalog()
+        self.assertEqual(sorted(catalog.recipe_ids()), ["1", "3"])
+        self.assertEqual(catalog.get_recipe("1").name, "Tofu Scramble")
+        self.assertEqual(catalog.beverage_ids(), ["2"])
+        self.assertEqual(search_index(catalog).search("scramble")[0], [("recipe", "1")])
+
+    @patch.object(catalog_module, "_prepare_indexes", True)
+    def test_search_index_is_ready_before_the_swap(self):
+        """
+        After warmup, a new catalog version should already have its search index when it replaces the current one.
+        """
+        search_index(self.catalog)
+        with patch.object(SearchIndex, "updated", wraps=SearchIndex.updated) as updated:
+            catalog_module.apply_catalog_changes(CatalogChanges({"3": PANCAKES}))
+        updated.assert_called_once()
+        catalog = catalog_module.get_catalog()
+        self.assertIsNot(catalog, self.catalog)
+        self.assertIn("search", catalog._derived)
+        self.assertEqual(
+            catalog._derived["search"].search("pancakes")[0], [("recipe", "3")]
+        )
+
+    def test_first_batch_reconciles_the_catalog(self):
+        """
+        Items missing from the first batch of a listener were removed while the worker was down, and once both
+        collections are listed the catalog does not need to be downloaded again.
+        """
+        catalog_module.watch_catalog()
+        self.recipes.push(change("ADDED", "1", OMELETTE))
+        catalog = catalog_module.get_catalog()
+        self.assertEqual(catalog.recipe_ids(), ["1"])
+        self.assertEqual(
+            catalog.version, Catalog.from_documents([OMELETTE], BEVERAGES).version
+        )
+
+        with patch.object(
+            catalog_module, "fetch_catalog", return_value=catalog
+        ) as fetch:
+            catalog_module.reconcile_catalog()
+            fetch.assert_called_once()
+            fetch.reset_mock()
+            self.beverages.push()
+            self.assertEqual(catalog_module.get_catalog().beverage_ids(), [])
+            catalog_module.reconcile_catalog()
+            fetch.assert_not_called()
@@ -0,0 +1,177 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from importlib import import_module
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+
+from core.modules.catalog import Catalog
+from core.modules.evaluation import (
+    DIETARY_COMBINATIONS,
+    PREFERENCE_PROFILES,
+    distribution,
+    evaluate_generator,
+    percentiles,
+)
+from core.modules.meal_plan_generator import generate_days
+
+# no recipe is low in sugar
+FLAGS = {"isVegan": True, "isGlutenFree": True}
+
+RECIPES = [
+    {"recipe-id": "steak", "food_role": ["Main Course"], "hasMeat": True},
+    {"recipe-id": "tofu", "food_role": ["Main Course"], "hasNuts": True, **FLAGS},
+    {"recipe-id": "salad", "food_role": ["Side"], **FLAGS},
+    {"recipe-id": "fries", "food_role": ["Side"], "isVegan": True},
+    {"recipe-id": "cake", "food_role": ["Dessert"], "hasDairy": True},
+    {"recipe-id": "custard", "food_role": ["Dessert"], "hasDairy": True},
+]
+
+BEVERAGES = [
+    {"bev-id": "milk", "hasDairy": True},
+    {"bev-id": "tea"},
+]
+
+MEAL_CONFIGS = [
+    {
+        "meal_name": "lunch",
+        "meal_types": {"main_course": True, "side": True, "beverage": True},
+    },
+    {
+        "meal_name": "dinner",
+        "meal_types": {"main_course": True, "dessert": True},
+    },
+]
+
+
+def sample(pools, meal_configs, num_days, starting_date, user_preferences, rng):
+    return generate_days(pools, meal_configs, num_days, starting_date, "Plan", rng)
+
+
+class TestEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        patcher = patch("core.modules.catalog._catalog", self.catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_profiles(self):
+        self.assertEqual(len(PREFERENCE_PROFILES), 27)
+        self.assertEqual(
+            PREFERENCE_PROFILES[5],
+            {"dairyPreference": 0, "meatPreference": 1, "nutsPreference": -1},
+        )
+        self.assertEqual(len(DIETARY_COMBINATIONS), 16)
+        self.assertEqual(len({json.dumps(c) for c in DIETARY_COMBINATIONS}), 16)
+
+    def test_statistics(self):
+        self.assertEqual(percentiles([]), {})
+        self.assertEqual(
+            percentiles(range(101)), {"p50": 50.0, "p90": 90.0, "p99": 99.0}
+        )
+        self.assertEqual(
+            distribution([0, 1, 1, 0.5]),
+            {
+                "mean": 0.625,
+                "min": 0.0,
+                "p10": 0.15,
+                "p50": 0.75,
+                "p90": 1.0,
+                "max": 1.0,
+            },
+        )
+
+    def test_every_profile_is_evaluated(self):
+        """
+        Every profile should get its plans, the ones without items for a role being counted as failures.
+        """
+        report = evaluate_generator(
+            sample, MEAL_CONFIGS, num_days=3, plans_per_profile=2
+        )
+        self.assertEqual(report["plans"] + report["failures"], 27 * 16 * 2)
+        self.assertEqual(report["failures"], 27 * 8 * 2)
+        self.assertEqual(len(report["conditions"]), 16)
+        for row in report["conditions"]:
+            if row["dietary_conditions"]["diabetes"]:
+                self.assertEqual((row["plans"], row["failures"]), (0, 54))
+                self.assertIsNotNone(row["error"])
+                self.assertEqual(set(row["scores"].values()), {None})
+            else:
+                self.assertEqual((row["plans"], row["failures"]), (54, 0))
+        for metric, values in report["scores"].items():
+            self.assertEqual(list(values), ["mean", "min", "p10", "p50", "p90", "max"])
+            self.assertGreaterEqual(values["min"], 0)
+            self.assertLessEqual(values["max"], 1)
+        self.assertEqual(list(report["latency_ms"]["total"]), ["p50", "p90", "p99"])
+        self.assertGreater(report["plans_per_second"], 0)
+
+        # the plans are seeded
+        again = evaluate_generator(
+            sample, MEAL_CONFIGS, num_days=3, plans_per_profile=2
+        )
+        self.assertEqual(again["scores"], report["scores"])
+        other = evaluate_generator(
+            sample, MEAL_CONFIGS, num_days=3, plans_per_profile=2, seed=1
+        )
+        self.assertNotEqual(other["scores"], report["scores"])
+
+    @patch("core.management.commands.evaluate_recommendations.load_catalog")
+    def test_command(self, mock_load):
+        mock_load.return_value = self.catalog
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "report.json")
+            call_command(
+                "evaluate_recommendations", "--days", "2", "--json", path, stdout=out
+            )
+            with open(path) as file:
+                report = json.load(file)
+        self.assertEqual(report["plans"], 27 * 8)
+        output = out.getvalue()
+        self.assertIn(f"{27 * 8} plans of 2 days (sample)", output)
+        self.assertIn("constraint score: mean", output)
+        self.assertIn("diabetes+vegan", output)
+
+    @patch("core.management.commands.evaluate_recommendations.load_catalog")
+    def test_command_modes(self, mock_load):
+        """
+        Every mode should generate with the settings of the recommendation endpoint.
+        """
+        mock_load.return_value = self.catalog
+        for mode, generator in (
+            ("sample", "generate_days"),
+            ("optimize", "optimize_days"),
+            ("target-nutrition", "optimize_nutrition"),
+        ):
+            module = "core.management.commands.evaluate_recommendations"
+            with self.subTest(mode=mode), patch(
+                f"{module}.{generator}",
+                wraps=getattr(import_module(module), generator),
+            ) as generate:
+                out = io.StringIO()
+                call_command(
+                    "evaluate_recommendations",
+                    "--mode",
+                    mode,
+                    "--days",
+                    "2",
+                    "--time-budget",
+                    "0.001",
+                    stdout=out,
+                )
+                self.assertIn(f"{27 * 8} plans of 2 days ({mode})", out.getvalue())
+                self.assertEqual(generate.call_count, 27 * 16)
+                args, kwargs = generate.call_args
+                if mode == "optimize":
+                    self.assertEqual(
+                        kwargs["weights"], settings.MEAL_PLAN_SCORE_WEIGHTS
+                    )
+                else:
+                    self.assertEqual(
+                        kwargs.get("no_repeat_days", args[-1]),
+                        settings.MEAL_PLAN_NO_REPEAT_DAYS,
+                    )
@@ -0,0 +1,139 @@
+import io
+import unittest
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+
+from core.modules.catalog import Catalog
+from core.modules.firebase import FirebaseManager
+from core.modules.ingredient_index import (
+    IngredientIndex,
+    annotate_recipes,
+    changed_annotations,
+    ingredient_index,
+    normalize_ingredient,
+)
+
+RECIPES = [
+    {
+        "recipe-id": "1",
+        "recipe_name": "Scrambled Eggs",
+        "isVegan": True,
+        "isGlutenFree": True,
+        "isLowSugar": True,
+        "ingredients": [{"name": "Large Eggs"}, {"name": "salt"}],
+    },
+    {
+        "recipe-id": "2",
+        "recipe_name": "Pancakes",
+        "isVegan": True,
+        "isGlutenFree": False,
+        "isLowSugar": False,
+        "ingredients": [
+            {"ingredient_name": "All Purpose Flour"},
+            {"name": "Maple Syrup"},
+            {"name": "bananas"},
+        ],
+    },
+    {
+        "recipe-id": "3",
+        "recipe_name": "Fruit Salad",
+        "isVegan": True,
+        "isGlutenFree": True,
+        "isLowSugar": True,
+        "ingredients": [{"name": "banana"}, {"name": "strawberries"}],
+    },
+]
+
+
+class TestIngredientIndex(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog.from_documents(RECIPES, [])
+        self.index = ingredient_index(self.catalog)
+
+    def test_normalize_ingredient(self):
+        self.assertEqual(normalize_ingredient("Large  Eggs"), "large egg")
+        self.assertEqual(normalize_ingredient("all-purpose flour"), "all purpose flour")
+        self.assertEqual(normalize_ingredient("Strawberries"), "strawberry")
+        self.assertEqual(normalize_ingredient("sausage patties"), "sausage patty")
+        self.assertEqual(
+            normalize_ingredient("Molasses"), normalize_ingredient("molasses")
+        )
+
+    def test_postings_fold_case_and_plurals(self):
+        """
+        Lookups should match recipes regardless of the case or plural used by either side.
+        """
+        self.assertEqual(self.index.recipes_with(["Banana"]), {"2", "3"})
+        self.assertEqual(
+            self.index.recipes_with(["large egg", "strawberry"]), {"1", "3"}
+        )
+        self.assertEqual(self.index.recipes_with(["tofu"]), set())
+        self.assertIs(ingredient_index(self.catalog), self.index)
+
+    def test_incremental_updates(self):
+        index = IngredientIndex.from_documents(RECIPES)
+        index.add_recipe("3", frozenset({"apple"}))
+        self.assertEqual(index.recipes_with(["banana"]), {"2"})
+        index.remove_recipe("2")
+        self.assertNotIn("banana", index.postings)
+        self.assertEqual(len(index), 2)
+
+    def test_annotation_only_reports_changes(self):
+        """
+        Only flags which differ from the stored ones should be reported, the eggs are not vegan.
+        """
+        annotations = annotate_recipes(self.index)
+        self.assertEqual(
+            annotations["2"],
+            {"isVegan": True, "isGlutenFree": False, "isLowSugar": False},
+        )
+        self.assertEqual(
+            changed_annotations(self.catalog, annotations), {"1": {"isVegan": False}}
+        )
+
+        # restricted to the recipes using a changed ingredient
+        scoped = annotate_recipes(self.index, self.index.recipes_with(["maple syrups"]))
+        self.assertEqual(list(scoped), ["2"])
+
+
+class TestAnnotateRecipesCommand(unittest.TestCase):
+    @patch("core.management.commands.annotate_recipes.FirebaseManager")
+    @patch("core.management.commands.annotate_recipes.fetch_catalog")
+    def test_writes_only_changed_recipes(self, mock_fetch, mock_firebase):
+        mock_fetch.return_value = Catalog.from_documents(RECIPES, [])
+        manager = MagicMock()
+        manager.update_recipe_annotations.return_value = (1, 200)
+        mock_firebase.return_value = manager
+
+        call_command("annotate_recipes", stdout=io.StringIO())
+        manager.update_recipe_annotations.assert_called_once_with(
+            {"1": {"isVegan": False}}
+        )
+
+    @patch("core.management.commands.annotate_recipes.FirebaseManager")
+    @patch("core.management.commands.annotate_recipes.fetch_catalog")
+    def test_dry_run_and_ingredient_scope(self, mock_fetch, mock_firebase):
+        mock_fetch.return_value = Catalog.from_documents(RECIPES, [])
+        out = io.StringIO()
+
+        call_command("annotate_recipes", "--dry-run", stdout=out)
+        self.assertIn("1 changed", out.getvalue())
+
+        call_command("annotate_recipes", "--ingredients", "Bananas", stdout=out)
+        self.assertIn("Annotated 2 of 3 recipes", out.getvalue())
+        mock_firebase.assert_not_called()
+
+
+class TestBatchedWrites(unittest.TestCase):
+    def test_updates_are_committed_in_batches(self):
+        """
+        Updates should be grouped into Firestore batches of at most 500 writes.
+        """
+        manager = FirebaseManager()
+        db = MagicMock()
+        with patch.object(manager, "_db", db):
+            updates = {str(i): {"isVegan": False} for i in range(1001)}
+            self.assertEqual(manager.update_recipe_annotations(updates), (1001, 200))
+        self.assertEqual(db.batch.return_value.update.call_count, 1001)
+        self.assertEqual(db.batch.return_value.commit.call_count, 3)
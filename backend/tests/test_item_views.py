@@ -0,0 +1,126 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from django.test import RequestFactory
+
+from core.modules.catalog import Catalog
+from core.views import get_beverage_info, get_items_batch, get_recipe_info
+
+from .test_catalog import BEVERAGES, RECIPES
+
+
+class TestItemInfoViews(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        patcher = patch(
+            "core.views.food_item_views.get_catalog", return_value=self.catalog
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("core.views.food_item_views.firebaseManager")
+    def test_recipe_served_from_catalog(self, mock_firebase):
+        """
+        Recipe info should come from the catalog, with an ETag and caching headers, without reading Firestore.
+        """
+        response = get_recipe_info(self.factory.get("/beacon/get-recipe-info/1"), "1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), RECIPES[0])
+        self.assertTrue(response["ETag"].startswith(f'"{self.catalog.version}-'))
+        self.assertIn("max-age", response["Cache-Control"])
+        mock_firebase.get_single_r3.assert_not_called()
+
+    def test_if_none_match_returns_not_modified(self):
+        first = get_beverage_info(self.factory.get("/beacon/get-beverage-info/1"), "1")
+        again = get_beverage_info(
+            self.factory.get(
+                "/beacon/get-beverage-info/1", HTTP_IF_NONE_MATCH=first["ETag"]
+            ),
+            "1",
+        )
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], first["ETag"])
+        self.assertEqual(again.content, b"")
+
+    def test_etag_changes_with_item(self):
+        """
+        Items should get different entity tags, and a changed item a new one.
+        """
+        milk = get_beverage_info(self.factory.get("/"), "1")["ETag"]
+        juice = get_beverage_info(self.factory.get("/"), "2")["ETag"]
+        self.assertNotEqual(milk, juice)
+
+        self.catalog = Catalog.from_documents(
+            RECIPES, [{"bev-id": "1", "name": "Oat Milk"}, BEVERAGES[1]]
+        )
+        with patch("core.views.food_item_views.get_catalog", return_value=self.catalog):
+            stale = get_beverage_info(
+                self.factory.get("/", HTTP_IF_NONE_MATCH=milk), "1"
+            )
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(json.loads(stale.content)["name"], "Oat Milk")
+
+    @patch("core.views.food_item_views.firebaseManager")
+    def test_missing_item_falls_back_to_firestore(self, mock_firebase):
+        mock_firebase.get_single_r3.return_value = ({"recipe-id": "99"}, 200)
+        response = get_recipe_info(self.factory.get("/"), "99")
+        self.assertEqual(response.status_code, 200)
+        mock_firebase.get_single_r3.assert_called_once_with("99")
+
+
+class TestItemsBatchView(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        patcher = patch(
+            "core.views.food_item_views.get_catalog",
+            return_value=Catalog.from_documents(RECIPES, BEVERAGES),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, body):
+        request = self.factory.post(
+            "/beacon/items/batch", json.dumps(body), content_type="application/json"
+        )
+        return get_items_batch(request)
+
+    def test_returns_items_and_misses(self):
+        """
+        All requested items should come back in one response, with unknown ids reported as missing.
+        """
+        response = self.post(
+            {"recipe_ids": ["1", "2", "1", "404"], "beverage_ids": ["2", "x"]}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data["recipes"], {"1": RECIPES[0], "2": RECIPES[1]})
+        self.assertEqual(data["beverages"], {"2": BEVERAGES[1]})
+        self.assertEqual(
+            data["missing"], {"recipe_ids": ["404"], "beverage_ids": ["x"]}
+        )
+
+    def test_projects_requested_fields(self):
+        response = self.post(
+            {
+                "recipe_ids": ["1"],
+                "beverage_ids": ["1"],
+                "fields": ["recipe_name", "name", "food_role"],
+            }
+        )
+        data = json.loads(response.content)
+        self.assertEqual(
+            data["recipes"]["1"],
+            {"recipe_name": "Veggie Omelette", "food_role": ["Main Course", "Side"]},
+        )
+        self.assertEqual(data["beverages"]["1"], {"name": "Milk"})
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.post({"recipe_ids": "1"}).status_code, 400)
+        self.assertEqual(self.post({"recipe_ids": [1]}).status_code, 400)
+        self.assertEqual(self.post({"fields": "name"}).status_code, 400)
+        too_many = {"recipe_ids": [str(i) for i in range(5000)]}
+        self.assertEqual(self.post(too_many).status_code, 400)
+        self.assertEqual(get_items_batch(self.factory.get("/")).status_code, 400)
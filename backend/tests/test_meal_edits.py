@@ -0,0 +1,211 @@
+import copy
+import json
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from django.test import RequestFactory
+
+from core.modules.batch_generation import evaluate_plan
+from core.modules.catalog import Catalog
+from core.modules.meal_plan_generator import generate_days
+from core.modules.recommendation_helpers import calculate_goodness, rescore_meal
+from core.views import edit_meal_plan
+
+from .test_meal_plan_optimizer import (
+    BEVERAGES,
+    MEAL_CONFIGS,
+    POOLS,
+    PREFERENCES,
+    RECIPES,
+)
+
+GOALS = {"calories": 2000, "protein": 100}
+
+
+def scored_plan(num_days=5):
+    days = generate_days(
+        POOLS,
+        MEAL_CONFIGS,
+        num_days,
+        datetime(2025, 3, 8),
+        "Plan",
+        np.random.default_rng(0),
+    )
+    meal_plan = {"_id": "plan1", "user_id": "user", "days": days}
+    meal_plan.update(evaluate_plan(days, MEAL_CONFIGS, PREFERENCES, GOALS))
+    return meal_plan
+
+
+class TestMealEdits(unittest.TestCase):
+    def setUp(self):
+        recipes = [
+            {
+                **recipe,
+                "nutrition": {"Calories": {"measure": f"{100 * (index + 1)} kcal"}},
+            }
+            for index, recipe in enumerate(RECIPES)
+        ]
+        catalog = Catalog.from_documents(recipes, BEVERAGES)
+        patcher = patch("core.modules.catalog._catalog", catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rescoring_matches_a_full_evaluation(self):
+        """
+        Patching the aggregates after editing one meal should give the plan a full evaluation gives.
+        """
+        meal_plan = scored_plan()
+        date = "2025-03-10"
+        meal = meal_plan["days"][date]["meals"][1]
+        meal["meal_types"]["main_course"] = "cake"
+        meal["meal_types"].pop("dessert")
+
+        expected = copy.deepcopy(meal_plan)
+        expected.update(
+            evaluate_plan(expected["days"], MEAL_CONFIGS, PREFERENCES, GOALS)
+        )
+        calories = meal_plan["nutrition"]["days"][date]["totals"]["calories"]
+        changed = rescore_meal(meal_plan, date, 1, MEAL_CONFIGS, PREFERENCES)
+
+        self.assertEqual(meal_plan["days"], expected["days"])
+        self.assertEqual(meal_plan["scores"], expected["scores"])
+        self.assertEqual(meal_plan["nutrition"], expected["nutrition"])
+        self.assertEqual(meal["item_coverage_score"], 0.0)
+        self.assertNotEqual(
+            meal_plan["nutrition"]["days"][date]["totals"]["calories"], calories
+        )
+        # only the scores that changed, and the day of the meal
+        self.assertEqual(
+            set(changed),
+            {
+                f"days.{date}.meals",
+                "scores.coverage_scores",
+                f"nutrition.days.{date}",
+            },
+        )
+        self.assertIs(changed[f"days.{date}.meals"], meal_plan["days"][date]["meals"])
+
+    def test_days_sent_back_in_any_order(self):
+        """
+        The patched score lists should be the ones calculate_goodness gives the edited plan, whatever
+        the order of the days sent back and the names of the meals.
+        """
+        meal_plan = scored_plan()
+        meal_plan["days"] = dict(reversed(list(meal_plan["days"].items())))
+        for date in ("2025-03-09", "2025-03-11"):
+            meal = meal_plan["days"][date]["meals"][0]
+            meal["meal_name"] = "dinner"
+            meal["meal_types"]["main_course"] = "cake"
+            rescore_meal(meal_plan, date, 0, MEAL_CONFIGS, PREFERENCES)
+
+        chronological = {
+            date: copy.deepcopy(meal_plan["days"][date])
+            for date in sorted(meal_plan["days"])
+        }
+        self.assertEqual(
+            meal_plan["scores"],
+            calculate_goodness(chronological, MEAL_CONFIGS, PREFERENCES),
+        )
+
+    def test_meals_without_config_are_not_scored(self):
+        meal_plan = scored_plan(1)
+        meal_plan["days"]["2025-03-08"]["meals"].append(
+            {"meal_name": "snack", "meal_types": {"dessert": "cake"}}
+        )
+        scores = copy.deepcopy(meal_plan["scores"])
+        changed = rescore_meal(meal_plan, "2025-03-08", 2, MEAL_CONFIGS, PREFERENCES)
+        self.assertEqual(meal_plan["scores"], scores)
+        self.assertNotIn("scores.variety_scores", changed)
+
+
+class TestEditMealPlan(unittest.TestCase):
+    def setUp(self):
+        catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        patcher = patch("core.modules.catalog._catalog", catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = patch("core.views.recommendation_views.firebaseManager")
+        self.firebase = patcher.start()
+        self.addCleanup(patcher.stop)
+        user = MagicMock()
+        user.get_meal_plan_config.return_value = {"meal_configs": MEAL_CONFIGS}
+        user.get_numerical_preferences.return_value = PREFERENCES
+        self.firebase.get_user_by_id.return_value = (user, 200)
+        self.firebase.get_single_r3.return_value = ({"recipe-id": "cake"}, 200)
+        self.firebase.update_temp_dayplan.return_value = ("updated", 200)
+        self.firebase.update_meal_plan.return_value = ("updated", 200)
+
+    def edit(self, meal_plan, **body):
+        body = {
+            "user_id": "user",
+            "date": "2025-03-09",
+            "meal_name": "Dinner",
+            "updates": {"dessert": "sorbet"},
+            "meal_plan": meal_plan,
+            **body,
+        }
+        request = RequestFactory().post(
+            "/beacon/recommendation/edit-meal",
+            json.dumps(body),
+            content_type="application/json",
+        )
+        response = edit_meal_plan(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_only_changed_fields_are_saved(self):
+        meal_plan = scored_plan(30)
+        for day_plan in meal_plan["days"].values():
+            day_plan["meals"][1]["meal_types"]["dessert"] = "cake"
+        status, content = self.edit(meal_plan)
+        self.assertEqual(status, 200)
+        meal = content["updated_day_plan"]["meals"][1]
+        self.assertEqual(meal["meal_types"]["dessert"], "sorbet")
+        self.assertEqual(meal["nutritional_constraint_score"], 1 - 1 / 3)
+
+        day_plan_id, fields = self.firebase.update_temp_dayplan.call_args[0]
+        self.assertEqual(day_plan_id, content["updated_day_plan"]["_id"])
+        self.assertEqual(list(fields), ["meals"])
+        user_id, saved_plan, fields = self.firebase.update_meal_plan.call_args[0]
+        self.assertEqual(user_id, "user")
+        self.assertNotIn("days", fields)
+        self.assertTrue(all(not path.startswith("days.2025-03-08") for path in fields))
+        self.assertIn("days.2025-03-09.meals", fields)
+        self.assertEqual(
+            saved_plan["scores"]["constraint_scores"][3],
+            meal["nutritional_constraint_score"],
+        )
+        self.firebase.add_dayplan_temp.assert_not_called()
+        self.firebase.add_meal_plan.assert_not_called()
+
+    def test_unsaved_day_plans_are_saved_whole(self):
+        self.firebase.update_temp_dayplan.return_value = ("not found", 500)
+        self.firebase.add_dayplan_temp.return_value = ("saved", 200)
+        status, _ = self.edit(scored_plan(2))
+        self.assertEqual(status, 200)
+        self.firebase.add_dayplan_temp.assert_called_once()
+
+    def test_items_are_validated_with_the_catalog(self):
+        """
+        New items should be looked up in the catalog, and in Firestore only when the catalog does not have them.
+        """
+        status, _ = self.edit(scored_plan(2), updates={"dessert": "sorbet"})
+        self.assertEqual(status, 200)
+        self.firebase.get_single_r3.assert_not_called()
+
+        self.firebase.get_single_beverage.return_value = (Exception("missing"), 404)
+        status, content = self.edit(scored_plan(2), updates={"beverage": "soda"})
+        self.assertEqual(status, 400)
+        self.assertEqual(content["Error"], "Invalid beverage ID: soda")
+        self.firebase.get_single_beverage.assert_called_once_with("soda")
+
+    def test_sent_settings_are_not_read_from_the_user(self):
+        status, _ = self.edit(
+            scored_plan(2),
+            meal_plan_config={"meal_configs": MEAL_CONFIGS},
+            user_preferences=PREFERENCES,
+        )
+        self.assertEqual(status, 200)
+        self.firebase.get_user_by_id.assert_not_called()
@@ -0,0 +1,102 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import numpy as np
+
+from core.modules.meal_plan_generator import generate_days
+from core.modules.recommendation_helpers import gen_bandit_rec
+
+MEAL_CONFIGS = [
+    {
+        "meal_name": "breakfast",
+        "meal_types": {"main_course": True, "side": False, "beverage": True},
+    },
+    {
+        "meal_name": "dinner",
+        "meal_types": {"main_course": True, "side": True, "dessert": True},
+    },
+]
+
+POOLS = {
+    "main_course": ["m1", "m2", "m3"],
+    "side": ["s1", "s2"],
+    "dessert": ["d1"],
+    "beverage": ["b1", "b2"],
+}
+
+
+class TestMealPlanGenerator(unittest.TestCase):
+    def test_plan_structure(self):
+        """
+        Every day should get its own meals, with one item from the right pool for each requested role.
+        """
+        days = generate_days(
+            POOLS,
+            MEAL_CONFIGS,
+            30,
+            datetime(2025, 3, 8),
+            "Plan",
+            np.random.default_rng(0),
+        )
+        self.assertEqual(len(days), 30)
+        self.assertEqual(list(days)[:2], ["2025-03-08", "2025-03-09"])
+        meal_ids = set()
+        for day_plan in days.values():
+            breakfast, dinner = day_plan["meals"]
+            self.assertEqual(breakfast["meal_name"], "breakfast")
+            self.assertEqual(breakfast["meal_plan_name"], "Plan")
+            self.assertEqual(list(breakfast["meal_types"]), ["main_course", "beverage"])
+            self.assertEqual(
+                list(dinner["meal_types"]), ["main_course", "side", "dessert"]
+            )
+            for meal in (breakfast, dinner):
+                for role, item_id in meal["meal_types"].items():
+                    self.assertIn(item_id, POOLS[role])
+                meal_ids.add(meal["_id"])
+        self.assertEqual(len(meal_ids), 60)
+
+        # days are not copies of each other
+        main_courses = {
+            day["meals"][0]["meal_types"]["main_course"] for day in days.values()
+        }
+        self.assertEqual(main_courses, set(POOLS["main_course"]))
+
+    def test_empty_pool(self):
+        with self.assertRaises(ValueError):
+            generate_days(
+                {**POOLS, "side": []}, MEAL_CONFIGS, 1, datetime(2025, 3, 8), "Plan"
+            )
+
+    def test_bandit_rec_falls_back_when_favorites_are_missing(self):
+        favorite_items = {
+            "Main Course": ["m1"],
+            "Side": [],
+            "Dessert": ["d1"],
+            "Beverage": [],
+        }
+        with patch(
+            "core.modules.recommendation_helpers.get_food_items_with_dietary_conditions",
+            return_value=["f1"],
+        ) as backup, patch(
+            "core.modules.recommendation_helpers.get_catalog"
+        ) as catalog:
+            catalog.return_value.beverage_ids.return_value = ["b9"]
+            days = gen_bandit_rec(
+                favorite_items,
+                3,
+                MEAL_CONFIGS,
+                datetime(2025, 3, 8),
+                {"vegan": True},
+                "Plan",
+            )
+        backup.assert_called_once_with({"vegan": True})
+        for day_plan in days.values():
+            breakfast, dinner = day_plan["meals"]
+            self.assertEqual(
+                breakfast["meal_types"], {"main_course": "m1", "beverage": "b9"}
+            )
+            self.assertEqual(
+                dinner["meal_types"],
+                {"main_course": "m1", "side": "f1", "dessert": "d1"},
+            )
@@ -0,0 +1,114 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from core.modules.catalog import Catalog
+from core.modules.meal_plan_optimizer import MealScorer, optimize_days
+
+RECIPES = [
+    {"recipe-id": "steak", "food_role": ["Main Course"], "hasMeat": True},
+    {"recipe-id": "lasagna", "food_role": ["Main Course"], "hasDairy": True},
+    {"recipe-id": "curry", "food_role": ["Main Course"]},
+    {"recipe-id": "stir fry", "food_role": ["Main Course", "Side"]},
+    {"recipe-id": "salad", "food_role": ["Side"]},
+    {"recipe-id": "fries", "food_role": ["Side"]},
+    {"recipe-id": "cake", "food_role": ["Dessert"], "hasDairy": True},
+    {"recipe-id": "sorbet", "food_role": ["Dessert"]},
+]
+
+BEVERAGES = [
+    {"bev-id": "milk", "hasDairy": True},
+    {"bev-id": "tea"},
+]
+
+MEAL_CONFIGS = [
+    {
+        "meal_name": "lunch",
+        "meal_types": {"main_course": True, "side": True, "beverage": True},
+    },
+    {
+        "meal_name": "dinner",
+        "meal_types": {"main_course": True, "dessert": True, "side": False},
+    },
+]
+
+POOLS = {
+    # the sides are offered as main courses too
+    "main_course": ["steak", "lasagna", "curry", "stir fry", "salad", "fries"],
+    "side": ["stir fry", "salad", "fries"],
+    "dessert": ["cake", "sorbet"],
+    "beverage": ["milk", "tea"],
+}
+
+# dislikes dairy and meat
+PREFERENCES = {"dairyPreference": -1, "meatPreference": -1, "nutsPreference": 0}
+
+
+class TestMealPlanOptimizer(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+
+    def optimize(self, **kwargs):
+        return optimize_days(
+            POOLS,
+            MEAL_CONFIGS,
+            14,
+            datetime(2025, 3, 8),
+            "Plan",
+            PREFERENCES,
+            rng=np.random.default_rng(0),
+            catalog=self.catalog,
+            **kwargs,
+        )
+
+    def test_finds_the_best_scoring_meals(self):
+        """
+        Every meal should reach the best possible score: fitting roles, no repeats, nothing disliked.
+        """
+        days, stats = self.optimize(time_budget=5)
+        self.assertTrue(stats["completed"])
+        self.assertGreater(stats["improved_meals"], 0)
+        main_courses = set()
+        for day_plan in days.values():
+            lunch, dinner = day_plan["meals"]
+            self.assertIn(lunch["meal_types"]["main_course"], {"curry", "stir fry"})
+            self.assertIn(lunch["meal_types"]["side"], {"salad", "fries", "stir fry"})
+            self.assertNotEqual(
+                lunch["meal_types"]["main_course"], lunch["meal_types"]["side"]
+            )
+            self.assertEqual(lunch["meal_types"]["beverage"], "tea")
+            self.assertEqual(dinner["meal_types"]["dessert"], "sorbet")
+            main_courses.add(dinner["meal_types"]["main_course"])
+        # ties are broken at random
+        self.assertEqual(main_courses, {"curry", "stir fry"})
+
+    def test_exhausted_budget_returns_the_starting_plan(self):
+        days, stats = self.optimize(time_budget=0)
+        self.assertEqual(stats["sweeps"], 0)
+        self.assertFalse(stats["completed"])
+        self.assertEqual(len(days), 14)
+        for day_plan in days.values():
+            for meal in day_plan["meals"]:
+                for role, item_id in meal["meal_types"].items():
+                    self.assertIn(item_id, POOLS[role])
+
+    def test_weights(self):
+        """
+        With only variety and coverage weighted, disliked items are no longer avoided.
+        """
+        days, _ = self.optimize(time_budget=5, weights={"constraint": 0.0})
+        beverages = {
+            day_plan["meals"][0]["meal_types"]["beverage"] for day_plan in days.values()
+        }
+        self.assertEqual(beverages, {"milk", "tea"})
+
+    def test_scorer_matches_the_metrics(self):
+        """
+        The scorer should agree with metrics.py: a repeated item, a misplaced item and a disliked feature.
+        """
+        scorer = MealScorer(PREFERENCES)
+        # main course "salad" (misplaced) + side "salad" (repeated) + milk, out of 3 configured roles
+        score = scorer.score(3, 2, coverage=1 - 1 + 1, num_configured=3, mask=1)
+        variety, coverage, constraint = 1 - 1 / 3, 1 / 3, 1 - 1 / 3
+        self.assertAlmostEqual(float(score), variety + coverage + constraint)
@@ -0,0 +1,85 @@
+import unittest
+
+import numpy as np
+
+from core.modules.catalog import Catalog
+from core.modules.nutrition import (
+    day_nutrient_totals,
+    nutrient_matrix,
+    nutrition_summary,
+)
+
+from .test_catalog import BEVERAGES, RECIPES
+
+# same id as the omelette, to make sure beverages are looked up separately
+SMOOTHIE = {
+    "bev-id": "1",
+    "name": "Smoothie",
+    "nutrition": {
+        "Calories": {"measure": "150"},
+        "Carbohydrates": {"measure": "30"},
+        "Protein": {"measure": "4"},
+        "Fiber": {"measure": "2"},
+    },
+}
+
+
+def meal(**meal_types):
+    return {"meal_name": "breakfast", "meal_types": meal_types}
+
+
+class TestNutrition(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog.from_documents(RECIPES, [SMOOTHIE, BEVERAGES[1]])
+        self.matrix = nutrient_matrix(self.catalog)
+        self.days = {
+            "2025-03-08": {
+                "meals": [
+                    meal(main_course="1", side="1", beverage="1"),
+                    meal(dessert="2", beverage="2"),
+                ]
+            },
+            # saved day plans key their meals by meal id
+            "2025-03-09": {
+                "meals": {"m1": meal(main_course="1", side="", dessert="404")}
+            },
+            "2025-03-10": {"meals": []},
+        }
+
+    def test_matrix_is_built_once_per_catalog(self):
+        self.assertEqual(self.matrix.matrix.dtype, np.float32)
+        self.assertEqual(self.matrix.matrix.shape, (5, 4))
+        self.assertIs(nutrient_matrix(self.catalog), self.matrix)
+
+    def test_day_totals(self):
+        """
+        Totals should add up every item of every meal, per day, with recipes and beverages kept apart.
+        """
+        dates, totals = day_nutrient_totals(self.days, self.matrix)
+        self.assertEqual(dates, list(self.days))
+        np.testing.assert_allclose(totals[0], [790.0, 54.0, 47.0, 8.0])
+        np.testing.assert_allclose(totals[1], [320.0, 12.0, 21.5, 3.0])
+        np.testing.assert_allclose(totals[2], [0.0, 0.0, 0.0, 0.0])
+
+    def test_deltas_against_goals(self):
+        summary = nutrition_summary(
+            self.days,
+            {"calories": 2000, "carbs": 250, "protein": 100, "fiber": 0},
+            self.matrix,
+        )
+        self.assertEqual(summary["goals"]["fiber"], None)
+        first = summary["days"]["2025-03-08"]
+        self.assertEqual(first["totals"]["calories"], 790.0)
+        self.assertEqual(
+            first["deltas"],
+            {"calories": -1210.0, "carbs": -196.0, "protein": -53.0, "fiber": None},
+        )
+
+    def test_summary_without_goals(self):
+        summary = nutrition_summary(self.days, None, self.matrix)
+        self.assertTrue(
+            all(
+                value is None
+                for value in summary["days"]["2025-03-09"]["deltas"].values()
+            )
+        )
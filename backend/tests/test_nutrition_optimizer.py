@@ -0,0 +1,161 @@
+import json
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from django.test import RequestFactory
+
+from core.modules.catalog import Catalog
+from core.modules.meal_plan_generator import generate_days
+from core.modules.nutrition import nutrient_matrix, nutrition_summary
+from core.modules.nutrition_optimizer import optimize_nutrition
+from core.views import bandit_recommendation
+
+from .mocks.plans import items
+
+
+def recipe(recipe_id, roles, calories, protein):
+    return {
+        "recipe-id": recipe_id,
+        "recipe_name": recipe_id,
+        "food_role": roles,
+        "macronutrients": {
+            "Calories": {"measure": str(calories)},
+            "Protein": {"measure": str(protein)},
+        },
+    }
+
+
+RECIPES = [
+    recipe(f"m{i}", ["Main Course"], 200 + 100 * i, 10 + 5 * i) for i in range(6)
+]
+RECIPES += [recipe(f"s{i}", ["Side"], 100 + 100 * i, 5 + 5 * i) for i in range(4)]
+BEVERAGES = [
+    {"bev-id": "b0", "name": "Water"},
+    {
+        "bev-id": "b1",
+        "name": "Juice",
+        "nutrition": {"Calories": {"measure": "100"}, "Protein": {"measure": "5"}},
+    },
+]
+
+POOLS = {
+    "main_course": [f"m{i}" for i in range(6)],
+    "side": [f"s{i}" for i in range(4)],
+    "beverage": ["b0", "b1"],
+}
+
+MEAL_CONFIGS = [
+    {
+        "meal_name": "breakfast",
+        "meal_types": {"main_course": True, "beverage": True},
+    },
+    {
+        "meal_name": "dinner",
+        "meal_types": {"main_course": True, "side": True},
+    },
+]
+
+# reachable exactly, e.g. m1 + b0 for breakfast and m5 + s2 for dinner
+GOALS = {"calories": 1300, "protein": 65, "carbs": 0, "fiber": 0}
+
+
+class TestNutritionOptimizer(unittest.TestCase):
+    def setUp(self):
+        self.matrix = nutrient_matrix(Catalog.from_documents(RECIPES, BEVERAGES))
+
+    def optimize(self, seed=0, **kwargs):
+        kwargs.setdefault("time_budget", 5)
+        return optimize_nutrition(
+            POOLS,
+            MEAL_CONFIGS,
+            14,
+            datetime(2025, 3, 8),
+            "Plan",
+            kwargs.pop("goals", GOALS),
+            rng=np.random.default_rng(seed),
+            matrix=self.matrix,
+            **kwargs,
+        )
+
+    def test_days_get_close_to_the_goals(self):
+        """
+        The search should converge, bring every day closer to the goals and report what it achieved.
+        """
+        days, stats = self.optimize()
+        self.assertTrue(stats["completed"])
+        self.assertLess(stats["deviation_after"], stats["deviation_before"])
+        self.assertLess(stats["deviation_after"], 0.1)
+        self.assertEqual(len(stats["day_deviations"]), 14)
+
+        summary = nutrition_summary(days, GOALS, self.matrix)
+        for date, day in summary["days"].items():
+            self.assertAlmostEqual(day["totals"]["calories"], 1300, delta=150)
+            self.assertNotEqual(
+                days[date]["meals"][0]["meal_types"]["main_course"],
+                days[date]["meals"][1]["meal_types"]["main_course"],
+            )
+
+    def test_zero_budget_returns_the_draw(self):
+        days, stats = self.optimize(time_budget=0)
+        drawn = generate_days(
+            POOLS,
+            MEAL_CONFIGS,
+            14,
+            datetime(2025, 3, 8),
+            "Plan",
+            np.random.default_rng(0),
+        )
+        self.assertEqual(items(days), items(drawn))
+        self.assertEqual(stats["sweeps"], 0)
+        self.assertFalse(stats["completed"])
+        self.assertEqual(stats["deviation_after"], stats["deviation_before"])
+
+    def test_seeded_search_is_reproducible(self):
+        self.assertEqual(items(self.optimize(3)[0]), items(self.optimize(3)[0]))
+
+    def test_no_repeat_window_is_kept(self):
+        days, _ = self.optimize(no_repeat_days={"main_course": 3})
+        main_courses = [
+            [meal["meal_types"]["main_course"] for meal in day_plan["meals"]]
+            for day_plan in days.values()
+        ]
+        for day_index in range(len(main_courses) - 2):
+            window = sum(main_courses[day_index : day_index + 3], [])
+            self.assertEqual(len(set(window)), 6)
+
+    def test_without_goals_the_draw_is_kept(self):
+        days, stats = self.optimize(goals={"calories": 0})
+        self.assertEqual(items(days), items(self.optimize(time_budget=0)[0]))
+        self.assertIsNone(stats["deviation_after"])
+
+    @patch("core.views.recommendation_views.firebaseManager")
+    def test_endpoint_requires_goals(self, firebase):
+        user = MagicMock()
+        user.get_nutritional_goals.return_value = {"calories": 0, "protein": 0}
+        firebase.get_user_by_id.return_value = (user, 200)
+        body = {
+            "user_id": "user",
+            "user_preferences": {},
+            "meal_plan_config": {
+                "num_days": 3,
+                "num_meals": 2,
+                "meal_configs": MEAL_CONFIGS,
+            },
+            "target_nutrition": True,
+        }
+
+        def request(**extra):
+            return bandit_recommendation(
+                RequestFactory().post(
+                    "/beacon/recommendation/bandit",
+                    json.dumps({**body, **extra}),
+                    content_type="application/json",
+                )
+            )
+
+        self.assertEqual(request(optimize=True).status_code, 400)
+        firebase.get_user_by_id.assert_not_called()
+        self.assertEqual(request().status_code, 400)
+        user.increment_bandit_counter.assert_not_called()
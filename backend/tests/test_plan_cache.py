@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import patch
+
+from core.modules.plan_cache import PlanCache, get_pool_cache, plan_cache_key
+from core.modules.recommendation_helpers import cached_candidate_pools
+
+FAVORITE_ITEMS = {"Main Course": ["m1", "m2"], "Beverage": ["b1"]}
+MEAL_CONFIGS = [{"meal_name": "lunch", "meal_types": {"main_course": True}}]
+
+
+def key(favorite_items=FAVORITE_ITEMS, seed=1, **inputs):
+    return plan_cache_key(
+        favorite_items, MEAL_CONFIGS, {"isVegan": False}, 7, seed, **inputs
+    )
+
+
+class TestPlanCache(unittest.TestCase):
+    def test_key(self):
+        """
+        The key should ignore the order of the favorite items but not the other inputs.
+        """
+        reordered = {"Beverage": ["b1"], "Main Course": ["m2", "m1", "m2"]}
+        self.assertEqual(key(), key(reordered))
+        self.assertNotEqual(key(), key(seed=2))
+        self.assertNotEqual(
+            key(starting_date="2025-03-08"), key(starting_date="2025-03-09")
+        )
+
+    def test_least_recently_used_plan_is_evicted(self):
+        cache = PlanCache(max_entries=2, ttl=60)
+        cache.put("a", {"name": "a"})
+        cache.put("b", {"name": "b"})
+        cache.get("a")
+        cache.put("c", {"name": "c"})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"name": "a"})
+        self.assertEqual(cache.get("c"), {"name": "c"})
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_entries_expire(self):
+        cache = PlanCache(max_entries=2, ttl=60)
+        with patch("core.modules.plan_cache.time.monotonic", return_value=100):
+            cache.put("a", {"name": "a"})
+        with patch("core.modules.plan_cache.time.monotonic", return_value=159):
+            self.assertIsNotNone(cache.get("a"))
+        with patch("core.modules.plan_cache.time.monotonic", return_value=160):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_cached_plans_are_copies(self):
+        """
+        Changing a plan that was cached or served should not change the cached plan.
+        """
+        cache = PlanCache(max_entries=2, ttl=60)
+        plan = {"days": {"2025-03-08": {"meals": []}}}
+        cache.put("a", plan)
+        plan["days"]["2025-03-08"]["user_id"] = "user"
+        cache.get("a")["days"]["2025-03-08"]["meals"].append({})
+        self.assertEqual(cache.get("a"), {"days": {"2025-03-08": {"meals": []}}})
+
+    def test_pools_are_shared(self):
+        """
+        Candidate pools should be cached as tuples and served without copying them.
+        """
+        get_pool_cache().clear()
+        self.addCleanup(get_pool_cache().clear)
+        configs = [
+            {
+                "meal_name": "lunch",
+                "meal_types": {"main_course": True, "beverage": True},
+            }
+        ]
+        pools = cached_candidate_pools(FAVORITE_ITEMS, configs, {"isVegan": False})
+        self.assertEqual(pools, {"main_course": ("m1", "m2"), "beverage": ("b1",)})
+        self.assertIs(
+            cached_candidate_pools(FAVORITE_ITEMS, configs, {"isVegan": False}), pools
+        )
+
+    def test_stats(self):
+        cache = PlanCache(max_entries=2, ttl=60)
+        self.assertIsNone(cache.stats()["hit_rate"])
+        cache.put("a", {})
+        cache.get("a")
+        cache.get("a")
+        cache.get("b")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+        self.assertEqual(stats["hit_rate"], 0.6667)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_disabled_cache(self):
+        cache = PlanCache(max_entries=0, ttl=60)
+        cache.put("a", {})
+        self.assertIsNone(cache.get("a"))
@@ -0,0 +1,86 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from core.modules.meal_plan_generator import generate_days, generate_grid
+
+from .test_meal_plan_generator import MEAL_CONFIGS
+from .test_variety import POOLS
+
+
+class TestPlanModel(unittest.TestCase):
+    def setUp(self):
+        self.grid = generate_grid(
+            POOLS,
+            MEAL_CONFIGS,
+            5,
+            datetime(2025, 3, 8),
+            "Plan",
+            np.random.default_rng(0),
+        )
+
+    def test_days_match_the_generated_plan(self):
+        days = self.grid.to_days()
+        generated = generate_days(
+            POOLS,
+            MEAL_CONFIGS,
+            5,
+            datetime(2025, 3, 8),
+            "Plan",
+            np.random.default_rng(0),
+        )
+        self.assertEqual(list(days), list(generated))
+        for day_plan, generated_day in zip(days.values(), generated.values()):
+            self.assertEqual(
+                [meal["meal_types"] for meal in day_plan["meals"]],
+                [meal["meal_types"] for meal in generated_day["meals"]],
+            )
+            self.assertEqual(
+                [meal["meal_name"] for meal in day_plan["meals"]],
+                [meal_config["meal_name"] for meal_config in MEAL_CONFIGS],
+            )
+        self.assertEqual(len(self.grid), 5)
+        self.assertEqual(
+            self.grid.meal_items(2, 1), days["2025-03-10"]["meals"][1]["meal_types"]
+        )
+
+    def test_days_never_share_dictionaries(self):
+        """
+        Writing to a meal of one day should leave the other days and later conversions untouched.
+        """
+        days = self.grid.to_days()
+        meals = [meal for day_plan in days.values() for meal in day_plan["meals"]]
+        self.assertEqual(len({id(meal) for meal in meals}), len(meals))
+        self.assertEqual(len({meal["_id"] for meal in meals}), len(meals))
+
+        days["2025-03-08"]["meals"][0]["meal_types"]["main_course"] = "edited"
+        self.assertNotEqual(
+            days["2025-03-09"]["meals"][0]["meal_types"]["main_course"], "edited"
+        )
+        again = self.grid.to_days()
+        self.assertNotEqual(
+            again["2025-03-08"]["meals"][0]["meal_types"]["main_course"], "edited"
+        )
+        self.assertEqual(
+            again["2025-03-08"]["meals"][0]["_id"],
+            days["2025-03-08"]["meals"][0]["_id"],
+        )
+
+    def test_with_item_is_copy_on_write(self):
+        edited = self.grid.with_item(1, 1, "main_course", "m7")
+        self.assertEqual(edited.meal_items(1, 1)["main_course"], "m7")
+        self.assertEqual(
+            edited.meal_items(1, 0)["main_course"],
+            self.grid.meal_items(1, 0)["main_course"],
+        )
+        self.assertNotEqual(
+            self.grid.to_days()["2025-03-09"]["meals"][1]["meal_types"],
+            edited.to_days()["2025-03-09"]["meals"][1]["meal_types"],
+        )
+        # unchanged roles and days are shared, ids are kept
+        self.assertIs(edited.rows["side"], self.grid.rows["side"])
+        self.assertIs(edited.rows["main_course"][0], self.grid.rows["main_course"][0])
+        self.assertIs(edited.meal_ids, self.grid.meal_ids)
+        with self.assertRaises(KeyError):
+            self.grid.with_item(0, 0, "side", "s1")
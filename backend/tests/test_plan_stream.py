@@ -0,0 +1,103 @@
+import copy
+import json
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import numpy as np
+
+from core.modules.catalog import Catalog
+from core.modules.meal_plan_generator import generate_days
+from core.modules.nutrition import nutrition_summary
+from core.modules.plan_stream import stream_meal_plan
+from core.modules.recommendation_helpers import calculate_goodness
+
+from .test_meal_plan_optimizer import (
+    BEVERAGES,
+    MEAL_CONFIGS,
+    POOLS,
+    PREFERENCES,
+    RECIPES,
+)
+
+GOALS = {"Calories": 2000}
+
+
+def parse(lines):
+    return [json.loads(line) for line in lines]
+
+
+class TestPlanStream(unittest.TestCase):
+    def setUp(self):
+        catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        patcher = patch("core.modules.catalog._catalog", catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        days = generate_days(
+            POOLS,
+            MEAL_CONFIGS,
+            5,
+            datetime(2025, 3, 8),
+            "Plan",
+            np.random.default_rng(0),
+        )
+        self.meal_plan = {
+            "_id": "plan",
+            "user_id": "user",
+            "name": "Plan",
+            "days": days,
+        }
+
+    def stream(self, meal_plan, **kwargs):
+        return parse(
+            stream_meal_plan(meal_plan, MEAL_CONFIGS, PREFERENCES, GOALS, **kwargs)
+        )
+
+    def test_days_are_sent_with_their_scores(self):
+        """
+        The streamed days and scores should match the plan scored all at once.
+        """
+        expected = copy.deepcopy(self.meal_plan)
+        scores = calculate_goodness(expected["days"], MEAL_CONFIGS, PREFERENCES)
+        nutrition = nutrition_summary(expected["days"], GOALS)
+
+        saved, completed = [], []
+        lines = self.stream(
+            self.meal_plan,
+            on_day=lambda date, day_plan: saved.append(date),
+            on_complete=completed.append,
+        )
+        self.assertEqual(
+            lines[0], {"type": "plan", "_id": "plan", "user_id": "user", "name": "Plan"}
+        )
+        self.assertEqual([line["type"] for line in lines[1:]], ["day"] * 5 + ["end"])
+        self.assertEqual([line["date"] for line in lines[1:-1]], list(expected["days"]))
+        self.assertEqual(saved, list(expected["days"]))
+        for line in lines[1:-1]:
+            self.assertEqual(line["day"], expected["days"][line["date"]])
+            self.assertEqual(line["nutrition"], nutrition["days"][line["date"]])
+            self.assertEqual(len(line["scores"]["variety_scores"]), len(MEAL_CONFIGS))
+        self.assertEqual(lines[-1]["scores"], scores)
+        self.assertEqual(lines[-1]["nutrition_goals"], nutrition["goals"])
+
+        # the scores are collected into the plan, e.g. for the plan cache
+        self.assertEqual(completed, [self.meal_plan])
+        self.assertEqual(self.meal_plan["scores"], scores)
+        self.assertEqual(self.meal_plan["nutrition"], nutrition)
+
+    def test_scored_plan_is_sent_as_is(self):
+        first = self.stream(self.meal_plan)
+        completed = []
+        with patch("core.modules.plan_stream.calculate_goodness") as score:
+            second = self.stream(self.meal_plan, on_complete=completed.append)
+        score.assert_not_called()
+        self.assertEqual(second, first)
+        self.assertEqual(completed, [])
+
+    def test_errors_end_the_stream(self):
+        with patch(
+            "core.modules.plan_stream.calculate_goodness", side_effect=KeyError("x")
+        ):
+            lines = self.stream(self.meal_plan)
+        self.assertEqual([line["type"] for line in lines], ["plan", "error"])
+        self.assertNotIn("scores", self.meal_plan)
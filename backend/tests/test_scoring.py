@@ -0,0 +1,424 @@
+import copy
+import itertools
+import json
+import random
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.test import RequestFactory, override_settings
+
+from core.modules.catalog import Catalog, CatalogChanges
+from core.modules.batch_generation import evaluate_plan
+from core.modules.item_coverage_metric import Coverage
+from core.modules.metrics import food_item_coverage_score, nutritional_constraint_score
+from core.modules.nutrition import day_meals
+from core.modules.recommendation_helpers import calculate_goodness, score_meal
+from core.modules.nutritional_constraint_metric import User_Constraints
+from core.modules.scoring import (
+    FeatureTable,
+    constraint_score,
+    coverage_score,
+    feature_table,
+    score_meals,
+)
+from core.views import score_meal_plans
+
+from .test_meal_plan_optimizer import BEVERAGES, MEAL_CONFIGS, RECIPES
+
+
+def legacy_constraint_score(meal_types, user_preferences):
+    """The score of the per-meal User_Constraints calculator"""
+    calculator = User_Constraints()
+    for constraint in calculator.get_constraints().copy():
+        calculator.remove_constraint(constraint)
+    features = {
+        "dairyPreference": "hasDairy",
+        "meatPreference": "hasMeat",
+        "nutsPreference": "hasNuts",
+    }
+    for preference, value in user_preferences.items():
+        calculator.add_new_constraint(features[preference], value)
+    return calculator.calc_config(meal_types)[0]
+
+
+def legacy_coverage_score(meal_types, meal_config, catalog):
+    """The score of the Coverage calculator, for meals without beverages"""
+    calculator = Coverage()
+    configured = list(meal_config["meal_types"])
+    calculator.set_meal_config(configured)
+    calculator.set_new_weights([1] * len(configured))
+    calculator.add_food_items(
+        {
+            item_id: [
+                int(role in coverage_roles(catalog, item_id)) for role in configured
+            ]
+            for item_id in meal_types.values()
+        }
+    )
+    calculator.calc_coverage(meal_types)
+    return max(0, calculator.get_coverage())
+
+
+def coverage_roles(catalog, item_id):
+    return ["_".join(role.lower().split()) for role in catalog.recipes[item_id].roles]
+
+
+MEALS = [
+    {"main_course": "steak", "side": "salad", "beverage": "milk"},
+    {"main_course": "lasagna", "dessert": "cake", "beverage": "tea"},
+    {"main_course": "curry", "side": "fries"},
+    {"main_course": "salad", "side": "salad", "beverage": "tea"},
+    {"main_course": "stir fry", "dessert": "sorbet"},
+]
+
+
+class TestScoring(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        patcher = patch("core.modules.catalog._catalog", self.catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_table_is_built_once_per_catalog(self):
+        table = feature_table(self.catalog)
+        self.assertIs(feature_table(), table)
+        self.assertEqual(table.mask("main_course", "steak"), 2)
+        self.assertEqual(table.mask("dessert", "cake"), 1)
+        self.assertEqual(table.mask("beverage", "milk"), 1)
+        self.assertEqual(table.mask("beverage", "steak"), 0)
+        self.assertEqual(table.mask("side", "404"), 0)
+
+    def test_matches_the_constraint_calculator(self):
+        """
+        Every combination of preferences should get the score of User_Constraints, for every meal.
+        """
+        meals = MEALS + [{"main_course": "steak", "side": "", "dessert": "404"}, {}]
+        for dairy, meat, nuts in itertools.product((-1, 0, 1), repeat=3):
+            preferences = {
+                "dairyPreference": dairy,
+                "meatPreference": meat,
+                "nutsPreference": nuts,
+            }
+            for meal_types in meals:
+                self.assertAlmostEqual(
+                    constraint_score(meal_types, preferences),
+                    legacy_constraint_score(meal_types, preferences),
+                )
+        self.assertAlmostEqual(
+            constraint_score({"main_course": "steak"}, {"meatPreference": -1}), 0.0
+        )
+
+    def test_recipes_and_beverages_are_kept_apart(self):
+        """
+        A beverage sharing the id of a recipe should not lend it its features.
+        """
+        catalog = Catalog.from_documents(
+            [{"recipe-id": "1", "food_role": ["Main Course"]}],
+            [{"bev-id": "1", "hasDairy": True}],
+        )
+        table = feature_table(catalog)
+        preferences = {"dairyPreference": -1}
+        self.assertEqual(constraint_score({"main_course": "1"}, preferences, table), 1)
+        self.assertEqual(constraint_score({"beverage": "1"}, preferences, table), 0)
+
+    def test_table_is_updated_incrementally(self):
+        feature_table(self.catalog)
+        updated = self.catalog.apply_changes(
+            CatalogChanges(
+                recipes={
+                    "curry": {
+                        "recipe-id": "curry",
+                        "food_role": ["Main Course"],
+                        "hasNuts": True,
+                    },
+                    "steak": None,
+                },
+                beverages={"oat milk": {"bev-id": "oat milk"}},
+            )
+        )
+        with patch.object(FeatureTable, "from_catalog") as build:
+            table = feature_table(updated)
+        build.assert_not_called()
+        rebuilt = FeatureTable.from_catalog(updated)
+        self.assertEqual(table.recipe_masks, rebuilt.recipe_masks)
+        self.assertEqual(table.beverage_masks, rebuilt.beverage_masks)
+        self.assertEqual(feature_table(self.catalog).mask("main_course", "curry"), 0)
+
+    def test_coverage(self):
+        """
+        Items fitting their role should add to the coverage of the configured roles, misplaced ones subtract.
+        """
+        lunch, dinner = (meal_config["meal_types"] for meal_config in MEAL_CONFIGS)
+        self.assertAlmostEqual(coverage_score(MEALS[0], lunch), 1.0)
+        # salad is no main course
+        self.assertAlmostEqual(coverage_score(MEALS[3], lunch), 1 / 3)
+        # the side is configured but not requested
+        self.assertAlmostEqual(coverage_score(MEALS[4], dinner), 2 / 3)
+        self.assertAlmostEqual(coverage_score({"main_course": "cake"}, dinner), 0.0)
+        self.assertAlmostEqual(
+            coverage_score({"main_course": "steak", "side": ""}, lunch), 1 / 3
+        )
+        self.assertEqual(coverage_score(MEALS[0], []), 0.0)
+
+        for meal_types, meal_config in (
+            (MEALS[2], lunch),
+            ({"main_course": "salad", "side": "salad"}, lunch),
+            (MEALS[4], dinner),
+            ({"main_course": "cake", "dessert": "steak"}, dinner),
+        ):
+            self.assertAlmostEqual(
+                coverage_score(meal_types, meal_config),
+                legacy_coverage_score(
+                    meal_types, {"meal_types": meal_config}, self.catalog
+                ),
+            )
+
+    def test_beverages_cover_their_role(self):
+        """
+        A beverage used to be looked up under an id it was never stored under, and always counted as misplaced.
+        """
+        lunch = MEAL_CONFIGS[0]["meal_types"]
+        self.assertAlmostEqual(coverage_score({"beverage": "tea"}, lunch), 1 / 3)
+        self.assertAlmostEqual(coverage_score({"beverage": "steak"}, lunch), 0.0)
+        self.assertAlmostEqual(coverage_score({"side": "tea"}, lunch), 0.0)
+
+    def test_calculators_do_not_share_state(self):
+        first, second = Coverage(), Coverage()
+        first.set_meal_config(["main_course"])
+        first.add_food_items({"steak": [1]})
+        self.assertEqual(second.get_meal_config(), [])
+        self.assertEqual(second.get_food_items(), {})
+        first, second = User_Constraints(), User_Constraints()
+        first.remove_constraint("HasDairy")
+        self.assertIn("HasDairy", second.get_constraints())
+
+    def test_concurrent_scoring(self):
+        """
+        Scoring from many threads at once, starting before the table exists, should give the sequential scores.
+        """
+        catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        preferences = [
+            dict(zip(("dairyPreference", "meatPreference", "nutsPreference"), values))
+            for values in itertools.product((-1, 0, 1), repeat=3)
+        ]
+        tasks = [
+            (meal_types, meal_config, user_preferences)
+            for meal_types in MEALS
+            for meal_config in MEAL_CONFIGS
+            for user_preferences in preferences
+        ] * 20
+        table = feature_table(self.catalog)
+        expected = [
+            (
+                coverage_score(meal_types, meal_config["meal_types"], table),
+                constraint_score(meal_types, user_preferences, table),
+            )
+            for meal_types, meal_config, user_preferences in tasks
+        ]
+
+        workers = 16
+        barrier = threading.Barrier(workers)
+
+        def score(task):
+            meal_types, meal_config, user_preferences = task
+            meal = {"meal_types": meal_types}
+            return (
+                food_item_coverage_score(meal, meal_config),
+                nutritional_constraint_score(meal, user_preferences),
+            )
+
+        def wait_then_score(task):
+            barrier.wait()
+            return score(task)
+
+        with patch("core.modules.catalog._catalog", catalog):
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                first = list(executor.map(wait_then_score, tasks[:workers]))
+                results = first + list(executor.map(score, tasks[workers:]))
+        self.assertEqual(results, expected)
+
+    def test_plan_scores_match_the_meal_scores(self):
+        """
+        Scoring a whole plan at once should give exactly the scores of scoring its meals one by one.
+        """
+        rng = random.Random(0)
+        items = [recipe["recipe-id"] for recipe in RECIPES]
+        items += [beverage["bev-id"] for beverage in BEVERAGES] + ["", "404"]
+        roles = ["main_course", "side", "dessert", "beverage"]
+        meal_configs = MEAL_CONFIGS + [
+            {"meal_name": "snack", "meal_types": {}},
+            {"meal_name": "brunch", "meal_types": dict.fromkeys(roles, True)},
+        ]
+        days = {
+            f"day{day}": {
+                "meals": [
+                    {
+                        "meal_name": meal_config["meal_name"],
+                        "meal_types": {
+                            role: rng.choice(items)
+                            for role in rng.sample(roles, rng.randint(0, 4))
+                        },
+                    }
+                    for meal_config in meal_configs
+                ]
+            }
+            for day in range(50)
+        }
+        for values in itertools.product((-1, 0, 1), repeat=3):
+            preferences = dict(
+                zip(("dairyPreference", "meatPreference", "nutsPreference"), values)
+            )
+            expected_days = copy.deepcopy(days)
+            expected = ([], [], [])
+            for day_plan in expected_days.values():
+                for meal, meal_config in zip(day_plan["meals"], meal_configs):
+                    for scores, score in zip(
+                        expected, score_meal(meal, meal_config, preferences)
+                    ):
+                        scores.append(score)
+
+            scored_days = copy.deepcopy(days)
+            scores = calculate_goodness(scored_days, meal_configs, preferences)
+            self.assertEqual(
+                (
+                    scores["variety_scores"],
+                    scores["coverage_scores"],
+                    scores["constraint_scores"],
+                ),
+                expected,
+            )
+            self.assertEqual(scored_days, expected_days)
+
+    def test_no_meals(self):
+        variety, coverage, constraint = score_meals([], [], {})
+        self.assertEqual(
+            (variety.tolist(), coverage.tolist(), constraint.tolist()), ([], [], [])
+        )
+        self.assertEqual(calculate_goodness({}, MEAL_CONFIGS, {})["variety_scores"], [])
+
+
+PREFERENCES = {"dairyPreference": -1, "meatPreference": 0, "nutsPreference": 0}
+
+
+def plan(*days):
+    return {
+        "days": {
+            f"2025-03-{8 + index:02}": {
+                "meals": [
+                    {"meal_name": meal_config["meal_name"], "meal_types": meal_types}
+                    for meal_config, meal_types in zip(MEAL_CONFIGS, meals)
+                ]
+            }
+            for index, meals in enumerate(days)
+        }
+    }
+
+
+class TestScoreEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        patcher = patch("core.modules.catalog._catalog", self.catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, body):
+        request = RequestFactory().post(
+            "/beacon/recommendation/score",
+            json.dumps(body),
+            content_type="application/json",
+        )
+        response = score_meal_plans(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_plans_are_scored_like_generated_plans(self):
+        plans = [
+            plan(MEALS[:2], MEALS[2:4]),
+            plan(MEALS[3:5]),
+            # saved plans key their meals by id
+            {"days": {"2025-04-01": {"meals": {"m1": {"meal_types": MEALS[0]}}}}},
+        ]
+        status, content = self.post(
+            {
+                "meal_plans": plans,
+                "meal_configs": MEAL_CONFIGS,
+                "user_preferences": PREFERENCES,
+                "nutritional_goals": {"calories": 2000},
+            }
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(len(content["meal_plans"]), 3)
+        for meal_plan, scored in zip(plans, content["meal_plans"]):
+            days = {
+                date: {"meals": day_meals(day_plan)}
+                for date, day_plan in copy.deepcopy(meal_plan["days"]).items()
+            }
+            expected = json.loads(
+                json.dumps(
+                    evaluate_plan(days, MEAL_CONFIGS, PREFERENCES, {"calories": 2000})
+                )
+            )
+            for key in ("scores", "nutrition", "variety"):
+                self.assertEqual(scored[key], expected[key])
+        self.assertEqual(
+            content["meal_plans"][0]["days"]["2025-03-08"]["meals"][1]["variety_score"],
+            1.0,
+        )
+        self.assertAlmostEqual(
+            content["meal_plans"][2]["days"]["2025-04-01"]["meals"]["m1"][
+                "nutritional_constraint_score"
+            ],
+            2 / 3,
+        )
+
+        status, content = self.post(
+            {
+                "meal_plan": plans[0],
+                "meal_configs": MEAL_CONFIGS,
+                "user_preferences": PREFERENCES,
+            }
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(len(content["meal_plan"]["scores"]["variety_scores"]), 4)
+
+    def test_single_meal(self):
+        status, content = self.post(
+            {
+                "meal": {"meal_types": MEALS[3]},
+                "meal_config": MEAL_CONFIGS[0],
+                "user_preferences": PREFERENCES,
+            }
+        )
+        self.assertEqual(status, 200)
+        self.assertAlmostEqual(content["variety_score"], 2 / 3)
+        self.assertAlmostEqual(content["item_coverage_score"], 1 / 3)
+        self.assertEqual(content["nutritional_constraint_score"], 1.0)
+        self.assertIn("calories", content["nutrition"])
+
+    def test_invalid_requests(self):
+        body = {
+            "meal_plans": [plan(MEALS[:2])],
+            "meal_configs": MEAL_CONFIGS,
+            "user_preferences": PREFERENCES,
+        }
+        for key, status in (
+            ("user_preferences", 403),
+            ("meal_configs", 403),
+            ("meal_plans", 403),
+        ):
+            self.assertEqual(
+                self.post({k: v for k, v in body.items() if k != key})[0], status
+            )
+        self.assertEqual(
+            self.post({**body, "meal_plans": [{"days": {"2025-03-08": {}}}]})[0], 400
+        )
+        self.assertEqual(
+            self.post({**body, "meal_plans": [plan([{"main_course": ["steak"]}])]})[0],
+            400,
+        )
+        self.assertEqual(self.post({**body, "meal": {"meal_types": MEALS[0]}})[0], 403)
+        with override_settings(MAX_SCORED_PLANS=1):
+            self.assertEqual(
+                self.post({**body, "meal_plans": body["meal_plans"] * 2})[0], 400
+            )
@@ -0,0 +1,193 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from django.test import RequestFactory
+
+from core.modules.catalog import Catalog, CatalogChanges
+from core.modules.search_index import SearchIndex, search_index
+from core.views import search_catalog
+
+RECIPES = [
+    {
+        "recipe-id": "1",
+        "recipe_name": "Chicken Alfredo",
+        "food_role": ["Main Course"],
+        "hasMeat": True,
+        "hasDairy": True,
+        "ingredients": [{"name": "chicken breasts"}, {"name": "heavy cream"}],
+    },
+    {
+        "recipe-id": "2",
+        "recipe_name": "Roasted Chickpeas",
+        "food_role": ["Side"],
+        "isVegan": True,
+        "isGlutenFree": True,
+        "ingredients": [{"name": "chickpeas"}, {"name": "olive oil"}],
+    },
+    {
+        "recipe-id": "3",
+        "recipe_name": "Caesar Salad",
+        "food_role": ["Side", "Main Course"],
+        "ingredients": [{"name": "romaine"}, {"name": "grilled chicken"}],
+    },
+    {
+        "recipe-id": "4",
+        "recipe_name": "Strawberry Shortcake",
+        "food_role": ["Dessert"],
+        "ingredients": [{"name": "strawberries"}, {"name": "flour"}],
+    },
+]
+
+BEVERAGES = [
+    {"bev-id": "1", "name": "Chocolate Milk", "hasDairy": True},
+    {"bev-id": "2", "name": "Strawberry Smoothie"},
+]
+
+
+def ids(results):
+    return [item_id for _, item_id in results]
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        self.index = search_index(self.catalog)
+
+    def test_prefix_search_ranks_name_matches_first(self):
+        """
+        Query words should match name and ingredient word prefixes, with name matches ranked first.
+        """
+        results, total = self.index.search("chick")
+        self.assertEqual(total, 3)
+        self.assertEqual(ids(results), ["1", "2", "3"])
+
+        results, total = self.index.search("grilled Chicken")
+        self.assertEqual(ids(results), ["3"])
+
+        results, _ = self.index.search("strawberries")
+        self.assertEqual(results, [("recipe", "4"), ("beverage", "2")])
+        self.assertEqual(self.index.search("tofu"), ([], 0))
+
+    def test_role_and_dietary_filters(self):
+        results, _ = self.index.search("chick", roles=["main_course"])
+        self.assertEqual(ids(results), ["1", "3"])
+        results, _ = self.index.search("chick", dietary_filters=["vegan"])
+        self.assertEqual(ids(results), ["2"])
+        results, _ = self.index.search(
+            "", roles=["beverage"], dietary_filters=["dairy_free"]
+        )
+        self.assertEqual(results, [("beverage", "2")])
+
+    def test_incremental_update_matches_full_build(self):
+        """
+        Deriving the index of a changed catalog should give the same answers as building it from scratch.
+        """
+        changed = RECIPES[:2] + [
+            {**RECIPES[2], "recipe_name": "Tofu Caesar Salad", "isVegan": True},
+            {
+                "recipe-id": "5",
+                "recipe_name": "Chicken Soup",
+                "food_role": ["Main Course"],
+            },
+        ]
+        catalog = Catalog.from_documents(changed, BEVERAGES)
+        updated = self.index.updated(catalog)
+        rebuilt = SearchIndex.from_catalog(catalog)
+
+        for query, kwargs in (
+            ("chick", {}),
+            ("tofu", {}),
+            ("straw", {}),
+            ("", {"dietary_filters": ["vegan"]}),
+            ("c", {"roles": ["Main Course"]}),
+        ):
+            self.assertEqual(
+                sorted(updated.search(query, **kwargs)[0]),
+                sorted(rebuilt.search(query, **kwargs)[0]),
+            )
+        self.assertNotIn("shortcake", updated.tokens)
+
+        # the previous version's index is left as it was
+        self.assertEqual(ids(self.index.search("tofu")[0]), [])
+        self.assertEqual(ids(self.index.search("shortcake")[0]), ["4"])
+
+    def test_live_changes_before_the_postings_are_rebuilt(self):
+        """
+        Items added or removed by live changes should be found, or not, before the postings are rebuilt.
+        """
+        fillers = [
+            {"recipe-id": f"filler {i}", "recipe_name": f"Filler {i}"}
+            for i in range(100)
+        ]
+        catalog = Catalog.from_documents(RECIPES + fillers, BEVERAGES)
+        index = SearchIndex.from_catalog(catalog)
+        changes = CatalogChanges(
+            {
+                "1": None,
+                "3": {**RECIPES[2], "recipe_name": "Chicken Caesar Salad"},
+                "5": {
+                    "recipe-id": "5",
+                    "recipe_name": "Chickpea Curry",
+                    "food_role": ["Main Course"],
+                    "isVegan": True,
+                },
+            }
+        )
+        catalog = catalog.apply_changes(changes)
+        updated = index.updated(catalog, changes)
+        self.assertTrue(updated.added_tokens)
+        rebuilt = SearchIndex.from_catalog(catalog)
+
+        for query, kwargs in (
+            ("chick", {}),
+            ("alfredo", {}),
+            ("chicken caesar", {}),
+            ("c", {"dietary_filters": ["vegan"]}),
+            ("", {"roles": ["main_course"]}),
+        ):
+            results, total = updated.search(query, **kwargs)
+            expected, expected_total = rebuilt.search(query, **kwargs)
+            self.assertEqual(sorted(results), sorted(expected))
+            self.assertEqual(total, expected_total)
+        self.assertEqual(ids(updated.search("chick")[0]), ["2", "3", "5"])
+
+    def test_new_catalog_version_updates_previous_index(self):
+        catalog = Catalog.from_documents(RECIPES[1:], BEVERAGES)
+        catalog.inherit_derived(self.catalog)
+        with patch.object(SearchIndex, "from_catalog") as build:
+            index = search_index(catalog)
+        build.assert_not_called()
+        self.assertEqual(ids(index.search("alfredo")[0]), [])
+
+
+class TestSearchView(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        patcher = patch(
+            "core.views.food_item_views.get_catalog",
+            return_value=Catalog.from_documents(RECIPES, BEVERAGES),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_search_endpoint(self):
+        request = self.factory.get(
+            "/beacon/catalog/search",
+            {"q": "chick", "role": "main_course,side", "gluten_free": "true"},
+        )
+        response = search_catalog(request)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data["total"], 1)
+        self.assertEqual(data["results"][0]["name"], "Roasted Chickpeas")
+        self.assertEqual(data["results"][0]["roles"], ["Side"])
+        self.assertTrue(data["results"][0]["vegan"])
+
+    def test_limit(self):
+        response = search_catalog(self.factory.get("/", {"q": "", "limit": "2"}))
+        data = json.loads(response.content)
+        self.assertEqual(data["total"], 6)
+        self.assertEqual(len(data["results"]), 2)
+        bad = search_catalog(self.factory.get("/", {"limit": "many"}))
+        self.assertEqual(bad.status_code, 400)
@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import Mock, patch
+from datetime import datetime
+
+from core.modules.catalog import Catalog
+from core.modules.meal_plan_optimizer import optimize_days
+from core.modules.recommendation_helpers import (
+    gen_bandit_rec,
+    get_highest_prob_foods,
+    split_train_test,
+)
+from core.modules.seeding import (
+    MAX_SEED,
+    PLAN_STAGE,
+    SPLIT_STAGE,
+    derive_seed,
+    parse_seed,
+    stage_rng,
+)
+
+from .mocks.plans import items
+from .test_meal_plan_optimizer import BEVERAGES, MEAL_CONFIGS, POOLS, RECIPES
+
+FAVORITE_ITEMS = {
+    "Main Course": ["m1", "m2", "m3", "m4"],
+    "Side": ["s1", "s2", "s3"],
+    "Dessert": ["d1", "d2"],
+    "Beverage": ["b1", "b2", "b3"],
+}
+
+
+def generate(favorite_items, seed):
+    return gen_bandit_rec(
+        favorite_items,
+        14,
+        MEAL_CONFIGS,
+        datetime(2025, 3, 8),
+        {},
+        "Plan",
+        rng=stage_rng(seed, PLAN_STAGE),
+    )
+
+
+class TestSeeding(unittest.TestCase):
+    def test_seed_is_derived_from_inputs(self):
+        """
+        The seed should only depend on the content of the inputs, not on dict key order.
+        """
+        seed = derive_seed("user", {"a": 1, "b": [1, 2]}, "2025-03-08")
+        self.assertEqual(seed, derive_seed("user", {"b": [1, 2], "a": 1}, "2025-03-08"))
+        self.assertNotEqual(
+            seed, derive_seed("user", {"a": 1, "b": [2, 1]}, "2025-03-08")
+        )
+        self.assertTrue(0 <= seed <= MAX_SEED)
+
+    def test_parse_seed(self):
+        self.assertEqual(parse_seed(42), 42)
+        for invalid in (-1, MAX_SEED + 1, "42", 4.2, True):
+            self.assertIsNone(parse_seed(invalid))
+
+    def test_same_seed_same_plan(self):
+        """
+        A seed should replay the same plan, whatever order the favorite items were stored in.
+        """
+        plan = generate(FAVORITE_ITEMS, 7)
+        shuffled = {role: list(reversed(ids)) for role, ids in FAVORITE_ITEMS.items()}
+        self.assertEqual(items(generate(shuffled, 7)), items(plan))
+        self.assertNotEqual(items(generate(FAVORITE_ITEMS, 8)), items(plan))
+
+    def test_optimized_plans_are_reproducible(self):
+        catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+
+        def optimize(seed):
+            days, _ = optimize_days(
+                POOLS,
+                MEAL_CONFIGS,
+                14,
+                datetime(2025, 3, 8),
+                "Plan",
+                {"dairyPreference": -1},
+                time_budget=5,
+                rng=stage_rng(seed, PLAN_STAGE),
+                catalog=catalog,
+            )
+            return items(days)
+
+        self.assertEqual(optimize(3), optimize(3))
+
+    def test_bandit_stages_are_reproducible(self):
+        facts = [f"fact_{i}" for i in range(50)]
+        first = split_train_test(list(facts), rng=stage_rng(1, SPLIT_STAGE))
+        second = split_train_test(list(facts), rng=stage_rng(1, SPLIT_STAGE))
+        self.assertEqual(first, second)
+        self.assertEqual(len(first[0]), 40)
+
+        # user 1 has no dessert, which is filled from one of the other roles
+        probs = [("1", "10", "0.9"), ("1", "11", "0.5")]
+        with patch("core.modules.recommendation_helpers.get_catalog") as catalog:
+            catalog.return_value.recipes = {
+                "10": Mock(roles=["Main Course"]),
+                "11": Mock(roles=["Side"]),
+            }
+            foods = [
+                get_highest_prob_foods(probs, 1, stage_rng(5, "favorites"))
+                for _ in range(2)
+            ]
+        self.assertEqual(foods[0], foods[1])
+        self.assertIn(foods[0][1]["Dessert"], (["10"], ["11"]))
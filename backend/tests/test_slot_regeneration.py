@@ -0,0 +1,148 @@
+import copy
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from django.test import RequestFactory
+
+from core.modules.catalog import Catalog
+from core.modules.plan_cache import get_pool_cache
+from core.modules.recommendation_helpers import candidate_pools
+from core.views import regenerate_meal_slot
+
+from .test_meal_plan_optimizer import BEVERAGES, MEAL_CONFIGS, PREFERENCES, RECIPES
+
+FAVORITE_ITEMS = {
+    "Main Course": ["curry", "stir fry"],
+    "Side": ["salad", "fries", "stir fry"],
+    "Dessert": ["sorbet"],
+    "Beverage": ["tea"],
+}
+
+
+def day_plan():
+    return {
+        "_id": "day1",
+        "user_id": "user",
+        "meals": [
+            {
+                "_id": "lunch1",
+                "meal_name": "lunch",
+                "meal_types": {
+                    "main_course": "curry",
+                    "side": "salad",
+                    "beverage": "tea",
+                },
+            },
+            {
+                "_id": "dinner1",
+                "meal_name": "dinner",
+                "meal_types": {"main_course": "curry", "dessert": "sorbet"},
+            },
+        ],
+    }
+
+
+class TestSlotRegeneration(unittest.TestCase):
+    def setUp(self):
+        catalog = Catalog.from_documents(RECIPES, BEVERAGES)
+        patcher = patch("core.modules.catalog._catalog", catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_pool_cache().clear()
+
+        patcher = patch("core.views.recommendation_views.firebaseManager")
+        self.firebase = patcher.start()
+        self.addCleanup(patcher.stop)
+        user = MagicMock()
+        user.get_temp_day_plans.return_value = {"2025-03-08": "day1"}
+        user.get_meal_plan_config.return_value = {"meal_configs": MEAL_CONFIGS}
+        user.get_favorite_items.return_value = FAVORITE_ITEMS
+        user.get_permanent_favorite_items.return_value = None
+        user.get_dietary_conditions.return_value = {"vegan": False}
+        user.get_numerical_preferences.return_value = PREFERENCES
+        self.firebase.get_user_by_id.return_value = (user, 200)
+        self.firebase.get_temp_dayplan_by_id.side_effect = lambda _: (day_plan(), 200)
+        self.firebase.update_temp_dayplan.return_value = ("updated", 200)
+
+    def regenerate(self, **body):
+        body = {"user_id": "user", "date": "2025-03-08", "meal_id": "lunch1", **body}
+        request = RequestFactory().post(
+            "/beacon/recommendation/regenerate-slot",
+            json.dumps(body),
+            content_type="application/json",
+        )
+        response = regenerate_meal_slot(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_only_the_slot_is_replaced(self):
+        """
+        The side should be replaced by an item the meal does not have yet, the meal rescored and saved in one update.
+        """
+        status, content = self.regenerate(role="side")
+        self.assertEqual(status, 200)
+        meal = content["meal"]
+        self.assertEqual(content["previous_item"], "salad")
+        self.assertEqual(meal["meal_types"]["side"], "stir fry")
+        self.assertEqual(meal["meal_types"]["main_course"], "curry")
+        self.assertEqual(meal["variety_score"], 1.0)
+        self.assertIn("item_coverage_score", meal)
+        self.assertIn("nutritional_constraint_score", meal)
+
+        self.firebase.update_temp_dayplan.assert_called_once()
+        day_plan_id, fields = self.firebase.update_temp_dayplan.call_args[0]
+        self.assertEqual(day_plan_id, "day1")
+        lunch, dinner = fields["meals"]
+        self.assertEqual(lunch, meal)
+        self.assertEqual(dinner, day_plan()["meals"][1])
+        self.firebase.add_dayplan_temp.assert_not_called()
+
+    def test_pools_are_cached(self):
+        with patch(
+            "core.modules.recommendation_helpers.candidate_pools",
+            wraps=candidate_pools,
+        ) as filtered:
+            self.regenerate(role="side")
+            self.regenerate(role="main_course")
+        filtered.assert_called_once()
+
+    def test_seed_replays_the_choice(self):
+        first = self.regenerate(role="main_course", seed=5)[1]
+        second = self.regenerate(role="main_course", seed=5)[1]
+        self.assertEqual(first["meal"]["meal_types"], second["meal"]["meal_types"])
+        self.assertEqual(first["seed"], 5)
+
+    def test_repeated_regenerations_do_not_go_back(self):
+        """
+        Regenerating the same slot again and again should move on to other items rather than going back to
+        the one it just replaced.
+        """
+        saved = day_plan()
+        self.firebase.get_temp_dayplan_by_id.side_effect = lambda _: (
+            copy.deepcopy(saved),
+            200,
+        )
+
+        def update(day_plan_id, fields):
+            saved.update(copy.deepcopy(fields))
+            return "updated", 200
+
+        self.firebase.update_temp_dayplan.side_effect = update
+        sides = ["salad"]
+        for _ in range(6):
+            status, content = self.regenerate(role="side")
+            self.assertEqual(status, 200)
+            self.assertEqual(content["previous_item"], sides[-1])
+            sides.append(content["meal"]["meal_types"]["side"])
+        for before, after in zip(sides, sides[2:]):
+            self.assertNotEqual(before, after)
+        self.assertEqual(set(sides), {"salad", "fries", "stir fry"})
+        self.assertEqual(saved["meals"][0]["regenerations"]["side"]["count"], 6)
+
+    def test_invalid_slots(self):
+        self.assertEqual(self.regenerate(role="dessert")[0], 400)
+        self.assertEqual(self.regenerate(role="soup")[0], 400)
+        self.assertEqual(self.regenerate(role="side", meal_id="nope")[0], 404)
+        # tea is the only beverage
+        self.assertEqual(self.regenerate(role="beverage")[0], 409)
+        self.firebase.update_temp_dayplan.assert_not_called()
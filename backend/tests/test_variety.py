@@ -0,0 +1,105 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from core.modules.meal_plan_generator import generate_days
+from core.modules.variety import (
+    WindowSampler,
+    draw_varied_slots,
+    effective_window,
+    variety_stats,
+)
+
+from .test_meal_plan_generator import MEAL_CONFIGS
+
+POOLS = {
+    "main_course": [f"m{i}" for i in range(8)],
+    "side": ["s1", "s2", "s3"],
+    "dessert": ["d1"],
+    "beverage": ["b1", "b2", "b3"],
+}
+
+
+def uses(days, meal_index, role):
+    return [
+        day_plan["meals"][meal_index]["meal_types"][role] for day_plan in days.values()
+    ]
+
+
+class TestVariety(unittest.TestCase):
+    def test_effective_window(self):
+        self.assertEqual(effective_window(3, 8, 2), 3)
+        self.assertEqual(effective_window(5, 8, 2), 4)
+        self.assertEqual(effective_window(2, 1, 2), 0)
+        self.assertEqual(effective_window(0, 8, 2), 0)
+
+    def test_no_repeats_within_the_window(self):
+        """
+        The two daily main courses should never repeat within 3 days, and the single side not on consecutive days.
+        """
+        days = generate_days(
+            POOLS,
+            MEAL_CONFIGS,
+            60,
+            datetime(2025, 3, 8),
+            "Plan",
+            np.random.default_rng(0),
+            no_repeat_days={"main_course": 3, "side": 2},
+        )
+        main_courses = [
+            [
+                day_plan["meals"][0]["meal_types"]["main_course"],
+                day_plan["meals"][1]["meal_types"]["main_course"],
+            ]
+            for day_plan in days.values()
+        ]
+        for day_index in range(len(main_courses) - 2):
+            window = sum(main_courses[day_index : day_index + 3], [])
+            self.assertEqual(len(set(window)), 6)
+        sides = uses(days, 1, "side")
+        for previous, current in zip(sides, sides[1:]):
+            self.assertNotEqual(previous, current)
+
+        stats = variety_stats(days)
+        self.assertEqual(stats["main_course"]["slots"], 120)
+        self.assertEqual(stats["main_course"]["distinct_items"], 8)
+        self.assertGreaterEqual(stats["main_course"]["min_gap_days"], 3)
+        self.assertEqual(stats["main_course"]["next_day_repeats"], 0)
+        self.assertEqual(stats["side"]["next_day_repeats"], 0)
+        # a single dessert can only repeat
+        self.assertEqual(stats["dessert"]["min_gap_days"], 1)
+        self.assertEqual(stats["dessert"]["repeat_rate"], round(1 - 1 / 60, 4))
+
+    def test_every_item_stays_reachable(self):
+        """
+        Items should come back once their window is over, with every item drawn about equally often.
+        """
+        drawn = draw_varied_slots(
+            {"main_course": POOLS["main_course"]},
+            [["main_course"]],
+            8000,
+            np.random.default_rng(1),
+            {"main_course": 4},
+        )
+        counts = {}
+        for (item,) in drawn["main_course"]:
+            counts[item] = counts.get(item, 0) + 1
+        self.assertEqual(set(counts), set(POOLS["main_course"]))
+        for count in counts.values():
+            self.assertAlmostEqual(count / 8000, 1 / 8, delta=0.02)
+
+    def test_sampler_state(self):
+        sampler = WindowSampler(["a", "b", "c", "a"], 2)
+        self.assertEqual(sampler.items, ["a", "b", "c"])
+        sampler.start_day()
+        first = sampler.draw(0.0)
+        sampler.start_day()
+        self.assertNotEqual(sampler.draw(0.0), first)
+        self.assertEqual(sampler.available, 1)
+        sampler.start_day()
+        self.assertEqual(sampler.available, 2)
+        self.assertEqual(
+            {item: sampler.items[index] for item, index in sampler.position.items()},
+            {"a": "a", "b": "b", "c": "c"},
+        )